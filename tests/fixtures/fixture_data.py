@@ -9,6 +9,9 @@ from posts.models import Post, Group
 def mock_media(settings):
     with tempfile.TemporaryDirectory() as temp_directory:
         settings.MEDIA_ROOT = temp_directory
+        # Миниатюры строятся сразу: фоновая задача писала бы в папку во
+        # время ее удаления
+        settings.THUMBNAILS_IN_BACKGROUND = False
         yield temp_directory
 
 
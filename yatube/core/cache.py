@@ -0,0 +1,99 @@
+'''Бэкенды кэша проекта.
+
+LocMemCache хранит данные в памяти процесса, поэтому у каждого воркера
+gunicorn свои фрагменты, версии и страницы. Для нескольких воркеров одного
+сервера подходит SharedFileCache (общая папка), для нескольких серверов -
+Redis через django-redis (см. CACHE_PRESETS в settings). Отрендеренные
+фрагменты и страницы занимают килобайты, поэтому большие значения
+сжимаются: файловый кэш Django сжимает все записи, CompressedLocMemCache -
+записи длиннее COMPRESS_MIN_LENGTH.
+'''
+import fcntl
+import os
+import pickle
+import zlib
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+
+COMPRESS_MIN_LENGTH = 1024
+LOCK_FILE_NAME = 'cache.lock'
+
+
+class Compressed(bytes):
+    '''Сжатое pickle-представление значения'''
+
+
+class CompressionMixin:
+    '''Сжатие значений длиннее COMPRESS_MIN_LENGTH байт.
+
+    Переопределяет только set, add и get: get_many и set_many базового
+    класса работают через них. Числа не сжимаются, иначе incr не сможет
+    их увеличить.
+    '''
+
+    def __init__(self, location, params):
+        super().__init__(location, params)
+        options = params.get('OPTIONS', {})
+        self.compress_min_length = int(
+            options.get('COMPRESS_MIN_LENGTH', COMPRESS_MIN_LENGTH)
+        )
+
+    def pack(self, value):
+        if isinstance(value, int):
+            # Счетчики остаются числами для incr и decr
+            return value
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        if len(data) < self.compress_min_length:
+            return value
+
+        return Compressed(zlib.compress(data))
+
+    def unpack(self, value):
+        if isinstance(value, Compressed):
+            return pickle.loads(zlib.decompress(value))
+
+        return value
+
+    def get(self, key, default=None, version=None):
+        return self.unpack(super().get(key, default, version))
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        super().set(key, self.pack(value), timeout, version)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        return super().add(key, self.pack(value), timeout, version)
+
+
+class CompressedLocMemCache(CompressionMixin, LocMemCache):
+    '''Кэш в памяти процесса со сжатием больших значений'''
+
+
+class SharedFileCache(FileBasedCache):
+    '''Файловый кэш, общий для процессов одного сервера.
+
+    Запись и чтение файла кэша атомарны и в FileBasedCache, но add и incr
+    состоят из чтения и записи. Здесь они выполняются под блокировкой
+    файла в папке кэша, поэтому счетчики и add не теряют обновления
+    между процессами.
+    '''
+
+    @contextmanager
+    def locked(self):
+        self._createdir()
+        with open(os.path.join(self._dir, LOCK_FILE_NAME), 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        with self.locked():
+            return super().add(key, value, timeout, version)
+
+    def incr(self, key, delta=1, version=None):
+        with self.locked():
+            return super().incr(key, delta, version)
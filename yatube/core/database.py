@@ -0,0 +1,21 @@
+'''Настройка соединений SQLite.
+
+По умолчанию SQLite ведет журнал отката: пишущая транзакция блокирует
+файл, и читатели ждут ее конца. В режиме WAL запись идет в отдельный
+журнал, и чтение не ждет запись. synchronous=NORMAL в режиме WAL
+не рискует целостностью базы и не вызывает fsync на каждый коммит,
+mmap и увеличенный кэш страниц сокращают системные вызовы при чтении.
+Значения берутся из settings.SQLITE_PRAGMAS и выполняются при открытии
+каждого соединения; при CONN_MAX_AGE соединение живет между запросами,
+поэтому это происходит редко.
+'''
+from django.conf import settings
+
+
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    '''Обработчик connection_created: PRAGMA для соединений SQLite'''
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
@@ -0,0 +1,20 @@
+'''Redis в памяти процесса для разработки и тестов.
+
+Пресет fakeredis (CACHE_PRESETS в settings) работает через тот же клиент
+django-redis, что и пресет redis, но пул соединений отправляет команды в
+FakeServer пакета fakeredis, а не на сервер. Как у LocMemCache, данные
+свои у каждого процесса и общие для его соединений. incr django-redis
+выполняет скрипт Lua, для него fakeredis нужен пакет lupa.
+'''
+from fakeredis import FakeConnection, FakeServer
+from redis import ConnectionPool
+
+SERVER = FakeServer()
+
+
+class LocalRedisPool(ConnectionPool):
+    '''Пул соединений django-redis с FakeServer процесса'''
+
+    def __init__(self, **kwargs):
+        kwargs.update(connection_class=FakeConnection, server=SERVER)
+        super().__init__(**kwargs)
@@ -0,0 +1,41 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from core.replication import replicate
+
+
+class Command(BaseCommand):
+    help = (
+        'Копирует основную базу SQLite в реплики DATABASE_REPLICAS. '
+        'С --interval повторяет копирование, как фоновая репликация.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=float,
+            help='Пауза между копиями в секундах',
+        )
+        parser.add_argument(
+            'replicas', nargs='*',
+            help='Псевдонимы реплик, по умолчанию DATABASE_REPLICAS',
+        )
+
+    def handle(self, *args, **options):
+        replicas = options['replicas'] or settings.DATABASE_REPLICAS
+        if not replicas:
+            raise CommandError('Реплики не заданы: YATUBE_DB_REPLICAS')
+        if any(connections[alias].vendor != 'sqlite' for alias in replicas):
+            raise CommandError('Команда рассчитана на базы SQLite')
+        while True:
+            started = time.perf_counter()
+            replicate(replicas)
+            self.stdout.write(self.style.SUCCESS(
+                f'{", ".join(replicas)}: '
+                f'{(time.perf_counter() - started) * 1000:.0f} мс'
+            ))
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,131 @@
+'''Кэш целых страниц для анонимных читателей.
+
+Middleware стоит первым в цепочке, поэтому попадание отдается до
+сессий, аутентификации, CSRF и шаблонов. Кэшируются только страницы,
+которые view пометила группами кэша (mark_page_scopes): вместе со
+страницей хранятся версии этих групп (core.versioning), и смена любой из
+них делает запись устаревшей. Хранятся версии, прочитанные до того, как
+view прочитала данные страницы: middleware читает версии групп прежней
+записи, а view - версии остальных групп (remember_page_versions). Правка во
+время рендера поэтому делает запись устаревшей, а не сохраняет старую
+страницу под новыми версиями; группу без прочитанной заранее версии
+страница не кэшируется. Запрос с cookie сессии идет мимо кэша:
+страница пользователя содержит его данные.
+'''
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+
+from .versioning import get_versions
+
+PAGE_KEY_PREFIX = 'page'
+MESSAGES_COOKIE_NAME = 'messages'
+CACHE_STATUS_HEADER = 'X-Page-Cache'
+
+
+def mark_page_scopes(response, *scopes):
+    '''Разрешает кэшировать страницу до смены версий групп scopes'''
+    response.page_cache_scopes = scopes
+
+    return response
+
+
+def is_page_cached(request):
+    '''Страница запроса может попасть в кэш страниц'''
+    return getattr(request, 'page_versions', None) is not None
+
+
+def remember_page_versions(request, scope_versions):
+    '''Запоминает пары (группа, версия), прочитанные до данных страницы:
+    их сохранит кэш страниц'''
+    if is_page_cached(request):
+        for scope, version in scope_versions:
+            request.page_versions.setdefault(scope, version)
+
+
+def read_page_versions(request, *scopes):
+    '''Версии групп scopes для страницы, читаются до ее данных'''
+    versions = get_versions(*scopes)
+    remember_page_versions(request, zip(scopes, versions))
+
+    return versions
+
+
+def page_key(request):
+    '''Ключ страницы по адресу с параметрами запроса'''
+    path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+
+    return f'{PAGE_KEY_PREFIX}:{path}'
+
+
+class AnonymousPageCacheMiddleware:
+    '''Хранение и выдача страниц анонимных пользователей'''
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not self.is_cacheable_request(request):
+            return self.get_response(request)
+        key = page_key(request)
+        entry = cache.get(key)
+        request.page_versions = {}
+        if entry is not None:
+            versions = read_page_versions(request, *entry['scopes'])
+            if versions == entry['versions']:
+                return self.cached_response(request, entry)
+        response = self.get_response(request)
+        if self.is_cacheable_response(request, response):
+            self.store(key, request, response)
+            response[CACHE_STATUS_HEADER] = 'miss'
+
+        return response
+
+    def is_cacheable_request(self, request):
+        return (
+            settings.PAGE_CACHE_ENABLED
+            and request.method == 'GET'
+            and settings.SESSION_COOKIE_NAME not in request.COOKIES
+            and MESSAGES_COOKIE_NAME not in request.COOKIES
+        )
+
+    def is_cacheable_response(self, request, response):
+        '''Страница помечена, успешна, без cookie и не приватна'''
+        return (
+            getattr(response, 'page_cache_scopes', None)
+            and response.status_code == 200
+            and not response.streaming
+            and not response.cookies
+            and 'private' not in response.get('Cache-Control', '')
+            and not request.user.is_authenticated
+        )
+
+    def store(self, key, request, response):
+        scopes = response.page_cache_scopes
+        if not all(scope in request.page_versions for scope in scopes):
+            return
+        cache.set(key, {
+            'content': response.content,
+            'headers': list(response.items()),
+            'scopes': scopes,
+            'versions': [request.page_versions[scope] for scope in scopes],
+        }, timeout=settings.PAGE_CACHE_TIMEOUT)
+
+    def cached_response(self, request, entry):
+        response = HttpResponse(entry['content'])
+        for header, value in entry['headers']:
+            response[header] = value
+        response[CACHE_STATUS_HEADER] = 'hit'
+
+        return get_conditional_response(
+            request,
+            etag=response.get('ETag'),
+            last_modified=parse_http_date_safe(
+                response.get('Last-Modified', '')
+            ),
+            response=response,
+        )
@@ -0,0 +1,289 @@
+'''Профилирование запросов.
+
+ProfilingMiddleware включается настройкой PROFILING_ENABLED и собирает
+для каждого запроса:
+- число и время SQL-запросов во всех базах (connection.execute_wrapper);
+- время рендера шаблонов, общее и по каждому шаблону вместе с include;
+- попадания, промахи и время обращений к кэшу;
+- время участков, отмеченных timed(), например построения миниатюр.
+Замеры отдаются заголовком Server-Timing (панель Network в браузере) и
+попадают в окно последних PROFILING_WINDOW запросов процесса, сводку по
+которому отдает profiling_stats. Участки timed() вне запроса (миниатюры
+в пуле потоков) попадают в окно отдельными записями.
+'''
+import threading
+import time
+from collections import defaultdict, deque, namedtuple
+from contextlib import ExitStack, contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template.base import Template
+
+from .middleware import CACHE_STATUS_HEADER
+
+BACKGROUND_PREFIX = 'background'
+PAGE_CACHE_VIEW = 'page_cache'
+SLOWEST_TEMPLATES_AMOUNT = 5
+MISSING = object()
+
+Sample = namedtuple('Sample', (
+    'view', 'total', 'sql_count', 'sql_time', 'template_time',
+    'templates', 'cache_hits', 'cache_misses', 'cache_time', 'timers',
+))
+
+state = threading.local()
+_history = deque(maxlen=settings.PROFILING_WINDOW)
+_history_lock = threading.Lock()
+
+
+class RequestProfile:
+    '''Замеры одного запроса'''
+
+    def __init__(self):
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+        self.templates = defaultdict(float)
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.cache_time = 0.0
+        self.in_cache = False
+        self.timers = defaultdict(float)
+
+    @contextmanager
+    def cache_call(self, keys_amount):
+        '''Обращение к кэшу; вложенные вызовы (get из get_many) не
+        считаются повторно'''
+        self.in_cache = True
+        started = time.perf_counter()
+        found = []
+        try:
+            yield found
+        finally:
+            self.in_cache = False
+            self.cache_time += time.perf_counter() - started
+            self.cache_hits += sum(found)
+            self.cache_misses += keys_amount - sum(found)
+
+    def sample(self, view, total):
+        return Sample(
+            view, total, self.sql_count, self.sql_time, self.template_time,
+            dict(self.templates), self.cache_hits, self.cache_misses,
+            self.cache_time, dict(self.timers),
+        )
+
+    def server_timing(self, total):
+        '''Значение заголовка Server-Timing, длительности в мс'''
+        metrics = [
+            f'sql;dur={self.sql_time * 1000:.1f};'
+            f'desc="{self.sql_count} queries"',
+            f'tpl;dur={self.template_time * 1000:.1f}',
+            f'cache;dur={self.cache_time * 1000:.1f};'
+            f'desc="{self.cache_hits} hits, {self.cache_misses} misses"',
+        ]
+        metrics.extend(
+            f'{name};dur={elapsed * 1000:.1f}'
+            for name, elapsed in self.timers.items()
+        )
+        metrics.append(f'total;dur={total * 1000:.1f}')
+
+        return ', '.join(metrics)
+
+
+def current_profile():
+    return getattr(state, 'profile', None)
+
+
+def record(sample):
+    with _history_lock:
+        _history.append(sample)
+
+
+def clear_profiling_stats():
+    with _history_lock:
+        _history.clear()
+
+
+@contextmanager
+def timed(name):
+    '''Время участка кода: в замеры текущего запроса, вне запроса -
+    отдельной записью окна'''
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        profile = current_profile()
+        if profile is not None:
+            profile.timers[name] += elapsed
+        elif settings.PROFILING_ENABLED:
+            profile = RequestProfile()
+            profile.timers[name] = elapsed
+            record(profile.sample(f'{BACKGROUND_PREFIX}:{name}', elapsed))
+
+
+def sql_wrapper(execute, sql, params, many, context):
+    '''Обертка execute_wrapper: число и время SQL-запросов'''
+    profile = current_profile()
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        if profile is not None:
+            profile.sql_count += 1
+            profile.sql_time += time.perf_counter() - started
+
+
+def install_template_timing():
+    '''Замер Template.render; внешний рендер дает общее время шаблонов'''
+    if getattr(Template.render, 'profiled', False):
+        return
+    render = Template.render
+
+    @wraps(render)
+    def profiled_render(template, context):
+        profile = current_profile()
+        if profile is None:
+            return render(template, context)
+        profile.template_depth += 1
+        started = time.perf_counter()
+        try:
+            return render(template, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            profile.template_depth -= 1
+            profile.templates[template.name or '<string>'] += elapsed
+            if not profile.template_depth:
+                profile.template_time += elapsed
+
+    profiled_render.profiled = True
+    Template.render = profiled_render
+
+
+def install_cache_timing(cache):
+    '''Замер get и get_many экземпляра бэкенда кэша потока'''
+    if getattr(cache, 'profiled', False):
+        return
+    get, get_many = cache.get, cache.get_many
+
+    def profiled_get(key, default=None, version=None):
+        profile = current_profile()
+        if profile is None or profile.in_cache:
+            return get(key, default, version)
+        with profile.cache_call(1) as found:
+            value = get(key, MISSING, version)
+            found.append(value is not MISSING)
+
+        return default if value is MISSING else value
+
+    def profiled_get_many(keys, version=None):
+        profile = current_profile()
+        if profile is None or profile.in_cache:
+            return get_many(keys, version=version)
+        keys = list(keys)
+        with profile.cache_call(len(keys)) as found:
+            values = get_many(keys, version=version)
+            found.append(len(values))
+
+        return values
+
+    cache.get = profiled_get
+    cache.get_many = profiled_get_many
+    cache.profiled = True
+
+
+def percentile(values, share):
+    values = sorted(values)
+
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+def summarize(samples):
+    '''Средние и p95 по записям одной view, длительности в мс'''
+    amount = len(samples)
+    templates = defaultdict(float)
+    timers = defaultdict(float)
+    for sample in samples:
+        for name, elapsed in sample.templates.items():
+            templates[name] += elapsed
+        for name, elapsed in sample.timers.items():
+            timers[name] += elapsed
+    slowest = sorted(
+        templates.items(), key=lambda item: item[1], reverse=True
+    )[:SLOWEST_TEMPLATES_AMOUNT]
+
+    def average_ms(total):
+        return round(total / amount * 1000, 2)
+
+    return {
+        'requests': amount,
+        'total_ms': average_ms(sum(sample.total for sample in samples)),
+        'total_p95_ms': round(
+            percentile([sample.total for sample in samples], 0.95) * 1000, 2
+        ),
+        'sql_queries': round(
+            sum(sample.sql_count for sample in samples) / amount, 2
+        ),
+        'sql_ms': average_ms(sum(sample.sql_time for sample in samples)),
+        'template_ms': average_ms(
+            sum(sample.template_time for sample in samples)
+        ),
+        'templates_ms': {
+            name: average_ms(elapsed) for name, elapsed in slowest
+        },
+        'cache_hits': sum(sample.cache_hits for sample in samples),
+        'cache_misses': sum(sample.cache_misses for sample in samples),
+        'cache_ms': average_ms(sum(sample.cache_time for sample in samples)),
+        'timers_ms': {
+            name: average_ms(elapsed) for name, elapsed in timers.items()
+        },
+    }
+
+
+def profiling_stats():
+    '''Сводка по view за окно последних запросов'''
+    with _history_lock:
+        samples = list(_history)
+    by_view = defaultdict(list)
+    for sample in samples:
+        by_view[sample.view].append(sample)
+
+    return {view: summarize(items) for view, items in by_view.items()}
+
+
+class ProfilingMiddleware:
+    '''Замеры запроса в Server-Timing и окно статистики'''
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        install_template_timing()
+
+    def __call__(self, request):
+        profile = RequestProfile()
+        state.profile = profile
+        install_cache_timing(caches[DEFAULT_CACHE_ALIAS])
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(sql_wrapper)
+                    )
+                response = self.get_response(request)
+        finally:
+            state.profile = None
+        total = time.perf_counter() - started
+        response['Server-Timing'] = profile.server_timing(total)
+        view = getattr(request.resolver_match, 'view_name', None)
+        if view is None and response.get(CACHE_STATUS_HEADER) == 'hit':
+            view = PAGE_CACHE_VIEW
+        record(profile.sample(view or 'unresolved', total))
+
+        return response
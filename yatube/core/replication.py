@@ -0,0 +1,21 @@
+'''Замена репликации для локальной проверки реплик.
+
+Реплика - отдельный файл SQLite, в который backup API SQLite копирует
+согласованный снимок основной базы вместе со схемой. Между копиями
+реплика отстает, как отстает реплика с асинхронной репликацией.
+'''
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+def replicate(replicas=None):
+    '''Копирует основную базу SQLite в реплики'''
+    primary = connections[DEFAULT_DB_ALIAS]
+    primary.ensure_connection()
+    replicas = settings.DATABASE_REPLICAS if replicas is None else replicas
+    for alias in replicas:
+        replica = connections[alias]
+        replica.ensure_connection()
+        primary.connection.backup(replica.connection)
+
+    return len(replicas)
@@ -0,0 +1,92 @@
+'''Чтение с реплик базы.
+
+View, помеченные replica_reads, читают с одной из реплик
+settings.DATABASE_REPLICAS, остальные view и все записи идут в основную
+базу. Реплика отстает от основной базы, поэтому после запроса, который
+что-то записал, ReplicaRoutingMiddleware ставит cookie, и
+REPLICA_STICKY_SECONDS секунд запросы этого клиента читают из основной
+базы: автор сразу видит свой пост, коментарий или подписку.
+
+Прочитанное часто сохраняется в кэш под версиями групп (core.versioning).
+Если версия выдана меньше REPLICA_MAX_LAG_SECONDS секунд назад, реплика
+могла еще не получить запись, которая ее сменила, и старые данные
+попали бы в кэш под новой версией. Поэтому такая версия переводит
+оставшиеся чтения запроса на основную базу (read_primary_after).
+'''
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+PRIMARY_COOKIE_NAME = 'primary_reads'
+
+state = threading.local()
+
+
+def replica_reads(view):
+    '''Помечает view только для чтения. Ставится поверх остальных
+    декораторов view'''
+    view.replica_reads = True
+
+    return view
+
+
+def read_primary_after(versions):
+    '''Чтение запроса с основной базы, если одна из версий (время выдачи
+    в наносекундах) моложе отставания реплики'''
+    if getattr(state, 'replica', None) is None or not versions:
+        return
+    horizon = time.time_ns() - settings.REPLICA_MAX_LAG_SECONDS * 10 ** 9
+    if max(versions) > horizon:
+        state.replica = None
+
+
+class ReplicaRouter:
+    '''Чтение с реплики запроса, запись и миграции - в основную базу'''
+
+    def db_for_read(self, model, **hints):
+        return getattr(state, 'replica', None)
+
+    def db_for_write(self, model, **hints):
+        state.wrote = True
+
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Схема попадает на реплики вместе с данными при репликации
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaRoutingMiddleware:
+    '''Выбор реплики на запрос и привязка к основной базе после записи'''
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        state.replica = None
+        state.wrote = False
+        try:
+            response = self.get_response(request)
+        finally:
+            state.replica = None
+        if state.wrote:
+            response.set_cookie(
+                PRIMARY_COOKIE_NAME, '1',
+                max_age=settings.REPLICA_STICKY_SECONDS, httponly=True,
+            )
+
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (
+            settings.DATABASE_REPLICAS
+            and getattr(view_func, 'replica_reads', False)
+            and PRIMARY_COOKIE_NAME not in request.COOKIES
+        ):
+            state.replica = random.choice(settings.DATABASE_REPLICAS)
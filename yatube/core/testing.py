@@ -0,0 +1,88 @@
+'''Прогон тестов, зависящих от кэша, на нескольких бэкендах.
+
+Декоратор with_cache_backends повторяет тест на каждом бэкенде из
+cache_backends() после основного прогона на бэкенде из настроек. Каждый
+повтор идет в своем subTest с override_settings(CACHES=...), пустым
+кэшем, заново выполненным setUp и откатом изменений базы к точке
+сохранения, поэтому повторы не видят данных друг друга. Клиент
+django-redis проверяется на Redis в памяти (core.local_redis), если
+установлен fakeredis, и на сервере, если задан адрес YATUBE_TEST_REDIS_URL.
+'''
+import importlib.util
+import os
+import tempfile
+from contextlib import ExitStack
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.test import override_settings
+
+REDIS_URL = os.environ.get('YATUBE_TEST_REDIS_URL')
+TEST_KEY_PREFIX = 'yatube-tests'
+
+
+def cache_backends(stack):
+    '''Настройки CACHES бэкендов, доступных в окружении тестов.
+
+    Временные папки файлового кэша удаляются при закрытии stack.
+    '''
+    backends = {
+        'CompressedLocMem': {
+            'BACKEND': 'core.cache.CompressedLocMemCache',
+            # Сжимаются все значения, чтобы тесты проходили через сжатие
+            'OPTIONS': {'COMPRESS_MIN_LENGTH': 0},
+        },
+        'SharedFile': {
+            'BACKEND': 'core.cache.SharedFileCache',
+            'LOCATION': stack.enter_context(
+                tempfile.TemporaryDirectory(prefix='yatube-cache-')
+            ),
+        },
+    }
+    if importlib.util.find_spec('fakeredis'):
+        backends['FakeRedis'] = settings.CACHE_PRESETS['fakeredis']
+    if REDIS_URL and importlib.util.find_spec('django_redis'):
+        backends['Redis'] = {
+            'BACKEND': 'django_redis.cache.RedisCache',
+            'LOCATION': REDIS_URL,
+            'OPTIONS': {
+                'COMPRESSOR': 'django_redis.compressors.zlib.ZlibCompressor',
+            },
+        }
+
+    return {
+        name: {'default': dict(config, KEY_PREFIX=TEST_KEY_PREFIX)}
+        for name, config in backends.items()
+    }
+
+
+def run_isolated(test_case, test_method):
+    '''Тест с пустым кэшем и откатом изменений базы после него'''
+    savepoint = transaction.savepoint()
+    try:
+        cache.clear()
+        test_case.setUp()
+        test_method(test_case)
+    finally:
+        cache.clear()
+        transaction.savepoint_rollback(savepoint)
+
+
+def with_cache_backends(test_method):
+    '''Повтор теста на каждом доступном бэкенде кэша'''
+    @wraps(test_method)
+    def inner(self):
+        savepoint = transaction.savepoint()
+        try:
+            test_method(self)
+        finally:
+            transaction.savepoint_rollback(savepoint)
+        with ExitStack() as stack:
+            for name, caches in cache_backends(stack).items():
+                with self.subTest(cache=name):
+                    with override_settings(CACHES=caches):
+                        run_isolated(self, test_method)
+
+    return inner
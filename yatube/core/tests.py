@@ -1,6 +1,36 @@
+import os
+import re
+import tempfile
 from http import HTTPStatus
+from threading import Thread
+from unittest import mock, skipUnless
 
-from django.test import TestCase
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.db import connection
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.test.utils import CaptureQueriesContext
+from django.test import (
+    Client, SimpleTestCase, TestCase, TransactionTestCase, override_settings,
+)
+from django.shortcuts import render
+from django.urls import reverse
+
+from posts.constants import CacheSet, SearchSet
+from posts.models import Group, Post, User
+
+from .cache import Compressed, CompressedLocMemCache, SharedFileCache
+from .middleware import CACHE_STATUS_HEADER
+from .profiling import clear_profiling_stats, timed
+from .replication import replicate
+from .routers import PRIMARY_COOKIE_NAME
+from .testing import REDIS_URL, TEST_KEY_PREFIX, with_cache_backends
+from .versioning import bump_versions
+
+THREADS = 4
+INCREMENTS = 50
+SYNCHRONOUS_NORMAL = 1
+HITS_PATTERN = r'(\d+) hits'
 
 
 class ViewTests(TestCase):
@@ -10,3 +40,419 @@ class ViewTests(TestCase):
         response = self.client.get('/nonexist-page/')
         self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
         self.assertTemplateUsed(response, 'core/404.html')
+
+
+class PageCacheMiddlewareTest(TestCase):
+    '''Класс тестов кэша страниц анонимных пользователей'''
+    @classmethod
+    def setUpClass(cls):
+        '''Фикстуры класса'''
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.other_group = Group.objects.create(
+            title='Другая группа',
+            slug='other-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.author,
+            group=cls.group,
+            text='Тестовый пост',
+        )
+
+    def setUp(self):
+        '''Фикстуры'''
+        cache.clear()
+        self.author_client = Client()
+        self.author_client.force_login(PageCacheMiddlewareTest.author)
+
+    def get_twice(self, url):
+        self.client.get(url)
+
+        return self.client.get(url)
+
+    @with_cache_backends
+    def test_anonymous_pages_served_from_cache(self):
+        '''Повторная анонимная страница отдается без запросов к базе'''
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list',
+                    kwargs={'slug': PageCacheMiddlewareTest.group.slug}),
+            reverse('posts:profile',
+                    kwargs={'username': 'author'}),
+            reverse('posts:post_detail',
+                    kwargs={'post_id': PageCacheMiddlewareTest.post.pk}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(
+                    self.client.get(url)[CACHE_STATUS_HEADER], 'miss'
+                )
+                with self.assertNumQueries(0):
+                    response = self.client.get(url)
+                self.assertEqual(response[CACHE_STATUS_HEADER], 'hit')
+                self.assertContains(response, 'Тестовый пост')
+
+    def test_query_string_is_part_of_key(self):
+        '''Страницы с разными параметрами кэшируются отдельно'''
+        url = reverse('posts:index')
+        self.client.get(url)
+        response = self.client.get(url + '?page=2')
+        self.assertEqual(response[CACHE_STATUS_HEADER], 'miss')
+
+    def test_session_cookie_bypasses_cache(self):
+        '''Запросы с сессией идут мимо кэша'''
+        url = reverse('posts:index')
+        self.client.get(url)
+        response = self.author_client.get(url)
+        self.assertFalse(response.has_header(CACHE_STATUS_HEADER))
+        self.assertContains(response, 'Пользователь: author')
+
+    def test_unmarked_pages_not_cached(self):
+        '''Страницы без групп кэша не сохраняются'''
+        response = self.get_twice(reverse('about:author'))
+        self.assertFalse(response.has_header(CACHE_STATUS_HEADER))
+
+    @with_cache_backends
+    def test_new_post_invalidates_only_its_pages(self):
+        '''Новый пост сбрасывает только страницы своей группы'''
+        group_url = reverse(
+            'posts:group_list',
+            kwargs={'slug': PageCacheMiddlewareTest.group.slug}
+        )
+        other_url = reverse(
+            'posts:group_list',
+            kwargs={'slug': PageCacheMiddlewareTest.other_group.slug}
+        )
+        self.client.get(group_url)
+        self.client.get(other_url)
+        self.author_client.post(reverse('posts:post_create'), data={
+            'text': 'Новый пост',
+            'group': PageCacheMiddlewareTest.group.pk,
+        })
+        response = self.client.get(group_url)
+        self.assertEqual(response[CACHE_STATUS_HEADER], 'miss')
+        self.assertContains(response, 'Новый пост')
+        response = self.client.get(other_url)
+        self.assertEqual(response[CACHE_STATUS_HEADER], 'hit')
+
+    @with_cache_backends
+    def test_renamed_author_invalidates_feed_pages(self):
+        '''Смена имени автора сбрасывает ленты с его карточками'''
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list',
+                    kwargs={'slug': PageCacheMiddlewareTest.group.slug}),
+        )
+        for url in urls:
+            self.client.get(url)
+        author = User.objects.get(pk=PageCacheMiddlewareTest.author.pk)
+        author.first_name = 'Переименованный'
+        author.save()
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response[CACHE_STATUS_HEADER], 'miss')
+                self.assertContains(response, 'Переименованный')
+
+    def test_write_during_render_leaves_page_stale(self):
+        '''Страница хранится с версиями, прочитанными до рендера'''
+        def render_during_write(*args, **kwargs):
+            bump_versions((CacheSet.FEED, ''))
+
+            return render(*args, **kwargs)
+
+        url = reverse('posts:index')
+        with mock.patch('posts.views.render', render_during_write):
+            self.client.get(url)
+        response = self.client.get(url)
+        self.assertEqual(response[CACHE_STATUS_HEADER], 'miss')
+        self.assertEqual(self.client.get(url)[CACHE_STATUS_HEADER], 'hit')
+
+    @with_cache_backends
+    def test_cached_page_not_modified(self):
+        '''Кэшированная страница отвечает 304 на совпавший ETag'''
+        url = reverse('posts:index')
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+
+class CacheBackendsTest(SimpleTestCase):
+    '''Класс тестов бэкендов кэша core.cache'''
+    def setUp(self):
+        '''Фикстуры'''
+        directory = tempfile.TemporaryDirectory(prefix='yatube-cache-')
+        self.addCleanup(directory.cleanup)
+        self.location = directory.name
+
+    def shared_cache(self, **params):
+        return SharedFileCache(self.location, params)
+
+    def test_large_values_are_compressed(self):
+        '''Большие значения хранятся сжатыми и читаются как были'''
+        local = CompressedLocMemCache('compressed', {
+            'OPTIONS': {'COMPRESS_MIN_LENGTH': 100},
+        })
+        fragment = 'Тестовый пост ' * 100
+        local.set_many({'small': 'пост', 'large': fragment})
+        self.assertIsInstance(local.pack(fragment), Compressed)
+        self.assertNotIsInstance(local.pack('пост'), Compressed)
+        self.assertEqual(
+            local.get_many(['small', 'large']),
+            {'small': 'пост', 'large': fragment},
+        )
+        local.set('counter', 1)
+        self.assertEqual(local.incr('counter'), 2)
+
+    def test_file_cache_is_shared(self):
+        '''Экземпляры на одной папке видят записи и очистку друг друга'''
+        first, second = self.shared_cache(), self.shared_cache()
+        first.set('key', 'value')
+        self.assertEqual(second.get('key'), 'value')
+        self.assertFalse(second.add('key', 'other'))
+        second.clear()
+        self.assertIsNone(first.get('key'))
+
+    def test_key_prefix_separates_deployments(self):
+        '''Разные KEY_PREFIX на одном хранилище не пересекаются'''
+        first = self.shared_cache(KEY_PREFIX='first')
+        second = self.shared_cache(KEY_PREFIX='second')
+        first.set('key', 'first')
+        second.set('key', 'second')
+        self.assertEqual(first.get('key'), 'first')
+        self.assertEqual(second.get('key'), 'second')
+
+    def test_concurrent_incr_keeps_all_updates(self):
+        '''incr из разных потоков и экземпляров не теряет обновления'''
+        self.shared_cache().set('counter', 0)
+
+        def increment():
+            shared = self.shared_cache()
+            for _ in range(INCREMENTS):
+                shared.incr('counter')
+
+        threads = [Thread(target=increment) for _ in range(THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(
+            self.shared_cache().get('counter'), THREADS * INCREMENTS
+        )
+
+
+class CachePresetsTest(SimpleTestCase):
+    '''Класс тестов пресетов CACHE_PRESETS из настроек'''
+    def preset(self, name):
+        '''Настройки пресета: файловый кэш во временной папке, redis - на
+        YATUBE_TEST_REDIS_URL'''
+        config = dict(settings.CACHE_PRESETS[name])
+        if name == 'file':
+            directory = tempfile.TemporaryDirectory(prefix='yatube-cache-')
+            self.addCleanup(directory.cleanup)
+            config['LOCATION'] = directory.name
+        if name == 'redis' and REDIS_URL:
+            config['LOCATION'] = REDIS_URL
+
+        return {'default': dict(config, KEY_PREFIX=TEST_KEY_PREFIX)}
+
+    def test_presets_load(self):
+        '''Бэкенд каждого пресета импортируется и работает, redis - если
+        задан сервер'''
+        for name in settings.CACHE_PRESETS:
+            with self.subTest(preset=name):
+                with override_settings(CACHES=self.preset(name)):
+                    backend = caches['default']
+                    self.assertEqual(
+                        f'{type(backend).__module__}.'
+                        f'{type(backend).__name__}',
+                        settings.CACHE_PRESETS[name]['BACKEND'],
+                    )
+                    if name == 'redis' and not REDIS_URL:
+                        continue
+                    backend.set('key', 'value')
+                    self.assertEqual(backend.get('key'), 'value')
+                    backend.set('counter', 1)
+                    self.assertEqual(backend.incr('counter'), 2)
+                    backend.clear()
+
+
+@skipUnless(connection.vendor == 'sqlite', 'PRAGMA есть только в SQLite')
+class SqlitePragmasTest(SimpleTestCase):
+    '''Класс тестов настройки соединений SQLite'''
+    def test_new_connection_gets_pragmas(self):
+        '''Новое соединение с файлом базы открывается в режиме WAL'''
+        with tempfile.TemporaryDirectory() as directory:
+            database = DatabaseWrapper(dict(
+                connection.settings_dict,
+                NAME=os.path.join(directory, 'db.sqlite3'),
+            ), alias='pragmas')
+            try:
+                with database.cursor() as cursor:
+                    pragmas = {
+                        name: cursor.execute(
+                            f'PRAGMA {name}'
+                        ).fetchone()[0]
+                        for name in ('journal_mode', 'synchronous',
+                                     'cache_size')
+                    }
+            finally:
+                database.close()
+        self.assertEqual(pragmas, {
+            'journal_mode': 'wal',
+            'synchronous': SYNCHRONOUS_NORMAL,
+            'cache_size': settings.SQLITE_PRAGMAS['cache_size'],
+        })
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Реплика - копия файла SQLite')
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTest(TransactionTestCase):
+    '''Класс тестов чтения лент с реплики'''
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        '''Фикстуры'''
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        self.post = Post.objects.create(author=self.author, text='Пост')
+        replicate()
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+
+    def post_url(self, post):
+        return reverse('posts:post_detail', kwargs={'post_id': post.pk})
+
+    @override_settings(REPLICA_MAX_LAG_SECONDS=0)
+    def test_reads_lag_until_replication(self):
+        '''Ленты читаются с реплики и видят запись после репликации'''
+        new_post = Post.objects.create(author=self.author, text='Новый')
+        self.assertEqual(
+            self.client.get(self.post_url(self.post)).status_code,
+            HTTPStatus.OK,
+        )
+        self.assertEqual(
+            self.client.get(self.post_url(new_post)).status_code,
+            HTTPStatus.NOT_FOUND,
+        )
+        replicate()
+        self.assertEqual(
+            self.client.get(self.post_url(new_post)).status_code,
+            HTTPStatus.OK,
+        )
+
+    @override_settings(REPLICA_MAX_LAG_SECONDS=0)
+    def test_writer_reads_own_writes(self):
+        '''После записи клиент читает из основной базы'''
+        response = self.author_client.post(
+            reverse('posts:post_create'), data={'text': 'Свежий пост'}
+        )
+        self.assertIn(PRIMARY_COOKIE_NAME, response.cookies)
+        new_post = Post.objects.get(text='Свежий пост')
+        self.assertEqual(
+            self.author_client.get(self.post_url(new_post)).status_code,
+            HTTPStatus.OK,
+        )
+        self.assertEqual(
+            self.client.get(self.post_url(new_post)).status_code,
+            HTTPStatus.NOT_FOUND,
+        )
+
+    def test_recent_versions_read_primary(self):
+        '''После смены версий ленты чтение идет в основную базу, и кэш не
+        сохраняет отставшую реплику под новыми версиями'''
+        Post.objects.create(author=self.author, text='Свежий пост')
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'Свежий пост')
+        with override_settings(REPLICA_MAX_LAG_SECONDS=0):
+            self.assertContains(
+                self.client.get(reverse('posts:index')), 'Свежий пост'
+            )
+
+    @override_settings(REPLICA_MAX_LAG_SECONDS=0)
+    def test_search_reads_replica_index(self):
+        '''Поиск читает совпадения из индекса той же реплики, что и
+        посты'''
+        self.post.text = 'Другой текст'
+        self.post.save()
+        response = self.client.get(
+            reverse('posts:search'), {SearchSet.QUERY_PARAM: 'Пост'}
+        )
+        self.assertEqual(
+            [post.pk for post in response.context['page_obj']],
+            [self.post.pk],
+        )
+        self.assertEqual(response.context['page_obj'][0].text, 'Пост')
+
+    def test_writes_go_to_primary(self):
+        '''Запись не попадает на реплику до репликации'''
+        self.author_client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.pk}),
+            data={'text': 'Коментарий'},
+        )
+        self.assertTrue(self.post.comments.using('default').exists())
+        self.assertFalse(self.post.comments.using('replica').exists())
+
+
+@override_settings(PROFILING_ENABLED=True)
+class ProfilingMiddlewareTest(TestCase):
+    '''Класс тестов профилирования запросов'''
+    @classmethod
+    def setUpClass(cls):
+        '''Фикстуры класса'''
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.staff = User.objects.create_user(username='staff', is_staff=True)
+        Post.objects.create(author=cls.author, text='Тестовый пост')
+
+    def setUp(self):
+        '''Фикстуры'''
+        cache.clear()
+        clear_profiling_stats()
+        self.staff_client = Client()
+        self.staff_client.force_login(ProfilingMiddlewareTest.staff)
+
+    @override_settings(PAGE_CACHE_ENABLED=False)
+    def test_server_timing_header(self):
+        '''Заголовок Server-Timing с SQL, шаблонами и кэшем'''
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('posts:index'))
+        timing = response['Server-Timing']
+        self.assertIn(f'desc="{len(queries)} queries"', timing)
+        for metric in ('sql;dur=', 'tpl;dur=', 'cache;dur=', 'total;dur='):
+            with self.subTest(metric=metric):
+                self.assertIn(metric, timing)
+        cached = self.client.get(reverse('posts:index'))['Server-Timing']
+        self.assertGreater(
+            int(re.search(HITS_PATTERN, cached)[1]),
+            int(re.search(HITS_PATTERN, timing)[1]),
+        )
+
+    def test_stats_for_staff_only(self):
+        '''Сводка по view с временем шаблонов доступна администраторам'''
+        self.client.get(reverse('posts:index'))
+        with timed('thumbnail'):
+            pass
+        stats = self.staff_client.get(reverse('profiling_stats')).json()
+        self.assertEqual(stats['posts:index']['requests'], 1)
+        self.assertIn(
+            'posts/includes/post_card.html',
+            stats['posts:index']['templates_ms'],
+        )
+        self.assertIn('thumbnail', stats['background:thumbnail']['timers_ms'])
+        self.assertEqual(
+            self.client.get(reverse('profiling_stats')).status_code,
+            HTTPStatus.FOUND,
+        )
+
+    @override_settings(PROFILING_ENABLED=False)
+    def test_disabled_by_default(self):
+        '''Без настройки middleware не подключается'''
+        response = self.client.get(reverse('posts:index'))
+        self.assertFalse(response.has_header('Server-Timing'))
@@ -0,0 +1,52 @@
+'''Версии (поколения) групп кэшированных данных.
+
+Ключи кэша включают версию своей группы: вместо удаления записей
+достаточно выдать группе новую версию, после чего старые записи больше
+не читаются и вытесняются по таймауту. Недавно выданные версии
+переводят чтение запроса с реплики на основную базу (core.routers).
+'''
+import time
+from datetime import datetime, timezone
+
+from django.core.cache import cache
+
+from .routers import read_primary_after
+
+VERSION_KEY_PREFIX = 'version'
+
+
+def version_key(namespace, obj_id=''):
+    '''Ключ кэша, в котором хранится версия группы'''
+    return f'{VERSION_KEY_PREFIX}:{namespace}:{obj_id}'
+
+
+def new_version():
+    '''Новая версия, не совпадающая ни с одной из выданных ранее'''
+    return time.time_ns()
+
+
+def get_versions(*scopes):
+    '''Текущие версии групп (namespace, id), недостающие создаются'''
+    keys = [version_key(*scope) for scope in scopes]
+    versions = cache.get_many(keys)
+    missing = {key: new_version() for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        versions.update(missing)
+    versions = [versions[key] for key in keys]
+    read_primary_after(versions)
+
+    return versions
+
+
+def bump_versions(*scopes):
+    '''Смена версий групп (namespace, id): их старые записи устаревают'''
+    cache.set_many(
+        {version_key(*scope): new_version() for scope in scopes},
+        timeout=None,
+    )
+
+
+def version_time(version):
+    '''Момент выдачи версии (версия - время в наносекундах)'''
+    return datetime.fromtimestamp(version / 10 ** 9, tz=timezone.utc)
@@ -1,5 +1,9 @@
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse
 from django.shortcuts import render
 
+from .profiling import profiling_stats
+
 
 def page_not_found(request, exception):
 
@@ -9,3 +13,10 @@ def page_not_found(request, exception):
 def csrf_failure(request, reason=''):
 
     return render(request, 'core/403csrf.html')
+
+
+@staff_member_required
+def profiling_stats_view(request):
+    '''Сводка замеров последних запросов по view для администраторов'''
+
+    return JsonResponse(profiling_stats())
@@ -1,6 +1,7 @@
 from django.contrib import admin
 
 from .models import Post, Group, Comment, Follow
+from .search import matching_post_ids, query_terms, search_enabled
 
 
 @admin.register(Post)
@@ -18,6 +19,18 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ('created',)
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        '''Поиск по индексу FTS5 вместо LIKE по всей таблице'''
+        if not search_term or not search_enabled():
+            return super().get_search_results(
+                request, queryset, search_term
+            )
+        terms = query_terms(search_term)
+        if not terms:
+            return queryset.none(), False
+
+        return queryset.filter(pk__in=matching_post_ids(terms)), False
+
 
 @admin.register(Group)
 class GroupAdmin(admin.ModelAdmin):
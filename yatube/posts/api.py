@@ -0,0 +1,118 @@
+'''JSON API лент только для чтения.
+
+Ленты, пагинация и карточки постов (posts.hydration) те же, что у
+HTML-страниц, посты сериализуются posts.serializers. Ответы поддерживают
+условный GET (posts.conditional): при неизменной ленте отдается 304 без
+запроса постов.
+'''
+from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import require_safe
+from django.views.decorators.vary import vary_on_cookie
+
+from core.routers import replica_reads
+
+from .conditional import (
+    conditional_feed,
+    follow_freshness,
+    group_freshness,
+    index_freshness,
+    post_freshness,
+    profile_freshness,
+)
+from .constants import PageSet
+from .counters import counters_for
+from .hydration import card_page, feed_cards
+from .models import Group, Post, User
+from .serializers import FeedSerializer, serialize_counters
+from .timeline import follow_feed
+from .utils import add_paginator, page_links
+
+API_VARIANT = 'json'
+
+
+def feed_response(request, posts, serializer=None, **extra):
+    '''Ответ со страницей постов и ссылками на соседние страницы'''
+    serializer = serializer or FeedSerializer()
+    page_obj = card_page(add_paginator(request, posts))
+    data = dict(extra)
+    data['results'] = serializer.posts(page_obj)
+    data.update(page_links(request, page_obj))
+
+    return JsonResponse(data, json_dumps_params={'ensure_ascii': False})
+
+
+@replica_reads
+@require_safe
+@conditional_feed(index_freshness, API_VARIANT)
+def index(request):
+    '''Главная лента'''
+    posts = feed_cards(Post.objects.all(), with_text=True)
+
+    return feed_response(request, posts)
+
+
+@replica_reads
+@require_safe
+@conditional_feed(group_freshness, API_VARIANT)
+def group_posts(request, slug):
+    '''Лента группы'''
+    group = get_object_or_404(Group, slug=slug)
+    serializer = FeedSerializer()
+    posts = feed_cards(group.posts.all(), with_text=True)
+
+    return feed_response(
+        request, posts, serializer, group=serializer.group(group)
+    )
+
+
+@replica_reads
+@require_safe
+@conditional_feed(profile_freshness, API_VARIANT)
+def profile(request, username):
+    '''Лента автора со счетчиками профиля'''
+    author = get_object_or_404(
+        User.objects.select_related('counters'), username=username
+    )
+    serializer = FeedSerializer()
+    posts = feed_cards(author.posts.all(), with_text=True)
+    author_data = dict(serializer.user(author))
+    author_data.update(serialize_counters(counters_for(author)))
+
+    return feed_response(request, posts, serializer, author=author_data)
+
+
+@replica_reads
+@require_safe
+@conditional_feed(post_freshness, API_VARIANT)
+def post_detail(request, post_id):
+    '''Пост со страницей коментариев'''
+    post = get_object_or_404(
+        Post.objects.select_related('author', 'group'), id=post_id
+    )
+    comments = add_paginator(
+        request,
+        post.comments.select_related('author',),
+        PageSet.COMMENTS_AMOUNT_AT_PAGE,
+    )
+    serializer = FeedSerializer()
+    data = {
+        'post': serializer.post(post),
+        'comments': serializer.comments(comments),
+    }
+    data.update(page_links(request, comments))
+
+    return JsonResponse(data, json_dumps_params={'ensure_ascii': False})
+
+
+@replica_reads
+@login_required
+@require_safe
+@vary_on_cookie
+@conditional_feed(follow_freshness, API_VARIANT)
+def follow_index(request):
+    '''Лента подписок пользователя'''
+    return feed_response(
+        request, feed_cards(follow_feed(request.user), with_text=True)
+    )
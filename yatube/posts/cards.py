@@ -0,0 +1,63 @@
+'''Кэш отрендеренных карточек постов.
+
+Карточка поста в ленте почти не меняется, но при промахе кэша
+фрагмента ленты рендерится заново вместе со всеми соседями: include,
+url, linebreaks. Поэтому каждая карточка кэшируется отдельно с ключом
+из id поста, варианта карточки и версий поста и данных его автора и
+группы (posts.invalidation). Карточки страницы читаются одним get_many, а
+рендерятся и сохраняются одним set_many только отсутствующие: новый
+пост в ленте стоит рендера одной карточки.
+'''
+from django.core.cache import cache
+from django.template.loader import get_template
+
+from core.versioning import get_versions
+
+from .constants import CacheSet
+
+CARD_TEMPLATE = 'posts/includes/post_card.html'
+
+
+def card_scopes(post):
+    '''Группы кэша, от которых зависит карточка'''
+    scopes = [
+        (CacheSet.POST, post.pk), (CacheSet.USER_DATA, post.author_id)
+    ]
+    if post.group_id:
+        scopes.append((CacheSet.GROUP_DATA, post.group_id))
+
+    return scopes
+
+
+def card_key(post, show_group, versions):
+    scopes_versions = ':'.join(
+        str(versions[scope]) for scope in card_scopes(post)
+    )
+
+    return (
+        f'{CacheSet.CARD_KEY_PREFIX}:{post.pk}:{int(show_group)}:'
+        f'{scopes_versions}'
+    )
+
+
+def render_cards(posts, show_group=True):
+    '''HTML карточек постов страницы в порядке posts'''
+    posts = list(posts)
+    scopes = list({
+        scope: None for post in posts for scope in card_scopes(post)
+    })
+    versions = dict(zip(scopes, get_versions(*scopes)))
+    keys = [card_key(post, show_group, versions) for post in posts]
+    cards = cache.get_many(keys)
+    missing = {}
+    template = get_template(CARD_TEMPLATE)
+    for post, key in zip(posts, keys):
+        if key not in cards:
+            missing[key] = cards[key] = template.render({
+                'post': post,
+                'show_group': show_group,
+            })
+    if missing:
+        cache.set_many(missing, CacheSet.CARD_TIMEOUT)
+
+    return [cards[key] for key in keys]
@@ -0,0 +1,204 @@
+'''Метаданные свежести лент для условных GET-запросов.
+
+Свежесть страницы - это версии групп кэша, от которых она зависит
+(posts.invalidation), и даты ее постов (или коментария поста). Страница
+ленты зависит от версии ленты и от тех же групп, что карточки ее постов
+(posts.cards): версии поста (число и последний коментарий), данных
+автора и группы (имя автора, название группы). Они читаются одним
+коротким запросом по индексу (id, даты, авторы и группы постов той же
+страницы, что выберет view) и одним обращением к кэшу. Из них строятся
+ETag и Last-Modified, и при совпадении с заголовками клиента ответ 304
+отдается без запроса ленты и рендера. Версия - момент ее выдачи, а
+версии меняют сигналы моделей (posts.signals), поэтому Last-Modified
+сдвигается и при правке, удалении, коментарии или подписке, в том числе
+из админки и консоли, а не только при новом посте.
+
+HTML-страницы зависят еще и от пользователя (шапка, кнопка подписки),
+поэтому он входит в ETag, а анонимные страницы помечаются как публичные
+для браузеров и обратных прокси.
+'''
+import hashlib
+from http import HTTPStatus
+from collections import namedtuple
+from functools import wraps
+
+from django.db.models import Max
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.decorators.http import condition
+
+from core.middleware import remember_page_versions
+from core.versioning import get_versions, version_time
+
+from .cards import card_scopes
+from .constants import CacheSet
+from .models import Group, Post, User
+from .invalidation import follow_scopes
+from .timeline import follow_feed, pulled_author_ids
+from .utils import add_paginator
+
+Freshness = namedtuple('Freshness', ('versions', 'last_modified'))
+CACHEABLE_STATUSES = (HTTPStatus.OK, HTTPStatus.NOT_MODIFIED)
+
+
+def freshness(scopes, *created):
+    '''Свежесть по группам кэша (namespace, id) и датам записей'''
+    versions = get_versions(*scopes)
+    moments = [moment for moment in created if moment is not None]
+    moments.extend(version_time(version) for version in versions)
+
+    return Freshness(tuple(zip(scopes, versions)), max(moments))
+
+
+def page_scopes(posts, *scopes):
+    '''Группы кэша страницы ленты: группы самой ленты и группы карточек
+    ее постов'''
+    return list(dict.fromkeys([
+        *scopes, *(scope for post in posts for scope in card_scopes(post))
+    ]))
+
+
+def page_posts(request, posts):
+    '''Посты страницы ленты, которую выберет view, только с датами,
+    авторами и группами'''
+    return list(add_paginator(
+        request, posts.only('created', 'author', 'group')
+    ))
+
+
+def page_freshness(posts, *scopes):
+    return freshness(
+        page_scopes(posts, *scopes), *(post.created for post in posts)
+    )
+
+
+def index_freshness(request):
+    posts = page_posts(request, Post.objects.all())
+
+    return page_freshness(posts, (CacheSet.FEED, ''))
+
+
+def group_freshness(request, slug):
+    posts = page_posts(request, Post.objects.filter(group__slug=slug))
+    if posts:
+        group_id = posts[0].group_id
+    else:
+        group_id = Group.objects.filter(slug=slug).values_list(
+            'pk', flat=True
+        ).first()
+        if group_id is None:
+            return None
+
+    return page_freshness(posts, (CacheSet.GROUP, group_id))
+
+
+def profile_freshness(request, username):
+    posts = page_posts(
+        request, Post.objects.filter(author__username=username)
+    )
+    if posts:
+        author_id = posts[0].author_id
+    else:
+        author_id = User.objects.filter(username=username).values_list(
+            'pk', flat=True
+        ).first()
+        if author_id is None:
+            return None
+
+    return page_freshness(posts, (CacheSet.AUTHOR, author_id))
+
+
+def post_freshness(request, post_id):
+    row = Post.objects.filter(pk=post_id).annotate(
+        latest_comment=Max('comments__created')
+    ).values_list('author_id', 'created', 'latest_comment').first()
+    if row is None:
+        return None
+    author_id, created, latest_comment = row
+
+    return freshness(
+        [(CacheSet.POST, post_id), (CacheSet.AUTHOR, author_id)],
+        created,
+        latest_comment,
+    )
+
+
+def follow_freshness(request):
+    pulled_ids = pulled_author_ids(request.user)
+    posts = page_posts(request, follow_feed(request.user, pulled_ids))
+
+    return page_freshness(
+        posts, *follow_scopes(request.user.pk, pulled_ids)
+    )
+
+
+def memoized(freshness_func):
+    '''Свежесть считается один раз на запрос для ETag и Last-Modified'''
+    @wraps(freshness_func)
+    def inner(request, *args, **kwargs):
+        computed = request.__dict__.setdefault('_freshness', {})
+        if freshness_func not in computed:
+            state = computed[freshness_func] = freshness_func(
+                request, *args, **kwargs
+            )
+            # Версии прочитаны до view, с ними страница попадет в кэш
+            if state is not None:
+                remember_page_versions(request, state.versions)
+
+        return computed[freshness_func]
+
+    return inner
+
+
+def conditional_feed(freshness_func, variant):
+    '''Условный GET для ленты: ETag и Last-Modified по ее свежести.
+
+    variant различает представления одной страницы (HTML, JSON), адрес с
+    параметрами - страницы ленты, пользователь - его вариант страницы.
+    '''
+    freshness_func = memoized(freshness_func)
+
+    def etag(request, *args, **kwargs):
+        state = freshness_func(request, *args, **kwargs)
+        if state is None:
+            return None
+        raw = '|'.join((
+            variant,
+            str(request.user.pk),
+            request.get_full_path(),
+            repr(state.versions),
+            state.last_modified.isoformat(),
+        ))
+
+        return hashlib.md5(raw.encode()).hexdigest()
+
+    def last_modified(request, *args, **kwargs):
+        state = freshness_func(request, *args, **kwargs)
+
+        return state and state.last_modified
+
+    return condition(etag_func=etag, last_modified_func=last_modified)
+
+
+def feed_cache_control(view):
+    '''Политика HTTP-кэширования страницы ленты.
+
+    Анонимная страница одинакова для всех и может храниться в общих
+    кэшах FEED_MAX_AGE секунд, страница пользователя - только в браузере
+    и с проверкой по ETag. Ответ различается по Cookie (сессии).
+    '''
+    @wraps(view)
+    def inner(request, *args, **kwargs):
+        response = view(request, *args, **kwargs)
+        if response.status_code not in CACHEABLE_STATUSES:
+            return response
+        if request.user.is_authenticated:
+            patch_cache_control(response, private=True, no_cache=True)
+        else:
+            patch_cache_control(
+                response, public=True, max_age=CacheSet.FEED_MAX_AGE
+            )
+        patch_vary_headers(response, ('Cookie',))
+
+        return response
+
+    return inner
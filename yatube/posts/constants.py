@@ -3,8 +3,91 @@
 
 class PageSet:
     POSTS_AMOUNT_AT_PADGE = 10
+    COMMENTS_AMOUNT_AT_PAGE = 20
     ADITIONAL_POSTS_FOR_TEST = 1
+    CURSOR_PARAM = 'cursor'
+    CURSOR_NEXT = 'n'
+    CURSOR_PREVIOUS = 'p'
+    CURSOR_DIRECTIONS = (CURSOR_NEXT, CURSOR_PREVIOUS)
+    # Ключ курсора лент по умолчанию (posts.utils.CursorPaginator)
+    FEED_ORDERING = ('-created', '-pk')
+    # Пагинатор ссылок ?page=N: lookahead - без COUNT(*) на каждый запрос
+    # (posts.utils.LookaheadPaginator), count - Paginator Django
+    OFFSET_LOOKAHEAD = 'lookahead'
+    OFFSET_COUNT = 'count'
+    OFFSET_MODE = OFFSET_LOOKAHEAD
+    PAGE_RANGE_WINDOW = 3
+    APPROX_COUNT_TIMEOUT = 300
+    APPROX_COUNT_KEY_PREFIX = 'approx_count'
+
+
+class TextSet:
+    EXCERPT_CHARS = 400
+    COMMENT_PREVIEW_CHARS = 150
+    RENDER_BATCH_SIZE = 1000
 
 
 class MetaSet:
     MAX_CHARS_IN_TEXT_STR = 15
+
+
+class TimelineSet:
+    FANOUT_FOLLOWERS_LIMIT = 1000
+    # Миграция 0013 заполнила ленты по 800 постов автора. Она уже
+    # применена и не меняется, а новые заполнения (rebuild_timelines,
+    # подписка, возврат к рассылке) берут меньше: на больших базах 800
+    # давали гигабайты записей лент
+    BACKFILL_POSTS_AMOUNT = 200
+    FANOUT_BATCH_SIZE = 500
+
+
+class CacheSet:
+    FRAGMENT_TIMEOUT = 20
+    FEED_MAX_AGE = 20
+    FRAGMENT_KEY_PREFIX = 'feed_fragment'
+    STATS_KEY_PREFIX = 'feed_fragment_stats'
+    FEED = 'feed'
+    AUTHOR = 'author'
+    GROUP = 'group'
+    FOLLOW = 'follow'
+    POST = 'post'
+    FEED_NAMESPACES = (FEED, GROUP, AUTHOR, FOLLOW)
+    # Данные автора и группы в карточках постов, в отличие от лент AUTHOR
+    # и GROUP не меняются от новых постов
+    USER_DATA = 'user_data'
+    GROUP_DATA = 'group_data'
+    CARD_KEY_PREFIX = 'post_card'
+    CARD_TIMEOUT = 60 * 60 * 24
+    # Авторы, группы и последние коментарии карточек лент
+    # (posts.hydration)
+    HYDRATE_KEY_PREFIX = 'hydrate'
+    HYDRATE_TIMEOUT = 60 * 60 * 24
+    HYDRATE_BATCH_SIZE = 100
+
+
+class ImageSet:
+    THUMBNAIL_GEOMETRY = '960x339'
+    THUMBNAIL_OPTIONS = {'crop': 'center', 'upscale': True}
+    THUMBNAIL_WORKERS = 2
+    # Ограничения загрузки (posts.images): размер файла, стороны и число
+    # пикселей по заголовку картинки
+    MAX_UPLOAD_BYTES = 10 * 1024 * 1024
+    MAX_SIDE = 10000
+    MAX_PIXELS = 40_000_000
+    UPLOAD_FORMATS = ('JPEG', 'PNG', 'GIF', 'WEBP')
+    # Хранимая копия: большая сторона не длиннее STORED_MAX_SIDE, формат
+    # STORED_FORMAT без EXIF
+    STORED_MAX_SIDE = 2048
+    STORED_FORMAT = 'WEBP'
+    STORED_EXTENSION = '.webp'
+    STORED_QUALITY = 85
+
+
+class SearchSet:
+    TABLE = 'posts_search'
+    QUERY_PARAM = 'q'
+    RESULTS_AMOUNT_AT_PAGE = 10
+    MAX_QUERY_TERMS = 8
+    RANK_WINDOW = 1000
+    SNIPPET_WORDS = 30
+    INDEX_BATCH_SIZE = 1000
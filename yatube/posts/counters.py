@@ -0,0 +1,90 @@
+'''Денормализованные счетчики постов, подписок и коментариев.
+
+Счетчики меняются атомарно через F() при записи Post, Follow и Comment
+(см. posts.signals). Массовые операции (bulk_create, queryset.update)
+сигналов не вызывают, поэтому расхождения исправляет recount_counters()
+и команда manage.py recount_counters. Отсутствующие счетчики
+пользователя пересчитываются при первом обращении.
+'''
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Comment, Follow, Post, User, UserCounters
+
+
+USER_COUNTER_SOURCES = {
+    'posts_count': (Post, 'author'),
+    'followers_count': (Follow, 'author'),
+    'following_count': (Follow, 'user'),
+}
+
+
+def change_user_counters(user_id, **deltas):
+    '''Атомарное изменение счетчиков пользователя на заданные величины'''
+    UserCounters.objects.filter(user_id=user_id).update(**{
+        field: Greatest(F(field) + delta, 0)
+        for field, delta in deltas.items()
+    })
+
+
+def change_comments_count(post_id, delta):
+    '''Атомарное изменение числа коментариев поста'''
+    Post.objects.filter(pk=post_id).update(
+        comments_count=Greatest(F('comments_count') + delta, 0)
+    )
+
+
+def counters_for(user):
+    '''Счетчики пользователя, отсутствующие пересчитываются'''
+    try:
+        return user.counters
+    except UserCounters.DoesNotExist:
+        recount_counters(User.objects.filter(pk=user.pk))
+
+        return UserCounters.objects.get(user=user)
+
+
+def count_of(model, lookup, outer_field):
+    '''Подзапрос числа строк model, ссылающихся на внешнюю строку'''
+    rows = model.objects.filter(
+        **{lookup: OuterRef(outer_field)}
+    ).order_by().values(lookup).annotate(total=Count('pk')).values('total')
+
+    return Coalesce(Subquery(rows), 0)
+
+
+def recount_counters(users=None):
+    '''Пересчет счетчиков по исходным таблицам.
+
+    Возвращает число исправленных счетчиков пользователей и постов.
+    '''
+    users = User.objects.all() if users is None else users
+    UserCounters.objects.bulk_create(
+        [UserCounters(user_id=user_id) for user_id in users.filter(
+            counters__isnull=True).values_list('pk', flat=True)],
+        ignore_conflicts=True,
+    )
+    user_counts = {
+        field: count_of(model, lookup, 'user_id')
+        for field, (model, lookup) in USER_COUNTER_SOURCES.items()
+    }
+    drifted_users = UserCounters.objects.filter(user__in=users).annotate(
+        **{'real_' + field: count for field, count in user_counts.items()}
+    ).exclude(
+        **{field: F('real_' + field) for field in user_counts}
+    )
+    fixed = drifted_users.count()
+    UserCounters.objects.filter(
+        pk__in=drifted_users.values('pk')
+    ).update(**user_counts)
+
+    comments = count_of(Comment, 'post', 'pk')
+    drifted_posts = Post.objects.filter(author__in=users).annotate(
+        real_comments_count=comments
+    ).exclude(comments_count=F('real_comments_count'))
+    fixed += drifted_posts.count()
+    Post.objects.filter(
+        pk__in=drifted_posts.values('pk')
+    ).update(comments_count=comments)
+
+    return fixed
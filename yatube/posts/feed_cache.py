@@ -0,0 +1,84 @@
+'''Кэш отрендеренных фрагментов лент.
+
+Ключ фрагмента включает ленту (общая, группа, автор, подписки), ее
+объект, текущую версию ленты и страницу, разобранную пагинатором (номер
+или курсор, а не строки запроса), поэтому разные
+страницы и варианты ленты не пересекаются, а запись поста выдает ленте
+новую версию. Вместе с фрагментом хранятся версии его карточек
+(posts.cards): новый коментарий или имя автора меняют только их, и
+фрагмент собирается заново из кэша карточек. Попадания и промахи
+считаются в общем кэше по лентам.
+'''
+import hashlib
+
+from django.core.cache import cache
+
+from core.versioning import get_versions
+
+from .constants import CacheSet
+
+
+def feed_versions(scopes):
+    '''Версии групп кэша ленты одной строкой'''
+    versions = ':'.join(map(str, get_versions(*scopes)))
+    if len(scopes) == 1:
+        return versions
+
+    return hashlib.md5(versions.encode()).hexdigest()
+
+
+def page_part(page_obj):
+    '''Страница в ключе: номер страницы или разобранный курсор. Битые и
+    неверные параметры дают ту же страницу, что выбрал пагинатор'''
+    paginator = page_obj.paginator
+    if not getattr(paginator, 'is_cursor', False):
+        return f'page{page_obj.number}'
+    if paginator.cursor is None:
+        return 'cursor'
+    direction, created, pk = paginator.cursor
+    cursor = f'{direction}|{created.isoformat()}|{pk}'
+
+    return 'cursor' + hashlib.md5(cursor.encode()).hexdigest()
+
+
+def feed_cache_key(page_obj, namespace, obj_id='', scopes=None):
+    '''Ключ фрагмента страницы ленты с учетом версии и пагинации.
+
+    scopes - группы кэша ленты, если она зависит не только от своей.
+    '''
+    return ':'.join((
+        CacheSet.FRAGMENT_KEY_PREFIX,
+        namespace,
+        str(obj_id),
+        feed_versions(scopes or [(namespace, obj_id)]),
+        page_part(page_obj),
+    ))
+
+
+def stats_key(namespace, outcome):
+    return f'{CacheSet.STATS_KEY_PREFIX}:{namespace}:{outcome}'
+
+
+def record_lookup(namespace, hit):
+    '''Учет попадания или промаха кэша фрагментов ленты'''
+    key = stats_key(namespace, 'hits' if hit else 'misses')
+    if not cache.add(key, 1, timeout=None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, timeout=None)
+
+
+def feed_cache_stats():
+    '''Счетчики попаданий и промахов кэша по лентам'''
+    keys = {
+        (namespace, outcome): stats_key(namespace, outcome)
+        for namespace in CacheSet.FEED_NAMESPACES
+        for outcome in ('hits', 'misses')
+    }
+    values = cache.get_many(keys.values())
+    stats = {}
+    for (namespace, outcome), key in keys.items():
+        stats.setdefault(namespace, {})[outcome] = values.get(key, 0)
+
+    return stats
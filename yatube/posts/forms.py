@@ -1,5 +1,7 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
 
+from .images import check_upload
 from .models import Post, Comment
 
 
@@ -8,6 +10,14 @@ class PostForm(forms.ModelForm):
         model = Post
         fields = ('text', 'group', 'image')
 
+    def clean_image(self):
+        '''Ограничения загрузки по заголовку картинки (posts.images)'''
+        image = self.cleaned_data['image']
+        if isinstance(image, UploadedFile):
+            check_upload(image)
+
+        return image
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,297 @@
+'''Легкие объекты постов для карточек лент и JSON API.
+
+Ленты показывают карточки (posts/includes/post_card.html), которым нужна
+дюжина колонок поста, автора и группы. feed_cards превращает queryset
+постов в values_list по колонкам самого поста (POST_FIELDS), поэтому
+пагинаторы и фильтры работают с ним как с queryset, а курсор строит
+именованные строки по created и pk. card_page собирает строки выбранной
+страницы в PostCard с __slots__: шаблоны, кэш карточек (posts.cards) и
+сериализатор API читают у них те же атрибуты, что у Post. Полный текст
+есть только у карточек, для которых его запросили в feed_cards: без него
+обращение к text - AttributeError, а не скрытый запрос. Карточка - не
+модель: она равна по pk объекту своей модели (card == post), но
+isinstance и Model.__eq__ ее за модель не принимают.
+
+Авторов, группы и последние коментарии постов пачки добирает hydrate:
+вместо JOIN на каждой странице они читаются из кэша одним get_many
+вместе с версиями USER_DATA, GROUP_DATA и POST (core.versioning), а
+промахи - одним запросом на тип данных. Запись кэша хранит версию, с
+которой прочитана, поэтому после смены имени автора или группы и нового
+коментария (posts.invalidation) она перечитывается из базы. Каждый
+автор и группа собираются один раз на пачку. Число коментариев -
+колонка comments_count поста (posts.counters), последний коментарий
+ищется только у постов с коментариями.
+'''
+from collections import defaultdict, namedtuple
+from itertools import islice
+
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.db.models import OuterRef, Subquery
+from django.db.models.functions import Substr
+
+from core.routers import read_primary_after
+from core.versioning import get_versions, version_key
+
+from .constants import CacheSet, TextSet
+from .models import Comment, Group, Post, User
+from .rendering import cut_raw_excerpts, raw_excerpt
+
+POST_FIELDS = (
+    'pk',
+    'created',
+    'author_id',
+    'group_id',
+    'image',
+    'thumbnail_url',
+    'thumbnail_width',
+    'thumbnail_height',
+    'excerpt_html',
+    'excerpt_truncated',
+    'comments_count',
+    'raw_excerpt',
+)
+
+
+class ImageCard:
+    '''Имя файла картинки поста с url, как у ImageFieldFile'''
+    __slots__ = ('name',)
+
+    def __init__(self, name):
+        self.name = name
+
+    def __bool__(self):
+        return bool(self.name)
+
+    def __str__(self):
+        return self.name or ''
+
+    @property
+    def url(self):
+        return default_storage.url(self.name)
+
+
+class Card:
+    '''Равенство по pk, как у моделей Django'''
+    __slots__ = ()
+    model = None
+
+    @property
+    def id(self):
+        return self.pk
+
+    def __eq__(self, other):
+        if isinstance(other, (type(self), self.model)):
+            return self.pk == other.pk
+
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self.pk)
+
+
+class AuthorCard(Card):
+    '''Автор поста в карточке'''
+    __slots__ = ('pk', 'username', 'first_name', 'last_name')
+    model = User
+
+    def __init__(self, pk, username, first_name, last_name):
+        self.pk = pk
+        self.username = username
+        self.first_name = first_name
+        self.last_name = last_name
+
+    def get_full_name(self):
+        return f'{self.first_name} {self.last_name}'.strip()
+
+    def __str__(self):
+        return self.username
+
+
+class GroupCard(Card):
+    '''Группа поста в карточке'''
+    __slots__ = ('pk', 'slug', 'title')
+    model = Group
+
+    def __init__(self, pk, slug, title):
+        self.pk = pk
+        self.slug = slug
+        self.title = title
+
+    def __str__(self):
+        return self.title
+
+
+class CommentCard(Card):
+    '''Последний коментарий поста в карточке, text - его начало'''
+    __slots__ = ('pk', 'created', 'text', 'author')
+    model = Comment
+
+    def __init__(self, pk, created, text, author):
+        self.pk = pk
+        self.created = created
+        self.text = text
+        self.author = author
+
+
+class PostCard(Card):
+    '''Пост в карточке ленты, text - только из feed_cards(with_text=True)'''
+    __slots__ = (
+        'pk', 'created', 'author_id', 'group_id', 'image', 'thumbnail_url',
+        'thumbnail_width', 'thumbnail_height', 'excerpt_html',
+        'excerpt_truncated', 'comments_count', 'raw_excerpt', 'text',
+        'author', 'group', 'latest_comment',
+    )
+    model = Post
+
+    def __repr__(self):
+        return f'<PostCard: {self.pk}>'
+
+
+def load_authors(ids):
+    return User.objects.filter(pk__in=ids).values_list(
+        'pk', 'username', 'first_name', 'last_name'
+    )
+
+
+def load_groups(ids):
+    return Group.objects.filter(pk__in=ids).values_list('pk', 'slug', 'title')
+
+
+def load_latest_comments(post_ids):
+    '''Последние коментарии постов одним запросом: подзапрос берет id
+    последнего коментария каждого поста по индексу (post, created).
+    Имя автора коментария хранится в записи поста и обновляется с ее
+    версией'''
+    latest_ids = Post.objects.filter(pk__in=post_ids).annotate(
+        latest_comment_id=Subquery(
+            Comment.objects.filter(post_id=OuterRef('pk')).order_by(
+                '-created', '-pk'
+            ).values('pk')[:1]
+        )
+    ).order_by().values('latest_comment_id')
+
+    return Comment.objects.filter(pk__in=latest_ids).annotate(
+        preview=Substr('text', 1, TextSet.COMMENT_PREVIEW_CHARS + 1)
+    ).order_by().values_list(
+        'post_id', 'pk', 'created', 'preview', 'author_id',
+        'author__username', 'author__first_name', 'author__last_name',
+    )
+
+
+def comment_card(post_id, pk, created, preview, *author):
+    if len(preview) > TextSet.COMMENT_PREVIEW_CHARS:
+        preview = preview[:TextSet.COMMENT_PREVIEW_CHARS].rstrip() + '…'
+
+    return CommentCard(pk, created, preview, AuthorCard(*author))
+
+
+# Данные, которые hydrate добирает к постам: группа версий кэша, запрос
+# строк (id, *значения) по списку id и сборка объекта из строки
+Entity = namedtuple('Entity', ('name', 'namespace', 'load', 'build'))
+AUTHORS = Entity('author', CacheSet.USER_DATA, load_authors, AuthorCard)
+GROUPS = Entity('group', CacheSet.GROUP_DATA, load_groups, GroupCard)
+LATEST_COMMENTS = Entity(
+    'latest_comment', CacheSet.POST, load_latest_comments, comment_card
+)
+
+
+def entity_key(entity, pk):
+    return f'{CacheSet.HYDRATE_KEY_PREFIX}:{entity.name}:{pk}'
+
+
+def load_entities(wanted):
+    '''Объекты {entity: ids} в виде {entity: {id: карточка}}'''
+    items = [(entity, pk) for entity, ids in wanted.items() for pk in ids]
+    version_keys = [version_key(entity.namespace, pk) for entity, pk in items]
+    data_keys = [entity_key(entity, pk) for entity, pk in items]
+    found = cache.get_many(version_keys + data_keys)
+    versions = [found.get(key) for key in version_keys]
+    read_primary_after([version for version in versions if version])
+    unversioned = [
+        index for index, version in enumerate(versions) if version is None
+    ]
+    if unversioned:
+        created = get_versions(*(
+            (items[index][0].namespace, items[index][1])
+            for index in unversioned
+        ))
+        for index, version in zip(unversioned, created):
+            versions[index] = version
+    loaded = {entity: {} for entity in wanted}
+    misses = defaultdict(dict)
+    for (entity, pk), version, key in zip(items, versions, data_keys):
+        entry = found.get(key)
+        if entry is not None and entry[0] == version:
+            loaded[entity][pk] = entity.build(pk, *entry[1])
+        else:
+            misses[entity][pk] = (version, key)
+    fresh = {}
+    for entity, missing in misses.items():
+        for pk, *values in entity.load(list(missing)):
+            loaded[entity][pk] = entity.build(pk, *values)
+            version, key = missing[pk]
+            fresh[key] = (version, tuple(values))
+    if fresh:
+        cache.set_many(fresh, CacheSet.HYDRATE_TIMEOUT)
+
+    return loaded
+
+
+def hydrate(cards):
+    '''Авторы, группы и последние коментарии карточек постов'''
+    loaded = load_entities({
+        AUTHORS: {card.author_id for card in cards},
+        GROUPS: {card.group_id for card in cards if card.group_id},
+        LATEST_COMMENTS: {card.pk for card in cards if card.comments_count},
+    })
+    authors, groups = loaded[AUTHORS], loaded[GROUPS]
+    comments = loaded[LATEST_COMMENTS]
+    for card in cards:
+        card.author = authors.get(card.author_id)
+        card.group = groups.get(card.group_id)
+        card.latest_comment = comments.get(card.pk)
+
+    return cards
+
+
+def build_cards(rows):
+    '''Строки feed_cards в PostCard, пачками через hydrate'''
+    rows = iter(rows)
+    while True:
+        cards = []
+        for row in islice(rows, CacheSet.HYDRATE_BATCH_SIZE):
+            card = PostCard()
+            (
+                card.pk, card.created, card.author_id, card.group_id,
+                image, card.thumbnail_url, card.thumbnail_width,
+                card.thumbnail_height, card.excerpt_html,
+                card.excerpt_truncated, card.comments_count,
+                card.raw_excerpt,
+            ) = row[:len(POST_FIELDS)]
+            card.image = ImageCard(image)
+            if len(row) > len(POST_FIELDS):
+                card.text = row[-1]
+            cards.append(card)
+        if not cards:
+            return
+        yield from hydrate(cut_raw_excerpts(cards))
+
+
+def feed_cards(posts, with_text=False):
+    '''Queryset именованных строк постов для PostCard.
+
+    with_text добавляет полный текст поста (JSON API).
+    '''
+    fields = POST_FIELDS + ('text',) if with_text else POST_FIELDS
+
+    return posts.annotate(raw_excerpt=raw_excerpt()).values_list(
+        *fields, named=True
+    )
+
+
+def card_page(page_obj):
+    '''Страница пагинатора со строками feed_cards в виде PostCard'''
+    page_obj.object_list = list(build_cards(page_obj.object_list))
+
+    return page_obj
@@ -0,0 +1,108 @@
+'''Прием картинок постов.
+
+Загрузки пишутся во временный файл на диске, а не в память
+(FILE_UPLOAD_MAX_MEMORY_SIZE = 0 в settings). Форма проверяет файл по
+заголовку: ImageField Django открывает картинку без декодирования
+пикселей, check_upload сверяет с ImageSet формат, размер файла, стороны
+и число пикселей. Пост сохраняется с исходным файлом, а после любого
+сохранения с новой картинкой (сигнал post_save) reencode_image в пуле
+миниатюр (posts.thumbnails) уменьшает его до STORED_MAX_SIDE,
+поворачивает по EXIF-ориентации и сохраняет в STORED_FORMAT без EXIF.
+Исходный файл после этого удаляется, миниатюры строятся из новой копии.
+Картинки не больше STORED_MAX_SIDE без EXIF и анимации остаются как
+есть.
+'''
+import os
+from io import BytesIO
+
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.template.defaultfilters import filesizeformat
+from PIL import Image, ImageOps
+
+from .constants import ImageSet
+from .invalidation import invalidate_thumbnail
+from .models import Post
+
+
+def check_upload(upload):
+    '''Проверка загруженной картинки по заголовку'''
+    if upload.size > ImageSet.MAX_UPLOAD_BYTES:
+        raise ValidationError(
+            'Файл больше %(limit)s',
+            code='file_too_large',
+            params={'limit': filesizeformat(ImageSet.MAX_UPLOAD_BYTES)},
+        )
+    image = upload.image
+    if image.format not in ImageSet.UPLOAD_FORMATS:
+        raise ValidationError(
+            'Поддерживаются форматы %(formats)s',
+            code='unsupported_format',
+            params={'formats': ', '.join(ImageSet.UPLOAD_FORMATS)},
+        )
+    width, height = image.size
+    if (
+        max(width, height) > ImageSet.MAX_SIDE
+        or width * height > ImageSet.MAX_PIXELS
+    ):
+        raise ValidationError(
+            'Картинка больше %(side)s точек по стороне или %(pixels)s '
+            'мегапикселей',
+            code='image_too_large',
+            params={
+                'side': ImageSet.MAX_SIDE,
+                'pixels': ImageSet.MAX_PIXELS // 10 ** 6,
+            },
+        )
+
+
+def reencoded(source):
+    '''Уменьшенная копия картинки в STORED_FORMAT без EXIF или None, если
+    картинка уже в пределах STORED_MAX_SIDE без EXIF или это анимация,
+    которую копия потеряла бы'''
+    with Image.open(source) as image:
+        if getattr(image, 'is_animated', False):
+            return None
+        if (
+            max(image.size) <= ImageSet.STORED_MAX_SIDE
+            and not image.getexif()
+        ):
+            return None
+        bounds = (ImageSet.STORED_MAX_SIDE, ImageSet.STORED_MAX_SIDE)
+        # JPEG декодируется сразу в уменьшенном масштабе
+        image.draft('RGB', bounds)
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail(bounds)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert(
+                'RGBA' if image.mode in ('LA', 'PA', 'P') else 'RGB'
+            )
+        buffer = BytesIO()
+        # EXIF переносится только явным параметром exif, здесь его нет
+        image.save(
+            buffer, ImageSet.STORED_FORMAT, quality=ImageSet.STORED_QUALITY
+        )
+
+    return buffer.getvalue()
+
+
+def reencode_image(post_id):
+    '''Замена картинки поста уменьшенной копией без EXIF'''
+    post = Post.objects.filter(pk=post_id).only('image').first()
+    if post is None or not post.image:
+        return
+    original = post.image.name
+    with post.image.open('rb') as source:
+        content = reencoded(source)
+    if content is None:
+        return
+    storage = post.image.storage
+    stem = os.path.splitext(original)[0]
+    name = storage.save(stem + ImageSet.STORED_EXTENSION, ContentFile(content))
+    # Если картинку успели заменить, новая копия не нужна
+    updated = Post.objects.filter(pk=post_id, image=original).update(
+        image=name
+    )
+    storage.delete(original if updated else name)
+    if updated:
+        invalidate_thumbnail(post_id)
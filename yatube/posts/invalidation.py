@@ -0,0 +1,99 @@
+'''Точечная инвалидация кэша приложения posts.
+
+Каждая страница зависит от версий нескольких групп: общей ленты, автора,
+группы, ленты подписок пользователя или поста. События записи меняют
+версии только затронутых групп, поэтому остальной кэш не сбрасывается.
+Лента подписок зависит еще и от версий авторов, посты которых
+подмешиваются при чтении (posts.timeline): их посты не сбрасывают ленты
+каждого из подписчиков.
+'''
+from core.versioning import bump_versions, get_versions
+
+from .constants import CacheSet, TimelineSet
+from .models import Follow
+
+
+def feed_version(namespace, obj_id=''):
+    '''Текущая версия группы для ключа кэшируемого фрагмента'''
+    return get_versions((namespace, obj_id))[0]
+
+
+def follow_scopes(user_id, pulled_ids):
+    '''Группы кэша ленты подписок с авторами pulled_ids, посты которых
+    подмешиваются при чтении'''
+    return [
+        (CacheSet.FOLLOW, user_id),
+        *((CacheSet.AUTHOR, author_id) for author_id in pulled_ids),
+    ]
+
+
+def invalidate_post(post, old_group_id=None):
+    '''Сброс страниц, на которых виден созданный, измененный или удаленный
+    пост'''
+    scopes = [
+        (CacheSet.FEED, ''),
+        (CacheSet.AUTHOR, post.author_id),
+        (CacheSet.POST, post.pk),
+    ]
+    scopes.extend(
+        (CacheSet.GROUP, group_id)
+        for group_id in {post.group_id, old_group_id} if group_id
+    )
+    # Пусто, если посты автора подмешиваются при чтении
+    follower_ids = Follow.objects.filter(
+        author_id=post.author_id,
+        author__counters__followers_count__lte=(
+            TimelineSet.FANOUT_FOLLOWERS_LIMIT
+        ),
+    ).values_list('user_id', flat=True)
+    scopes.extend((CacheSet.FOLLOW, user_id) for user_id in follower_ids)
+    bump_versions(*scopes)
+
+
+def invalidate_comment(comment):
+    '''Сброс страницы и карточки поста, коментарии которого изменились.
+
+    Ленты зависят от версий своих постов (posts.conditional), поэтому
+    версии лент не меняются.
+    '''
+    bump_versions((CacheSet.POST, comment.post_id))
+
+
+def invalidate_thumbnail(post_id):
+    '''Сброс карточки и страницы поста с готовой миниатюрой'''
+    bump_versions((CacheSet.POST, post_id))
+
+
+def invalidate_author(user_id):
+    '''Сброс страниц и карточек с именем автора'''
+    bump_versions((CacheSet.AUTHOR, user_id), (CacheSet.USER_DATA, user_id))
+
+
+def invalidate_group(group_id):
+    '''Сброс страниц и карточек с данными группы'''
+    bump_versions((CacheSet.GROUP, group_id), (CacheSet.GROUP_DATA, group_id))
+
+
+def invalidate_group_posts(group_id, posts):
+    '''Сброс лент с постами удаленной группы: посты (pk, author_id)
+    остаются без группы'''
+    scopes = [
+        (CacheSet.FEED, ''),
+        (CacheSet.GROUP, group_id),
+        (CacheSet.GROUP_DATA, group_id),
+    ]
+    scopes.extend((CacheSet.POST, pk) for pk, _ in posts)
+    scopes.extend(
+        (CacheSet.AUTHOR, author_id)
+        for author_id in {author_id for _, author_id in posts}
+    )
+    bump_versions(*scopes)
+
+
+def invalidate_follow(user_id, author_id):
+    '''Сброс ленты подписок пользователя и счетчиков обоих профилей'''
+    bump_versions(
+        (CacheSet.FOLLOW, user_id),
+        (CacheSet.AUTHOR, author_id),
+        (CacheSet.AUTHOR, user_id),
+    )
@@ -0,0 +1,143 @@
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from posts.models import Comment, Post, User
+
+BENCH_COMMENT_TEXT = 'Коментарий нагрузочного теста'
+SAMPLE_SIZE = 100
+
+
+def percentile(timings, share):
+    if not timings:
+        return 0
+
+    return sorted(timings)[min(len(timings) - 1, int(len(timings) * share))]
+
+
+class Worker(threading.Thread):
+    '''Поток, повторяющий запрос до конца замера'''
+
+    def __init__(self, request, deadline):
+        super().__init__(daemon=True)
+        self.request = request
+        self.deadline = deadline
+        self.timings = []
+        self.errors = 0
+
+    def run(self):
+        try:
+            while time.perf_counter() < self.deadline:
+                started = time.perf_counter()
+                try:
+                    self.request()
+                except OperationalError:
+                    self.errors += 1
+                    continue
+                self.timings.append(time.perf_counter() - started)
+        finally:
+            connections.close_all()
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет чтение лент и постов под одновременной записью '
+        'коментариев (add_comment) на текущей базе SQLite. Для сравнения '
+        'с настройками SQLite по умолчанию: '
+        '--journal-mode DELETE --synchronous FULL. '
+        'Созданные коментарии удаляются после замера.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seconds', type=float, default=10)
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--writers', type=int, default=2)
+        parser.add_argument('--journal-mode')
+        parser.add_argument('--synchronous')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Команда рассчитана на базу SQLite')
+        randomizer = random.Random(options['seed'])
+        post_ids = list(Post.objects.order_by('-created').values_list(
+            'pk', flat=True
+        )[:SAMPLE_SIZE])
+        users = list(User.objects.order_by('?')[:options['writers']])
+        if not post_ids or len(users) < options['writers']:
+            raise CommandError('В базе мало постов или пользователей')
+        pragmas = dict(settings.SQLITE_PRAGMAS)
+        for name in ('journal_mode', 'synchronous'):
+            if options[name]:
+                pragmas[name] = options[name]
+        # Новые PRAGMA применяются к соединениям, открытым после этого
+        connections.close_all()
+        with override_settings(SQLITE_PRAGMAS=pragmas,
+                               PAGE_CACHE_ENABLED=False):
+            readers, writers = self.run_workers(
+                options, randomizer, post_ids, users
+            )
+            deleted, _ = Comment.objects.filter(
+                text=BENCH_COMMENT_TEXT
+            ).delete()
+        self.stdout.write(', '.join(
+            f'{name}={value}' for name, value in pragmas.items()
+        ))
+        self.report('Чтение', readers, options['seconds'])
+        self.report('Запись', writers, options['seconds'])
+        self.stdout.write(f'Удалено коментариев: {deleted}')
+
+    def run_workers(self, options, randomizer, post_ids, users):
+        deadline = time.perf_counter() + options['seconds']
+        readers = [
+            Worker(self.reader(randomizer, post_ids), deadline)
+            for _ in range(options['readers'])
+        ]
+        writers = [
+            Worker(self.writer(randomizer, post_ids, user), deadline)
+            for user in users
+        ]
+        workers = readers + writers
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        return readers, writers
+
+    def reader(self, randomizer, post_ids):
+        client = Client()
+        pages = [reverse('posts:index')] + [
+            reverse('posts:post_detail', kwargs={'post_id': post_id})
+            for post_id in post_ids
+        ]
+
+        return lambda: client.get(randomizer.choice(pages))
+
+    def writer(self, randomizer, post_ids, user):
+        client = Client()
+        client.force_login(user)
+        urls = [
+            reverse('posts:add_comment', kwargs={'post_id': post_id})
+            for post_id in post_ids
+        ]
+
+        return lambda: client.post(
+            randomizer.choice(urls), {'text': BENCH_COMMENT_TEXT}
+        )
+
+    def report(self, title, workers, seconds):
+        timings = [timing for worker in workers for timing in worker.timings]
+        errors = sum(worker.errors for worker in workers)
+        self.stdout.write(self.style.SUCCESS(
+            f'{title}: {len(timings) / seconds:.1f} запросов/с, '
+            f'p50 {percentile(timings, 0.5) * 1000:.1f} мс, '
+            f'p95 {percentile(timings, 0.95) * 1000:.1f} мс, '
+            f'ошибок блокировки {errors}'
+        ))
@@ -0,0 +1,82 @@
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand, CommandError
+from django.template.loader import get_template
+
+from posts.cards import CARD_TEMPLATE
+from posts.constants import PageSet
+from posts.hydration import build_cards, feed_cards
+from posts.models import Post
+from posts.rendering import cut_raw_excerpts, with_excerpts
+from .bench_concurrency import percentile
+
+
+def model_feed():
+    return with_excerpts(Post.objects.select_related('author', 'group'))
+
+
+def model_list(page):
+    return cut_raw_excerpts(list(page))
+
+
+def card_feed():
+    return feed_cards(Post.objects.all())
+
+
+def card_list(rows):
+    return list(build_cards(rows))
+
+
+# Лента: queryset страниц и выборка страницы в объекты
+FEEDS = {
+    'models': (model_feed, model_list),
+    'cards': (card_feed, card_list),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает страницы главной ленты из моделей Post с select_related '
+        '(models) и из PostCard (cards): время выборки страницы, пиковую '
+        'память на нее (tracemalloc) и время рендера карточек без кэша.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pages', type=int, default=20)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument(
+            '--per-page', type=int, default=PageSet.POSTS_AMOUNT_AT_PADGE
+        )
+
+    def handle(self, *args, **options):
+        per_page = options['per_page']
+        if Post.objects.count() < per_page * options['pages']:
+            raise CommandError(
+                'В базе мало постов, уменьшите --pages или запустите '
+                'seed_yatube'
+            )
+        template = get_template(CARD_TEMPLATE)
+        for name, (feed, fetch) in FEEDS.items():
+            fetch_timings, render_timings, peaks = [], [], []
+            for _ in range(options['repeat']):
+                for number in range(options['pages']):
+                    offset = number * per_page
+                    page = feed()[offset:offset + per_page]
+                    tracemalloc.start()
+                    started = time.perf_counter()
+                    posts = fetch(page)
+                    fetch_timings.append(time.perf_counter() - started)
+                    peaks.append(tracemalloc.get_traced_memory()[1])
+                    tracemalloc.stop()
+                    started = time.perf_counter()
+                    for post in posts:
+                        template.render({'post': post, 'show_group': True})
+                    render_timings.append(time.perf_counter() - started)
+            self.stdout.write(self.style.SUCCESS(
+                f'{name}: выборка p50 '
+                f'{percentile(fetch_timings, 0.5) * 1000:.2f} мс, '
+                f'p95 {percentile(fetch_timings, 0.95) * 1000:.2f} мс, '
+                f'память p50 {percentile(peaks, 0.5) / 1024:.1f} КБ, '
+                f'рендер p50 {percentile(render_timings, 0.5) * 1000:.2f} мс'
+            ))
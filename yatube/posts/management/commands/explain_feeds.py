@@ -0,0 +1,47 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+
+from posts.models import Follow, Group, Post, User
+from posts.query_plans import explain, feed_querysets, uses_sort
+
+
+class Command(BaseCommand):
+    help = (
+        'Выводит планы и время запросов лент на текущей базе SQLite. '
+        'Для сравнения с планами без индексов: migrate posts 0014.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repeat', type=int, default=20,
+            help='Сколько раз выполнить каждый запрос для замера времени',
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Команда рассчитана на базу SQLite')
+        author = User.objects.annotate(
+            total=Count('posts')).order_by('-total').first()
+        group = Group.objects.annotate(
+            total=Count('posts')).order_by('-total').first()
+        post = Post.objects.annotate(
+            total=Count('comments')).order_by('-total').first()
+        follow = Follow.objects.order_by('?').first()
+        if None in (author, group, post, follow):
+            raise CommandError('В базе нет постов, коментариев или подписок')
+        querysets = feed_querysets(
+            author.pk, group.pk, post.pk, follow.user_id
+        )
+        for name, queryset in querysets.items():
+            plan = explain(queryset)
+            started = time.perf_counter()
+            for _ in range(options['repeat']):
+                list(queryset.all())
+            elapsed = (time.perf_counter() - started) / options['repeat']
+            style = self.style.ERROR if uses_sort(plan) else self.style.SUCCESS
+            self.stdout.write(style(f'{name}: {elapsed * 1000:.2f} ms'))
+            for step in plan:
+                self.stdout.write(f'    {step}')
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+from posts.thumbnails import generate_thumbnail
+
+
+class Command(BaseCommand):
+    help = 'Строит недостающие миниатюры картинок постов'
+
+    def handle(self, *args, **options):
+        post_ids = Post.objects.exclude(image='').filter(
+            thumbnail_url=''
+        ).values_list('pk', flat=True)
+        generated = 0
+        for post_id in post_ids.iterator():
+            generate_thumbnail(post_id)
+            generated += 1
+        self.stdout.write(
+            self.style.SUCCESS(f'Построено миниатюр: {generated}')
+        )
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from posts.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает поисковый индекс постов и коментариев'
+
+    def handle(self, *args, **options):
+        indexed = rebuild_search_index()
+        self.stdout.write(
+            self.style.SUCCESS(f'Проиндексировано текстов: {indexed}')
+        )
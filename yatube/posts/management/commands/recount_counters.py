@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from posts.counters import recount_counters
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает денормализованные счетчики постов и подписок'
+
+    def handle(self, *args, **options):
+        fixed = recount_counters()
+        self.stdout.write(
+            self.style.SUCCESS(f'Исправлено счетчиков: {fixed}')
+        )
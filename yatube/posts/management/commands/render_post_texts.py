@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from posts.constants import TextSet
+from posts.rendering import render_post_texts
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет HTML текста и начало текста постов пачками. По '
+        'умолчанию только посты без HTML, с --all - все посты (после '
+        'изменения EXCERPT_CHARS или разметки).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=TextSet.RENDER_BATCH_SIZE
+        )
+        parser.add_argument('--all', action='store_true', dest='everything')
+
+    def handle(self, *args, **options):
+        rendered = render_post_texts(
+            options['batch_size'], options['everything']
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Подготовлен HTML постов: {rendered}'
+        ))
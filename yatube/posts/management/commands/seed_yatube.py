@@ -0,0 +1,280 @@
+import os
+import random
+import time
+from datetime import timedelta
+from itertools import islice
+from math import gcd
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from posts.counters import recount_counters
+from posts.models import Comment, Follow, Group, Post, User
+from posts.rendering import render_post_texts
+from posts.search import rebuild_search_index
+from posts.thumbnails import build_thumbnail
+from posts.timeline import rebuild_timelines
+
+# Картинка 2x1 пикселя из фикстур тестов
+SEED_IMAGE = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+# Картинка без EXIF и меньше STORED_MAX_SIDE, prepare_image оставил бы ее
+# как есть
+SEED_IMAGE_NAME = 'posts/seed_image.gif'
+WORDS = (
+    'дневник', 'сегодня', 'прогулка', 'книга', 'город', 'утро', 'кофе',
+    'работа', 'друзья', 'море', 'поезд', 'вечер', 'снег', 'музыка',
+)
+
+
+class PowerLawPicker:
+    '''Выбор номера из size строк, вставленных подряд с first_id, с
+    вероятностью, убывающей как rank ** -exponent.
+
+    Ранг берется обратной функцией непрерывного степенного распределения,
+    а номер по рангу - перестановкой rank * step + offset по модулю size,
+    поэтому ни номера, ни веса в памяти не хранятся.
+    '''
+
+    def __init__(self, first_id, size, exponent, randomizer):
+        self.first_id = first_id
+        self.size = size
+        self.exponent = exponent
+        self.randomizer = randomizer
+        self.step = randomizer.randrange(size) + 1
+        while gcd(self.step, size) != 1:
+            self.step = randomizer.randrange(size) + 1
+        self.offset = randomizer.randrange(size)
+
+    def rank(self):
+        point = self.randomizer.random()
+        if self.exponent == 1:
+            rank = (self.size + 1) ** point
+        else:
+            power = 1 - self.exponent
+            rank = (
+                ((self.size + 1) ** power - 1) * point + 1
+            ) ** (1 / power)
+
+        return min(int(rank), self.size) - 1
+
+    def pick(self):
+        return self.first_id + (
+            self.rank() * self.step + self.offset
+        ) % self.size
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу синтетическими пользователями, группами, постами, '
+        'коментариями и подписками со степенным распределением активности'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--comments', type=int, default=20000)
+        parser.add_argument(
+            '--follows', type=int, default=20,
+            help='Среднее число подписок одного пользователя',
+        )
+        parser.add_argument(
+            '--images', type=float, default=0.0,
+            help='Доля постов с картинкой, от 0 до 1',
+        )
+        parser.add_argument(
+            '--exponent', type=float, default=1.1,
+            help='Показатель степенного распределения активности',
+        )
+        parser.add_argument('--days', type=int, default=365)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.randomizer = random.Random(options['seed'])
+        self.now = timezone.now()
+        self.prefix = f'seed{int(time.time())}'
+
+        users = self.create_users()
+        group_ids = self.create_groups()
+        authors = PowerLawPicker(*users, options['exponent'], self.randomizer)
+        image = self.seed_image()
+        posts = self.create_posts(authors, group_ids, image)
+        self.create_comments(
+            PowerLawPicker(*posts, options['exponent'], self.randomizer),
+            PowerLawPicker(*users, options['exponent'], self.randomizer),
+        )
+        self.create_follows(users, authors)
+        self.timed('Счетчики', recount_counters)
+        self.timed('Ленты подписок', rebuild_timelines)
+        self.timed('Поисковый индекс', rebuild_search_index)
+        self.timed('HTML текстов', render_post_texts)
+        self.timed('Миниатюры', lambda: self.create_thumbnails(image))
+
+    def timed(self, title, action):
+        started = time.perf_counter()
+        result = action()
+        self.stdout.write(self.style.SUCCESS(
+            f'{title}: {result} за {time.perf_counter() - started:.1f} с'
+        ))
+
+        return result
+
+    def insert(self, model, rows, ignore_conflicts=False):
+        '''Потоковая вставка строк пачками, каждая пачка в транзакции.
+
+        bulk_create ставит auto_now_add полям created текущее время,
+        поэтому заданные в строках даты возвращаются следующим
+        bulk_update той же пачки.
+        '''
+        inserted = 0
+        batch_size = self.options['batch_size']
+        dated = model in (Post, Comment)
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                break
+            if dated:
+                dates = [row.created for row in batch]
+            with transaction.atomic():
+                model.objects.bulk_create(
+                    batch, ignore_conflicts=ignore_conflicts
+                )
+                if dated:
+                    for row, created in zip(batch, dates):
+                        row.created = created
+                    model.objects.bulk_update(batch, ['created'])
+            inserted += len(batch)
+
+        return inserted
+
+    def next_id(self, model):
+        '''Первый номер строк, которые insert вставит с явными pk'''
+        return (model.objects.order_by('-pk').values_list(
+            'pk', flat=True
+        ).first() or 0) + 1
+
+    def random_created(self):
+        seconds = self.randomizer.random() * self.options['days'] * 86400
+
+        return self.now - timedelta(seconds=seconds)
+
+    def random_text(self, index, words_amount):
+        words = self.randomizer.choices(WORDS, k=words_amount)
+
+        return f'Тестовый пост {index}: ' + ' '.join(words)
+
+    def create_users(self):
+        '''Пользователи с номерами подряд: (первый номер, число)'''
+        password = make_password(None)
+        first_id, amount = self.next_id(User), self.options['users']
+        rows = (
+            User(
+                pk=first_id + index,
+                username=f'{self.prefix}_{index}',
+                password=password,
+            ) for index in range(amount)
+        )
+        self.timed('Пользователи', lambda: self.insert(User, rows))
+
+        return first_id, amount
+
+    def create_groups(self):
+        rows = (
+            Group(
+                title=f'Тестовая группа {index}',
+                slug=f'{self.prefix}-{index}',
+                description='Тестовое описание группы',
+            ) for index in range(self.options['groups'])
+        )
+        self.timed('Группы', lambda: self.insert(Group, rows))
+
+        return list(Group.objects.filter(
+            slug__startswith=self.prefix + '-'
+        ).values_list('pk', flat=True))
+
+    def seed_image(self):
+        if not self.options['images']:
+            return ''
+        path = os.path.join(settings.MEDIA_ROOT, SEED_IMAGE_NAME)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as image:
+            image.write(SEED_IMAGE)
+
+        return SEED_IMAGE_NAME
+
+    def create_thumbnails(self, image):
+        '''Одна миниатюра общей картинки для всех постов с ней'''
+        if not image:
+            return 0
+        thumbnail = build_thumbnail(image)
+
+        return Post.objects.filter(image=image).update(
+            thumbnail_url=thumbnail.url,
+            thumbnail_width=thumbnail.width,
+            thumbnail_height=thumbnail.height,
+        )
+
+    def create_posts(self, authors, group_ids, image):
+        '''Посты с номерами подряд: (первый номер, число)'''
+        groups = group_ids + [None]
+        first_id, amount = self.next_id(Post), self.options['posts']
+        rows = (
+            Post(
+                pk=first_id + index,
+                author_id=authors.pick(),
+                group_id=self.randomizer.choice(groups),
+                text=self.random_text(index, self.randomizer.randint(5, 60)),
+                image=(
+                    image
+                    if self.randomizer.random() < self.options['images']
+                    else ''
+                ),
+                created=self.random_created(),
+            ) for index in range(amount)
+        )
+        self.timed('Посты', lambda: self.insert(Post, rows))
+
+        return first_id, amount
+
+    def create_comments(self, posts, authors):
+        first_id = self.next_id(Comment)
+        rows = (
+            Comment(
+                pk=first_id + index,
+                post_id=posts.pick(),
+                author_id=authors.pick(),
+                text=self.random_text(index, self.randomizer.randint(1, 15)),
+                created=self.random_created(),
+            ) for index in range(self.options['comments'])
+        )
+        self.timed('Коментарии', lambda: self.insert(Comment, rows))
+
+    def follow_rows(self, users, authors):
+        first_id, amount = users
+        mean = self.options['follows']
+        for user_id in range(first_id, first_id + amount):
+            follows = min(
+                int(self.randomizer.expovariate(1 / mean)) if mean else 0,
+                amount - 1,
+            )
+            followed = {authors.pick() for _ in range(follows)} - {user_id}
+            for author_id in followed:
+                yield Follow(user_id=user_id, author_id=author_id)
+
+    def create_follows(self, users, authors):
+        rows = self.follow_rows(users, authors)
+        self.timed('Подписки', lambda: self.insert(
+            Follow, rows, ignore_conflicts=True
+        ))
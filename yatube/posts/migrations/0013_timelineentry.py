@@ -0,0 +1,65 @@
+# Generated by Django 2.2.16 on 2026-10-18 20:13
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+# Значение на момент миграции, текущее - TimelineSet.BACKFILL_POSTS_AMOUNT
+BACKFILL_POSTS_AMOUNT = 800
+
+
+def fill_timelines(apps, schema_editor):
+    Follow = apps.get_model('posts', 'Follow')
+    Post = apps.get_model('posts', 'Post')
+    TimelineEntry = apps.get_model('posts', 'TimelineEntry')
+    for follow in Follow.objects.iterator():
+        post_ids = Post.objects.filter(
+            author_id=follow.author_id
+        ).order_by('-created').values_list(
+            'id', flat=True
+        )[:BACKFILL_POSTS_AMOUNT]
+        TimelineEntry.objects.bulk_create(
+            [TimelineEntry(user_id=follow.user_id, post_id=post_id)
+             for post_id in post_ids],
+            ignore_conflicts=True,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0012_alter_post_group'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimelineEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+            ],
+            options={
+                'verbose_name': 'запись ленты',
+                'verbose_name_plural': 'записи ленты',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.UniqueConstraint(fields=('user', 'author'), name='unique_following'),
+        ),
+        migrations.AddField(
+            model_name='timelineentry',
+            name='post',
+            field=models.ForeignKey(help_text='Пост автора, на которого подписан пользователь', on_delete=django.db.models.deletion.CASCADE, related_name='timeline', to='posts.Post', verbose_name='пост'),
+        ),
+        migrations.AddField(
+            model_name='timelineentry',
+            name='user',
+            field=models.ForeignKey(help_text='Пользователь, в ленту которого попал пост', on_delete=django.db.models.deletion.CASCADE, related_name='timeline', to=settings.AUTH_USER_MODEL, verbose_name='подписчик'),
+        ),
+        migrations.AddConstraint(
+            model_name='timelineentry',
+            constraint=models.UniqueConstraint(fields=('user', 'post'), name='unique_timeline_entry'),
+        ),
+        migrations.RunPython(fill_timelines, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 2.2.16 on 2026-10-18 20:16
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_of(model, lookup, outer_field):
+    rows = model.objects.filter(
+        **{lookup: OuterRef(outer_field)}
+    ).order_by().values(lookup).annotate(total=Count('pk')).values('total')
+    return Coalesce(Subquery(rows), 0)
+
+
+def fill_counters(apps, schema_editor):
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    Follow = apps.get_model('posts', 'Follow')
+    UserCounters = apps.get_model('posts', 'UserCounters')
+    UserCounters.objects.bulk_create(
+        UserCounters(user_id=user_id)
+        for user_id in User.objects.values_list('pk', flat=True)
+    )
+    UserCounters.objects.update(
+        posts_count=count_of(Post, 'author', 'user_id'),
+        followers_count=count_of(Follow, 'author', 'user_id'),
+        following_count=count_of(Follow, 'user', 'user_id'),
+    )
+    Post.objects.update(comments_count=count_of(Comment, 'post', 'pk'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('posts', '0013_timelineentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserCounters',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='counters', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='пользователь')),
+                ('posts_count', models.PositiveIntegerField(default=0, verbose_name='число постов')),
+                ('followers_count', models.PositiveIntegerField(default=0, verbose_name='число подписчиков')),
+                ('following_count', models.PositiveIntegerField(default=0, verbose_name='число подписок')),
+            ],
+            options={
+                'verbose_name': 'счетчики пользователя',
+                'verbose_name_plural': 'счетчики пользователей',
+            },
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='число коментариев'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,57 @@
+from itertools import chain
+
+from django.db import migrations
+
+from posts.stemmer import stems
+
+SEARCH_TABLE = 'posts_search'
+
+
+def create_search_index(apps, schema_editor):
+    '''Виртуальная таблица FTS5 и ее заполнение (только SQLite)'''
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    rows = chain(
+        (
+            (2 * pk, ' '.join(stems(text)), pk)
+            for pk, text in Post.objects.values_list(
+                'pk', 'text'
+            ).iterator()
+        ),
+        (
+            (2 * pk + 1, ' '.join(stems(text)), post_id)
+            for pk, post_id, text in Comment.objects.values_list(
+                'pk', 'post_id', 'text'
+            ).iterator()
+        ),
+    )
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            f'CREATE VIRTUAL TABLE {SEARCH_TABLE} USING fts5('
+            "body, post_id UNINDEXED, tokenize='unicode61')"
+        )
+        cursor.executemany(
+            f'INSERT INTO {SEARCH_TABLE} (rowid, body, post_id) '
+            'VALUES (%s, %s, %s)',
+            rows,
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f'DROP TABLE IF EXISTS {SEARCH_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_post_thumbnail'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
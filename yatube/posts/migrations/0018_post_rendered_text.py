@@ -0,0 +1,28 @@
+# Generated by Django 2.2.16 on 2026-10-18 21:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0017_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='excerpt_html',
+            field=models.TextField(blank=True, editable=False, verbose_name='начало текста в HTML'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='excerpt_truncated',
+            field=models.BooleanField(default=False, editable=False, verbose_name='текст длиннее начала'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='text_html',
+            field=models.TextField(blank=True, editable=False, verbose_name='текст в HTML'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 2.2.16 on 2026-10-18 23:05
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+import django.utils.timezone
+
+
+def copy_post_dates(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    TimelineEntry = apps.get_model('posts', 'TimelineEntry')
+    TimelineEntry.objects.update(created=Subquery(
+        Post.objects.filter(pk=OuterRef('post_id')).values('created')[:1]
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0018_post_rendered_text'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='timelineentry',
+            name='created',
+            field=models.DateTimeField(default=django.utils.timezone.now, help_text='Дата публикации поста', verbose_name='дата публикации поста'),
+            preserve_default=False,
+        ),
+        migrations.RunPython(copy_post_dates, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='timelineentry',
+            index=models.Index(fields=['user', '-created', '-post'], name='timeline_user_created_idx'),
+        ),
+    ]
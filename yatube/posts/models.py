@@ -3,6 +3,7 @@ from django.db.models import UniqueConstraint
 from django.contrib.auth import get_user_model
 
 from .constants import MetaSet
+from .rendering import RENDERED_FIELDS, render_text
 from core.models import CreatedModel
 
 
@@ -50,9 +51,61 @@ class Post(CreatedModel):
         blank=True,
         help_text='Добавьте изображение к посту'
     )
+    thumbnail_url = models.CharField(
+        'адрес миниатюры',
+        max_length=255,
+        blank=True,
+        editable=False,
+    )
+    thumbnail_width = models.PositiveSmallIntegerField(
+        'ширина миниатюры',
+        null=True,
+        editable=False,
+    )
+    thumbnail_height = models.PositiveSmallIntegerField(
+        'высота миниатюры',
+        null=True,
+        editable=False,
+    )
+    comments_count = models.PositiveIntegerField(
+        'число коментариев',
+        default=0,
+        editable=False,
+    )
+    text_html = models.TextField(
+        'текст в HTML',
+        blank=True,
+        editable=False,
+    )
+    excerpt_html = models.TextField(
+        'начало текста в HTML',
+        blank=True,
+        editable=False,
+    )
+    excerpt_truncated = models.BooleanField(
+        'текст длиннее начала',
+        default=False,
+        editable=False,
+    )
 
     class Meta:
         ordering = ['-created']
+        # Ленты читаются в порядке (-created, -id): индексы по возрастанию
+        # просматриваются в обратном направлении без сортировки
+        indexes = [
+            models.Index(
+                fields=['author', 'created', 'id'],
+                name='post_author_created_idx',
+            ),
+            models.Index(
+                fields=['group', 'created', 'id'],
+                name='post_group_created_idx',
+            ),
+            models.Index(
+                fields=['created', 'id'],
+                name='post_created_idx',
+            ),
+        ]
         verbose_name = 'пост'
         verbose_name_plural = 'посты'
 
@@ -61,6 +114,31 @@ class Post(CreatedModel):
 
         return self.text[:MetaSet.MAX_CHARS_IN_TEXT_STR]
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        '''Запоминает группу и картинку поста из базы: после переноса
+        поста в другую группу сигнал сбрасывает ленты обеих групп, после
+        смены картинки ставит ее обработку (posts.signals)'''
+        post = super().from_db(db, field_names, values)
+        post.loaded_group_id = post.__dict__.get('group_id')
+        post.loaded_image = post.__dict__.get('image')
+
+        return post
+
+    def render_text(self):
+        '''Подготовка HTML текста и его начала для шаблонов'''
+        (
+            self.text_html, self.excerpt_html, self.excerpt_truncated
+        ) = render_text(self.text)
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'text' in update_fields:
+            self.render_text()
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, *RENDERED_FIELDS}
+        super().save(*args, **kwargs)
+
 
 class Comment(CreatedModel):
     '''Класс коментариев к постам'''
@@ -86,6 +164,12 @@ class Comment(CreatedModel):
 
     class Meta:
         ordering = ['-created']
+        indexes = [
+            models.Index(
+                fields=['post', 'created'],
+                name='comment_post_created_idx',
+            ),
+        ]
         verbose_name = 'коментарий'
         verbose_name_plural = 'коментарии'
 
@@ -130,3 +214,73 @@ class Follow(CreatedModel):
             + ' follow: '
             + self.author.get_username()
         )
+
+
+class UserCounters(models.Model):
+    '''Класс денормализованных счетчиков пользователя'''
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='counters',
+        verbose_name='пользователь',
+    )
+    posts_count = models.PositiveIntegerField('число постов', default=0)
+    followers_count = models.PositiveIntegerField(
+        'число подписчиков', default=0
+    )
+    following_count = models.PositiveIntegerField('число подписок', default=0)
+
+    class Meta:
+        verbose_name = 'счетчики пользователя'
+        verbose_name_plural = 'счетчики пользователей'
+
+    def __str__(self) -> str:
+        '''Вывод имени пользователя'''
+
+        return self.user.get_username() + ' counters'
+
+
+class TimelineEntry(models.Model):
+    '''Класс записей материализованной ленты подписок'''
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='подписчик',
+        help_text='Пользователь, в ленту которого попал пост'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='пост',
+        help_text='Пост автора, на которого подписан пользователь'
+    )
+    # Копия даты поста: страница ленты читается по индексу записей
+    # пользователя без соединения с постами для сортировки
+    created = models.DateTimeField(
+        'дата публикации поста',
+        help_text='Дата публикации поста',
+    )
+
+    class Meta:
+        constraints = [
+            UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique_timeline_entry',
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-created', '-post'],
+                name='timeline_user_created_idx',
+            ),
+        ]
+        verbose_name = 'запись ленты'
+        verbose_name_plural = 'записи ленты'
+
+    def __str__(self) -> str:
+        '''Вывод получателя и поста'''
+
+        return self.user.get_username() + ' timeline: ' + str(self.post)
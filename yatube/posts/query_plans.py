@@ -0,0 +1,45 @@
+'''Планы запросов лент для проверки индексов.
+
+Запросы повторяют выборки страниц из posts.views. На SQLite признак
+сортировки без индекса в плане: шаг "USE TEMP B-TREE FOR ORDER BY".
+'''
+from django.db import connection
+
+from .constants import PageSet
+from .hydration import feed_cards
+from .models import Comment, Post, User
+from .timeline import follow_feed
+
+FEED_ORDERING = ('-created', '-pk')
+SORT_STEP = 'USE TEMP B-TREE'
+
+
+def feed_querysets(author_id, group_id, post_id, user_id):
+    '''Выборки первых страниц лент так, как их выполняют view-функции'''
+    page_size = PageSet.POSTS_AMOUNT_AT_PADGE + 1
+    posts = feed_cards(Post.objects.order_by(*FEED_ORDERING))
+
+    return {
+        'index': posts[:page_size],
+        'group_posts': posts.filter(group_id=group_id)[:page_size],
+        'profile': posts.filter(author_id=author_id)[:page_size],
+        'post_detail': Comment.objects.filter(
+            post_id=post_id).select_related('author').order_by(
+            *FEED_ORDERING)[:PageSet.COMMENTS_AMOUNT_AT_PAGE + 1],
+        'follow_index': feed_cards(follow_feed(
+            User(pk=user_id)))[:page_size],
+    }
+
+
+def explain(queryset):
+    '''Шаги плана выполнения запроса'''
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def uses_sort(plan):
+    '''Требует ли план сортировки строк без индекса'''
+    return any(SORT_STEP in step for step in plan)
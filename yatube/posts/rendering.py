@@ -0,0 +1,100 @@
+'''Текст поста, подготовленный для показа.
+
+HTML текста (linebreaks) и его начало для лент считаются при сохранении
+поста и хранятся в нем, поэтому шаблоны не применяют фильтры к тексту, а
+ленты не читают полный текст. Посты, созданные bulk_create, заполняет
+render_post_texts (команда render_post_texts); до этого ленты берут
+начало текста прямо из базы (raw_excerpt) и обрезают его по границе
+слова, как excerpt (cut_raw_excerpts).
+'''
+from django.db import transaction
+from django.db.models import Case, TextField, Value, When
+from django.db.models.functions import Substr
+from django.utils.html import linebreaks
+
+from .constants import TextSet
+
+RENDERED_FIELDS = ('text_html', 'excerpt_html', 'excerpt_truncated')
+# Поля, которые не нужны карточкам лент
+FEED_DEFERRED_FIELDS = ('text', 'text_html')
+
+
+def excerpt(text):
+    '''Начало текста до EXCERPT_CHARS символов по границе слова'''
+    if len(text) <= TextSet.EXCERPT_CHARS:
+        return text, False
+    head = text[:TextSet.EXCERPT_CHARS]
+    words = head.rsplit(None, 1)
+    if len(words) > 1:
+        head = words[0]
+
+    return head.rstrip() + '…', True
+
+
+def render_text(text):
+    '''HTML текста, HTML его начала и признак, что начало короче текста'''
+    head, truncated = excerpt(text)
+
+    return linebreaks(text, autoescape=True), linebreaks(
+        head, autoescape=True
+    ), truncated
+
+
+def raw_excerpt():
+    '''Начало текста из базы для постов без готового HTML.
+
+    Лишний символ показывает cut_raw_excerpts, что текст длиннее начала.
+    '''
+    return Case(
+        When(
+            excerpt_html='',
+            then=Substr('text', 1, TextSet.EXCERPT_CHARS + 1),
+        ),
+        default=Value(''),
+        output_field=TextField(),
+    )
+
+
+def cut_raw_excerpts(posts):
+    '''Начало текста постов без готового HTML по границе слова'''
+    for post in posts:
+        if post.raw_excerpt:
+            post.raw_excerpt, post.excerpt_truncated = excerpt(
+                post.raw_excerpt
+            )
+
+    return posts
+
+
+def with_excerpts(posts):
+    '''Посты ленты без полного текста.
+
+    Для постов без готового HTML (raw_excerpt) база отдает только начало
+    текста, которое выбранные посты передают в cut_raw_excerpts.
+    '''
+    return posts.defer(*FEED_DEFERRED_FIELDS).annotate(
+        raw_excerpt=raw_excerpt()
+    )
+
+
+def render_post_texts(batch_size=TextSet.RENDER_BATCH_SIZE, everything=False):
+    '''Заполнение HTML текста постов пачками по возрастанию id'''
+    from .models import Post
+
+    posts = Post.objects.order_by('pk').only('pk', 'text')
+    if not everything:
+        posts = posts.filter(text_html='')
+    rendered = 0
+    last_pk = 0
+    while True:
+        batch = list(posts.filter(pk__gt=last_pk)[:batch_size])
+        if not batch:
+            break
+        for post in batch:
+            post.render_text()
+        with transaction.atomic():
+            Post.objects.bulk_update(batch, RENDERED_FIELDS)
+        rendered += len(batch)
+        last_pk = batch[-1].pk
+
+    return rendered
@@ -0,0 +1,285 @@
+'''Полнотекстовый поиск по постам и коментариям (SQLite FTS5).
+
+Тексты хранятся в виртуальной таблице posts_search в виде основ слов
+(posts.stemmer), поэтому запрос "прогулки" находит и "прогулками". Строка
+поста имеет четный rowid 2 * id, строка коментария - нечетный
+2 * id + 1: обновление и удаление идут по первичному ключу индекса, а
+порядок rowid примерно совпадает с порядком публикации. Записи
+синхронизируются сигналами (posts.signals), после массовой загрузки
+индекс перестраивает rebuild_search_index() и команда
+manage.py rebuild_search_index.
+
+По релевантности (bm25) сортируются только RANK_WINDOW самых новых
+совпадений: FTS5 отдает их по rowid без просмотра остальных, поэтому
+время запроса не растет с размером базы и частотой слова. Совпадения и
+строки постов SearchPaginator читает из одной базы, которую роутер
+выбрал для чтения постов (core.routers), поэтому индекс реплики не
+расходится с ее постами.
+'''
+import base64
+import binascii
+import re
+from itertools import islice
+
+from django.core.paginator import Page, Paginator
+from django.db import (
+    DEFAULT_DB_ALIAS,
+    connection,
+    connections,
+    router,
+    transaction,
+)
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .constants import SearchSet
+from .models import Comment, Post
+from .stemmer import stem, stems
+
+TOKEN_SPLIT_RE = re.compile(r'(\w+)')
+
+
+def search_enabled(using=DEFAULT_DB_ALIAS):
+    '''Индекс FTS5 есть только в SQLite'''
+    return connections[using].vendor == 'sqlite'
+
+
+def post_rowid(post_id):
+    return 2 * post_id
+
+
+def comment_rowid(comment_id):
+    return 2 * comment_id + 1
+
+
+def is_comment_rowid(rowid):
+    return rowid % 2 == 1
+
+
+def index_rows(rows):
+    '''Запись строк (rowid, post_id, текст) в индекс, пачками'''
+    if not search_enabled():
+        return 0
+    rows = iter(rows)
+    indexed = 0
+    with connection.cursor() as cursor:
+        while True:
+            batch = [
+                (rowid, ' '.join(stems(text)), post_id)
+                for rowid, post_id, text in islice(
+                    rows, SearchSet.INDEX_BATCH_SIZE
+                )
+            ]
+            if not batch:
+                break
+            cursor.executemany(
+                f'INSERT OR REPLACE INTO {SearchSet.TABLE} '
+                '(rowid, body, post_id) VALUES (%s, %s, %s)',
+                batch,
+            )
+            indexed += len(batch)
+
+    return indexed
+
+
+def unindex_row(rowid):
+    '''Удаление строки из индекса'''
+    if not search_enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {SearchSet.TABLE} WHERE rowid = %s', [rowid]
+        )
+
+
+def index_post(post):
+    index_rows([(post_rowid(post.pk), post.pk, post.text)])
+
+
+def index_comment(comment):
+    index_rows([
+        (comment_rowid(comment.pk), comment.post_id, comment.text)
+    ])
+
+
+def rebuild_search_index():
+    '''Полное перестроение индекса по постам и коментариям'''
+    if not search_enabled():
+        return 0
+    posts = (
+        (post_rowid(pk), pk, text)
+        for pk, text in Post.objects.values_list('pk', 'text').iterator()
+    )
+    comments = (
+        (comment_rowid(pk), post_id, text)
+        for pk, post_id, text in Comment.objects.values_list(
+            'pk', 'post_id', 'text'
+        ).iterator()
+    )
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {SearchSet.TABLE}')
+
+        return (
+            index_rows(posts) + index_rows(comments)
+        )
+
+
+def query_terms(query):
+    '''Различные основы слов запроса, не больше MAX_QUERY_TERMS'''
+    terms = list(dict.fromkeys(stems(query)))
+
+    return terms[:SearchSet.MAX_QUERY_TERMS]
+
+
+def match_expression(terms):
+    '''Выражение MATCH: все основы обязательны'''
+    return ' '.join(f'"{term}"' for term in terms)
+
+
+def matching_post_ids(terms):
+    '''Подзапрос id постов, в тексте или коментариях которых есть все
+    основы (для фильтрации querysets)'''
+    return RawSQL(
+        f'SELECT post_id FROM {SearchSet.TABLE} '
+        f'WHERE {SearchSet.TABLE} MATCH %s',
+        [match_expression(terms)],
+    )
+
+
+def encode_search_cursor(score, rowid):
+    '''Непрозрачный токен курсора по ключу (релевантность, rowid)'''
+    raw = f'{score!r}|{rowid}'
+
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_search_cursor(token):
+    '''Разбор токена курсора, для битого токена возвращает None'''
+    try:
+        raw = base64.urlsafe_b64decode(token.encode()).decode()
+        score, rowid = raw.split('|')
+
+        return float(score), int(rowid)
+    except (binascii.Error, UnicodeError, ValueError):
+        return None
+
+
+def highlight(text, terms):
+    '''Фрагмент текста вокруг первого совпадения с выделенными словами'''
+    parts = TOKEN_SPLIT_RE.split(text)
+    words = parts[1::2]
+    marked = [stem(word) in terms for word in words]
+    first = marked.index(True) if True in marked else 0
+    start = max(0, first - SearchSet.SNIPPET_WORDS // 3)
+    end = min(len(words), start + SearchSet.SNIPPET_WORDS)
+    html = ['…'] if start else [escape(parts[0])]
+    for index in range(start, end):
+        word = escape(words[index])
+        html.append(f'<mark>{word}</mark>' if marked[index] else word)
+        if index + 1 < end:
+            html.append(escape(parts[2 * index + 2]))
+    html.append(escape(parts[2 * end]) if end == len(words) else '…')
+
+    return mark_safe(''.join(html))
+
+
+class SearchPaginator(Paginator):
+    '''Пагинатор результатов поиска по ключу (релевантность, rowid).
+
+    Строки окна новых совпадений упорядочены по bm25 и rowid, страница
+    начинается после ключа последней строки предыдущей страницы, без
+    COUNT(*) и OFFSET.
+    Несколько совпавших строк одного поста (текст и коментарии) дают
+    один результат. Как и у CursorPaginator, номер и число страниц
+    отражают только наличие соседних страниц.
+    '''
+    is_cursor = True
+
+    def __init__(self, terms, per_page):
+        super().__init__([], per_page)
+        self.terms = terms
+        self.next_cursor = None
+        self.previous_cursor = None
+        self.using = router.db_for_read(Post)
+        self._number = 1
+        self._has_next = False
+
+    @property
+    def num_pages(self):
+        return self._number + self._has_next
+
+    def matches(self, after):
+        '''Строки индекса (rowid, post_id, score) после ключа after'''
+        batch_size = self.per_page + 1
+        while True:
+            sql = (
+                f'SELECT rowid, post_id, score FROM ('
+                f'SELECT rowid, post_id, bm25({SearchSet.TABLE}) AS score '
+                f'FROM {SearchSet.TABLE} WHERE {SearchSet.TABLE} MATCH %s '
+                'ORDER BY rowid DESC LIMIT %s)'
+            )
+            params = [match_expression(self.terms), SearchSet.RANK_WINDOW]
+            if after is not None:
+                sql += ' WHERE score > %s OR (score = %s AND rowid > %s)'
+                params += [after[0], after[0], after[1]]
+            with connections[self.using].cursor() as cursor:
+                cursor.execute(
+                    sql + ' ORDER BY score, rowid LIMIT %s',
+                    params + [batch_size],
+                )
+                rows = cursor.fetchall()
+            yield from rows
+            if len(rows) < batch_size:
+                return
+            after = rows[-1][2], rows[-1][0]
+
+    def get_cursor_page(self, token):
+        '''Страница результатов, следующая за курсором'''
+        if not self.terms or not search_enabled(self.using):
+            return Page([], self._number, self)
+        cursor = decode_search_cursor(token) if token else None
+        self._number = 1 + (cursor is not None)
+        hits = {}
+        last_key = None
+        for rowid, post_id, score in self.matches(cursor):
+            if post_id not in hits:
+                if len(hits) == self.per_page:
+                    self._has_next = True
+                    break
+                hits[post_id] = rowid
+            last_key = score, rowid
+        if self._has_next:
+            self.next_cursor = encode_search_cursor(*last_key)
+        posts = Post.objects.using(self.using).select_related(
+            'author', 'group'
+        ).in_bulk(list(hits))
+        comment_ids = {
+            rowid: rowid // 2
+            for rowid in hits.values() if is_comment_rowid(rowid)
+        }
+        comments = Comment.objects.using(self.using).in_bulk(
+            list(comment_ids.values())
+        )
+        results = []
+        for post_id, rowid in hits.items():
+            post = posts.get(post_id)
+            comment = comments.get(comment_ids.get(rowid))
+            if post is None or (rowid in comment_ids and comment is None):
+                continue
+            post.found_in_comment = comment is not None
+            post.snippet = highlight(
+                comment.text if comment else post.text, self.terms
+            )
+            results.append(post)
+
+        return Page(results, self._number, self)
+
+
+def search_posts(query, token=None,
+                 per_page=SearchSet.RESULTS_AMOUNT_AT_PAGE):
+    '''Страница постов, найденных по запросу, от лучшего совпадения'''
+    paginator = SearchPaginator(query_terms(query), per_page)
+
+    return paginator.get_cursor_page(token)
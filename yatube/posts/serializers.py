@@ -0,0 +1,88 @@
+'''Сериализация постов и коментариев в словари для JSON API.
+
+Пишется вручную: поля читаются прямо из объектов, уже загруженных
+страницей, без промежуточных классов полей. Авторы и группы на странице
+повторяются, поэтому их словари строятся один раз и переиспользуются.
+'''
+
+
+class FeedSerializer:
+    '''Сериализатор одной страницы ленты'''
+    __slots__ = ('users', 'groups')
+
+    def __init__(self):
+        self.users = {}
+        self.groups = {}
+
+    def user(self, user):
+        data = self.users.get(user.pk)
+        if data is None:
+            data = self.users[user.pk] = {
+                'username': user.username,
+                'full_name': user.get_full_name(),
+            }
+
+        return data
+
+    def group(self, group):
+        if group is None:
+            return None
+        data = self.groups.get(group.pk)
+        if data is None:
+            data = self.groups[group.pk] = {
+                'slug': group.slug,
+                'title': group.title,
+            }
+
+        return data
+
+    def post(self, post):
+        thumbnail = None
+        if post.thumbnail_url:
+            thumbnail = {
+                'url': post.thumbnail_url,
+                'width': post.thumbnail_width,
+                'height': post.thumbnail_height,
+            }
+
+        return {
+            'id': post.pk,
+            'text': post.text,
+            'created': post.created.isoformat(),
+            'author': self.user(post.author),
+            'group': self.group(post.group),
+            'image': post.image.url if post.image else None,
+            'thumbnail': thumbnail,
+            'comments_count': post.comments_count,
+        }
+
+    def comment(self, comment):
+        return {
+            'id': comment.pk,
+            'text': comment.text,
+            'created': comment.created.isoformat(),
+            'author': self.user(comment.author),
+        }
+
+    def feed_post(self, post):
+        '''Пост ленты (posts.hydration.PostCard) с последним коментарием'''
+        data = self.post(post)
+        data['latest_comment'] = (
+            self.comment(post.latest_comment) if post.latest_comment else None
+        )
+
+        return data
+
+    def posts(self, posts):
+        return [self.feed_post(post) for post in posts]
+
+    def comments(self, comments):
+        return [self.comment(comment) for comment in comments]
+
+
+def serialize_counters(counters):
+    return {
+        'posts_count': counters.posts_count,
+        'followers_count': counters.followers_count,
+        'following_count': counters.following_count,
+    }
@@ -0,0 +1,134 @@
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .counters import change_comments_count, change_user_counters
+from .invalidation import (
+    invalidate_author,
+    invalidate_comment,
+    invalidate_follow,
+    invalidate_group,
+    invalidate_group_posts,
+    invalidate_post,
+)
+from .models import Comment, Follow, Group, Post, User, UserCounters
+from .search import (
+    comment_rowid,
+    index_comment,
+    index_post,
+    post_rowid,
+    unindex_row,
+)
+from .thumbnails import schedule_thumbnail
+from .timeline import (
+    backfill_timeline,
+    fan_out_post,
+    restore_fanout,
+    trim_timeline,
+)
+
+# Вход пользователя сохраняет только дату входа, карточки не меняются
+LOGIN_FIELDS = ('last_login',)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, update_fields, **kwargs):
+    '''Создание счетчиков нового пользователя, сброс карточек автора'''
+    if created:
+        UserCounters.objects.get_or_create(user=instance)
+    elif update_fields != frozenset(LOGIN_FIELDS):
+        invalidate_author(instance.pk)
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, created, **kwargs):
+    '''Сброс карточек и ленты измененной группы'''
+    if not created:
+        invalidate_group(instance.pk)
+
+
+@receiver(pre_delete, sender=Group)
+def group_deleting(sender, instance, **kwargs):
+    '''Посты удаляемой группы: удаление снимает с них группу без сигналов
+    постов'''
+    instance.deleted_posts = list(
+        instance.posts.values_list('pk', 'author_id')
+    )
+
+
+@receiver(post_delete, sender=Group)
+def group_deleted(sender, instance, **kwargs):
+    '''Сброс лент и карточек с постами удаленной группы'''
+    invalidate_group_posts(
+        instance.pk, getattr(instance, 'deleted_posts', ())
+    )
+
+
+def image_changed(post):
+    '''Картинка поста отличается от прочитанной из базы. Отложенное поле
+    не сохраняется, поэтому и не меняется'''
+    if 'image' not in post.__dict__:
+        return False
+
+    return (post.image.name or '') != (
+        getattr(post, 'loaded_image', None) or ''
+    )
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    '''Учет нового поста, раскладка по лентам, поисковый индекс, обработка
+    новой картинки и сброс страниц с постом'''
+    if created:
+        change_user_counters(instance.author_id, posts_count=1)
+        fan_out_post(instance)
+    index_post(instance)
+    if image_changed(instance):
+        schedule_thumbnail(instance)
+        instance.loaded_image = instance.image.name
+    invalidate_post(instance, getattr(instance, 'loaded_group_id', None))
+    instance.loaded_group_id = instance.group_id
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    '''Учет удаленного поста и сброс страниц, где он был виден'''
+    change_user_counters(instance.author_id, posts_count=-1)
+    unindex_row(post_rowid(instance.pk))
+    invalidate_post(instance, getattr(instance, 'loaded_group_id', None))
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    '''Учет нового коментария, поисковый индекс и сброс карточки поста'''
+    if created:
+        change_comments_count(instance.post_id, 1)
+    index_comment(instance)
+    invalidate_comment(instance)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    '''Учет удаленного коментария и сброс карточки поста'''
+    change_comments_count(instance.post_id, -1)
+    unindex_row(comment_rowid(instance.pk))
+    invalidate_comment(instance)
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, **kwargs):
+    '''Учет подписки, заполнение ленты подписчика и сброс ее кэша'''
+    if created:
+        change_user_counters(instance.author_id, followers_count=1)
+        change_user_counters(instance.user_id, following_count=1)
+        backfill_timeline(instance)
+        invalidate_follow(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    '''Учет отписки, очистка ленты подписчика и сброс ее кэша'''
+    change_user_counters(instance.author_id, followers_count=-1)
+    change_user_counters(instance.user_id, following_count=-1)
+    trim_timeline(instance)
+    restore_fanout(instance.author_id)
+    invalidate_follow(instance.user_id, instance.author_id)
@@ -0,0 +1,118 @@
+'''Стеммер русского языка по алгоритму Snowball (Портера).
+
+Отрезает от слова окончания и суффиксы, чтобы формы одного слова
+("прогулка", "прогулки", "прогулками") давали одну основу. Используется
+при записи в поисковый индекс и при разборе поискового запроса.
+Основы кэшируются: словарь текстов много меньше числа слов в них.
+'''
+import re
+from functools import lru_cache
+
+VOWELS = 'аеиоуыэюя'
+AFTER_A = 'ая'
+WORD_RE = re.compile(r'\w+')
+
+PERFECTIVE_GERUND = ('ив', 'ивши', 'ившись', 'ыв', 'ывши', 'ывшись')
+PERFECTIVE_GERUND_AFTER_A = ('в', 'вши', 'вшись')
+ADJECTIVE = (
+    'ее', 'ие', 'ые', 'ое', 'ими', 'ыми', 'ей', 'ий', 'ый', 'ой', 'ем',
+    'им', 'ым', 'ом', 'его', 'ого', 'ему', 'ому', 'их', 'ых', 'ую', 'юю',
+    'ая', 'яя', 'ою', 'ею',
+)
+PARTICIPLE = ('ивш', 'ывш', 'ующ')
+PARTICIPLE_AFTER_A = ('ем', 'нн', 'вш', 'ющ', 'щ')
+REFLEXIVE = ('ся', 'сь')
+VERB = (
+    'ила', 'ыла', 'ена', 'ейте', 'уйте', 'ите', 'или', 'ыли', 'ей', 'уй',
+    'ил', 'ыл', 'им', 'ым', 'ен', 'ило', 'ыло', 'ено', 'ят', 'ует', 'уют',
+    'ит', 'ыт', 'ены', 'ить', 'ыть', 'ишь', 'ую', 'ю',
+)
+VERB_AFTER_A = (
+    'ла', 'на', 'ете', 'йте', 'ли', 'й', 'л', 'ем', 'н', 'ло', 'но', 'ет',
+    'ют', 'ны', 'ть', 'ешь', 'нно',
+)
+NOUN = (
+    'а', 'ев', 'ов', 'ие', 'ье', 'е', 'иями', 'ями', 'ами', 'еи', 'ии', 'и',
+    'ией', 'ей', 'ой', 'ий', 'й', 'иям', 'ям', 'ием', 'ем', 'ам', 'ом', 'о',
+    'у', 'ах', 'иях', 'ях', 'ы', 'ь', 'ию', 'ью', 'ю', 'ия', 'ья', 'я',
+)
+DERIVATIONAL = ('ост', 'ость')
+SUPERLATIVE = ('ейш', 'ейше')
+
+
+def _region_start(word, start):
+    '''Начало области после первой пары гласная-согласная от start'''
+    for index in range(start + 1, len(word)):
+        if word[index] not in VOWELS and word[index - 1] in VOWELS:
+            return index + 1
+
+    return len(word)
+
+
+def _strip(word, start, endings, endings_after_a=()):
+    '''Слово без самого длинного окончания из списков или None.
+
+    Окончание должно целиком лежать в области от start, окончаниям из
+    endings_after_a должна предшествовать "а" или "я" из той же области.
+    '''
+    found = ''
+    for ending in endings + endings_after_a:
+        if (
+            len(ending) > len(found)
+            and word.endswith(ending)
+            and len(word) - len(ending) >= start
+        ):
+            found = ending
+    if not found:
+        return None
+    stem = word[:-len(found)]
+    if found in endings_after_a and found not in endings and not (
+        len(stem) > start and stem[-1] in AFTER_A
+    ):
+        return None
+
+    return stem
+
+
+@lru_cache(maxsize=100000)
+def stem(word):
+    '''Основа слова'''
+    word = word.lower().replace('ё', 'е')
+    rv = next(
+        (index + 1 for index, char in enumerate(word) if char in VOWELS),
+        len(word),
+    )
+    r2 = _region_start(word, _region_start(word, 0))
+    stemmed = _strip(
+        word, rv, PERFECTIVE_GERUND, PERFECTIVE_GERUND_AFTER_A
+    )
+    if stemmed is None:
+        word = _strip(word, rv, REFLEXIVE) or word
+        stemmed = _strip(word, rv, ADJECTIVE)
+        if stemmed is not None:
+            stemmed = _strip(
+                stemmed, rv, PARTICIPLE, PARTICIPLE_AFTER_A
+            ) or stemmed
+        else:
+            stemmed = (
+                _strip(word, rv, VERB, VERB_AFTER_A)
+                or _strip(word, rv, NOUN)
+            )
+    word = word if stemmed is None else stemmed
+    if word.endswith('и') and len(word) > rv:
+        word = word[:-1]
+    word = _strip(word, max(r2, rv), DERIVATIONAL) or word
+    superlative = _strip(word, rv, SUPERLATIVE)
+    if superlative is not None:
+        word = superlative
+    if word.endswith('нн') and len(word) - 2 >= rv:
+        word = word[:-1]
+    elif superlative is None and word.endswith('ь') and len(word) > rv:
+        word = word[:-1]
+
+    return word
+
+
+def stems(text):
+    '''Основы всех слов текста в порядке следования'''
+    return [stem(word) for word in WORD_RE.findall(text)]
@@ -0,0 +1,77 @@
+from django import template
+from django.core.cache import cache
+from django.utils.safestring import mark_safe
+
+from core.versioning import get_versions
+from posts.cards import card_scopes, render_cards
+from posts.constants import CacheSet
+from posts.feed_cache import record_lookup
+
+
+register = template.Library()
+
+
+class FeedCacheNode(template.Node):
+    def __init__(self, nodelist, cache_key, posts):
+        self.nodelist = nodelist
+        self.cache_key = cache_key
+        self.posts = posts
+
+    def render(self, context):
+        key = self.cache_key.resolve(context)
+        namespace = key.split(':')[1]
+        entry = cache.get(key)
+        fresh = (
+            entry is not None
+            and get_versions(*entry['scopes']) == entry['versions']
+        )
+        record_lookup(namespace, fresh)
+        if fresh:
+            return entry['content']
+        scopes = list({
+            scope: None
+            for post in self.posts.resolve(context)
+            for scope in card_scopes(post)
+        })
+        # Версии читаются до рендера: правка во время рендера сделает
+        # фрагмент устаревшим, а не сохранит старые карточки под новыми
+        # версиями
+        versions = get_versions(*scopes)
+        content = self.nodelist.render(context)
+        cache.set(key, {
+            'scopes': scopes,
+            'versions': versions,
+            'content': content,
+        }, CacheSet.FRAGMENT_TIMEOUT)
+
+        return content
+
+
+@register.tag
+def feedcache(parser, token):
+    '''Кэширует блок с карточками постов по ключу, собранному
+    posts.feed_cache.feed_cache_key, пока не сменятся версии карточек
+
+    {% feedcache feed_cache_key page_obj %} ... {% endfeedcache %}
+    '''
+    bits = token.split_contents()
+    if len(bits) != 3:
+        raise template.TemplateSyntaxError(
+            f'{bits[0]} принимает ключ фрагмента и посты страницы'
+        )
+    nodelist = parser.parse(('endfeedcache',))
+    parser.delete_first_token()
+
+    return FeedCacheNode(
+        nodelist, parser.compile_filter(bits[1]),
+        parser.compile_filter(bits[2]),
+    )
+
+
+@register.simple_tag
+def post_cards(posts, show_group=True):
+    '''Карточки постов страницы из кэша карточек (posts.cards)
+
+    {% post_cards page_obj as cards %}, в ленте группы - show_group=False
+    '''
+    return [mark_safe(card) for card in render_cards(posts, show_group)]
@@ -0,0 +1,166 @@
+from http import HTTPStatus
+
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from core.testing import with_cache_backends
+
+from ..constants import PageSet
+from ..counters import recount_counters
+from ..models import Comment, Follow, Group, Post, User
+
+
+class ApiTest(TestCase):
+    '''Класс тестов JSON API лент'''
+    @classmethod
+    def setUpClass(cls):
+        '''Фикстуры класса'''
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username='author', first_name='Лев', last_name='Толстой'
+        )
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        Post.objects.bulk_create(
+            Post(
+                author=cls.author,
+                group=cls.group,
+                text=f'Тестовый пост {index}',
+            ) for index in range(PageSet.POSTS_AMOUNT_AT_PADGE + 1)
+        )
+        cls.post = Post.objects.create(
+            author=cls.author,
+            text='Пост с коментарием',
+        )
+        Comment.objects.create(
+            post=cls.post,
+            author=cls.reader,
+            text='Тестовый коммент',
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        recount_counters()
+
+    def setUp(self):
+        '''Фикстуры'''
+        cache.clear()
+        self.guest_client = Client()
+        self.reader_client = Client()
+        self.reader_client.force_login(ApiTest.reader)
+
+    def test_feeds_return_serialized_posts(self):
+        '''Ленты отдают посты и ссылку на следующую страницу'''
+        urls = (
+            reverse('posts:api_index'),
+            reverse('posts:api_group_list',
+                    kwargs={'slug': ApiTest.group.slug}),
+            reverse('posts:api_profile',
+                    kwargs={'username': ApiTest.author.username}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                data = self.guest_client.get(url).json()
+                self.assertEqual(
+                    len(data['results']), PageSet.POSTS_AMOUNT_AT_PADGE
+                )
+                self.assertEqual(data['results'][0]['author'], {
+                    'username': 'author',
+                    'full_name': 'Лев Толстой',
+                })
+                self.assertIsNone(data['previous'])
+                next_data = self.guest_client.get(data['next']).json()
+                self.assertTrue(next_data['results'])
+                self.assertIsNotNone(next_data['previous'])
+
+    def test_feed_posts_have_full_text(self):
+        '''Посты лент отдаются с полным текстом и последним коментарием'''
+        post = self.guest_client.get(
+            reverse('posts:api_index')
+        ).json()['results'][0]
+        self.assertEqual(post['id'], ApiTest.post.pk)
+        self.assertEqual(post['text'], ApiTest.post.text)
+        self.assertEqual(post['comments_count'], 1)
+        self.assertEqual(
+            post['latest_comment']['text'], 'Тестовый коммент'
+        )
+
+    def test_profile_and_post_detail(self):
+        '''Профиль со счетчиками и пост с коментариями'''
+        profile = self.guest_client.get(reverse(
+            'posts:api_profile',
+            kwargs={'username': ApiTest.author.username}
+        )).json()
+        self.assertEqual(profile['author']['posts_count'], 12)
+        self.assertEqual(profile['author']['followers_count'], 1)
+        detail = self.guest_client.get(reverse(
+            'posts:api_post_detail', kwargs={'post_id': ApiTest.post.pk}
+        )).json()
+        self.assertEqual(detail['post']['comments_count'], 1)
+        self.assertEqual(detail['comments'][0]['text'], 'Тестовый коммент')
+
+    def test_missing_objects_not_found(self):
+        '''Несуществующие группа, автор и пост дают 404'''
+        urls = (
+            reverse('posts:api_group_list', kwargs={'slug': 'missing'}),
+            reverse('posts:api_profile', kwargs={'username': 'missing'}),
+            reverse('posts:api_post_detail', kwargs={'post_id': 0}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_follow_feed_requires_login(self):
+        '''Лента подписок доступна только пользователю'''
+        response = self.guest_client.get(reverse('posts:api_follow_index'))
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
+        response = self.reader_client.get(reverse('posts:api_follow_index'))
+        self.assertEqual(
+            response.json()['results'][0]['id'], ApiTest.post.pk
+        )
+        self.assertIn('Cookie', response['Vary'])
+
+    @with_cache_backends
+    def test_not_modified_skips_feed_query(self):
+        '''Совпавший ETag дает 304 одним запросом метаданных'''
+        url = reverse('posts:api_index')
+        etag = self.guest_client.get(url)['ETag']
+        with self.assertNumQueries(1):
+            response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        self.assertEqual(response.content, b'')
+
+    def test_if_modified_since(self):
+        '''Совпавший Last-Modified дает 304'''
+        url = reverse('posts:api_post_detail',
+                      kwargs={'post_id': ApiTest.post.pk})
+        last_modified = self.guest_client.get(url)['Last-Modified']
+        response = self.guest_client.get(
+            url, HTTP_IF_MODIFIED_SINCE=last_modified
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+    @with_cache_backends
+    def test_etag_changes_with_feed(self):
+        '''ETag меняется с новой записью и страницей ленты'''
+        url = reverse('posts:api_profile',
+                      kwargs={'username': ApiTest.author.username})
+        response = self.guest_client.get(url)
+        etag = response['ETag']
+        next_etag = self.guest_client.get(response.json()['next'])['ETag']
+        self.assertNotEqual(etag, next_etag)
+        Post.objects.create(author=ApiTest.author, text='Новый пост')
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        etag = response['ETag']
+        self.reader_client.get(reverse(
+            'posts:profile_unfollow',
+            kwargs={'username': ApiTest.author.username}
+        ))
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response.json()['author']['followers_count'], 0)
@@ -0,0 +1,107 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Post, User, UserCounters
+
+
+class CountersTest(TestCase):
+    '''Класс тестов денормализованных счетчиков'''
+    @classmethod
+    def setUpClass(cls):
+        '''Фикстуры класса'''
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.post = Post.objects.create(
+            author=cls.author,
+            text='Тестовый пост',
+        )
+
+    def setUp(self):
+        '''Фикстуры'''
+        self.reader_client = Client()
+        self.reader_client.force_login(CountersTest.reader)
+
+    def counters(self, user):
+        return UserCounters.objects.get(user=user)
+
+    def test_post_counter_follows_writes(self):
+        '''Число постов автора меняется при создании и удалении поста'''
+        self.assertEqual(self.counters(CountersTest.author).posts_count, 1)
+        new_post = Post.objects.create(
+            author=CountersTest.author,
+            text='Еще пост',
+        )
+        self.assertEqual(self.counters(CountersTest.author).posts_count, 2)
+        new_post.delete()
+        self.assertEqual(self.counters(CountersTest.author).posts_count, 1)
+
+    def test_follow_counters_follow_writes(self):
+        '''Счетчики подписок меняются при подписке и отписке'''
+        self.reader_client.get(reverse(
+            'posts:profile_follow',
+            kwargs={'username': CountersTest.author.username}
+        ))
+        self.assertEqual(
+            self.counters(CountersTest.author).followers_count, 1
+        )
+        self.assertEqual(
+            self.counters(CountersTest.reader).following_count, 1
+        )
+        self.reader_client.get(reverse(
+            'posts:profile_unfollow',
+            kwargs={'username': CountersTest.author.username}
+        ))
+        self.assertEqual(
+            self.counters(CountersTest.author).followers_count, 0
+        )
+        self.assertEqual(
+            self.counters(CountersTest.reader).following_count, 0
+        )
+
+    def test_comment_counter_follows_writes(self):
+        '''Число коментариев поста меняется при записи коментария'''
+        comment = Comment.objects.create(
+            post=CountersTest.post,
+            author=CountersTest.reader,
+            text='Тестовый коммент',
+        )
+        CountersTest.post.refresh_from_db()
+        self.assertEqual(CountersTest.post.comments_count, 1)
+        comment.delete()
+        CountersTest.post.refresh_from_db()
+        self.assertEqual(CountersTest.post.comments_count, 0)
+
+    def test_recount_command_fixes_drift(self):
+        '''Команда recount_counters исправляет расхождения'''
+        Post.objects.bulk_create([
+            Post(author=CountersTest.author, text='Пост без сигналов')
+        ])
+        Follow.objects.bulk_create([
+            Follow(user=CountersTest.reader, author=CountersTest.author)
+        ])
+        UserCounters.objects.filter(user=CountersTest.reader).delete()
+        out = StringIO()
+        call_command('recount_counters', stdout=out)
+        self.assertIn('2', out.getvalue())
+        author_counters = self.counters(CountersTest.author)
+        self.assertEqual(author_counters.posts_count, 2)
+        self.assertEqual(author_counters.followers_count, 1)
+        self.assertEqual(self.counters(CountersTest.reader).following_count, 1)
+
+    def test_profile_uses_counters(self):
+        '''Страница профиля не считает посты и подписки через COUNT(*)'''
+        with CaptureQueriesContext(connection) as queries:
+            response = self.reader_client.get(reverse(
+                'posts:profile',
+                kwargs={'username': CountersTest.author.username}
+            ))
+        self.assertContains(response, 'Всего постов: 1')
+        self.assertFalse(
+            any('COUNT(' in query['sql'] for query in queries.captured_queries)
+        )
@@ -1,19 +1,29 @@
 import shutil
 import tempfile
+from io import BytesIO
+from unittest import mock
 
 from django.conf import settings
+from django.core.files.base import ContentFile
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 from django.shortcuts import get_object_or_404
+from PIL import Image
 
 from ..models import Post, Group, User, Comment
+from ..constants import CacheSet, ImageSet
+from ..invalidation import feed_version
+from ..thumbnails import generate_thumbnail, prepare_image
 
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+EXIF_MAKE_TAG = 0x010F
 
 
-@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+@override_settings(
+    MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAILS_IN_BACKGROUND=False
+)
 class PostCreateFormTest(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -82,6 +92,130 @@ class PostCreateFormTest(TestCase):
                 'posts:profile',
                 kwargs={'username': PostCreateFormTest.user.username}))
 
+    def test_post_image_gets_pregenerated_thumbnail(self):
+        '''Миниатюра картинки строится вне рендера страниц'''
+        image = SimpleUploadedFile(
+            name='thumbnail_test_image.gif',
+            content=PostCreateFormTest.byte_image,
+            content_type='image/gif'
+        )
+        with mock.patch('posts.signals.schedule_thumbnail') as schedule:
+            self.authorized_autor.post(
+                reverse('posts:post_create'),
+                data={'text': 'Пост с картинкой', 'image': image},
+            )
+        post = Post.objects.get(text='Пост с картинкой')
+        schedule.assert_called_once_with(post)
+        self.assertEqual(post.thumbnail_url, '')
+        version = feed_version(CacheSet.POST, post.id)
+        generate_thumbnail(post.id)
+        self.assertNotEqual(feed_version(CacheSet.POST, post.id), version)
+        post.refresh_from_db()
+        width, height = map(int, ImageSet.THUMBNAIL_GEOMETRY.split('x'))
+        self.assertTrue(post.thumbnail_url.startswith(settings.MEDIA_URL))
+        self.assertEqual(
+            (post.thumbnail_width, post.thumbnail_height), (width, height)
+        )
+        response = self.authorized_autor.get(
+            reverse('posts:post_detail', kwargs={'post_id': post.id})
+        )
+        self.assertContains(response, post.thumbnail_url)
+
+    def test_upload_limits(self):
+        '''Слишком большие файл и картинка не принимаются'''
+        limits = {
+            'MAX_UPLOAD_BYTES': len(PostCreateFormTest.byte_image) - 1,
+            'MAX_SIDE': 1,
+            'MAX_PIXELS': 1,
+        }
+        for limit, value in limits.items():
+            with self.subTest(limit=limit):
+                image = SimpleUploadedFile(
+                    name='limit_test_image.gif',
+                    content=PostCreateFormTest.byte_image,
+                    content_type='image/gif'
+                )
+                with mock.patch.object(ImageSet, limit, value):
+                    response = self.authorized_autor.post(
+                        reverse('posts:post_create'),
+                        data={'text': 'Пост с большой картинкой',
+                              'image': image},
+                    )
+                self.assertTrue(response.context['form'].has_error('image'))
+        self.assertFalse(
+            Post.objects.filter(text='Пост с большой картинкой').exists()
+        )
+
+    def test_uploaded_image_reencoded(self):
+        '''Картинка уменьшается и сохраняется в WebP без EXIF'''
+        exif = Image.Exif()
+        exif[EXIF_MAKE_TAG] = 'Тестовая камера'
+        photo = BytesIO()
+        Image.new('RGB', (3000, 1500), 'red').save(
+            photo, 'JPEG', exif=exif.tobytes()
+        )
+        image = SimpleUploadedFile(
+            name='photo.jpg',
+            content=photo.getvalue(),
+            content_type='image/jpeg'
+        )
+        with mock.patch('posts.signals.schedule_thumbnail'):
+            self.authorized_autor.post(
+                reverse('posts:post_create'),
+                data={'text': 'Пост с фотографией', 'image': image},
+            )
+        post = Post.objects.get(text='Пост с фотографией')
+        original = post.image.name
+        prepare_image(post.id)
+        post.refresh_from_db()
+        self.assertTrue(post.image.name.endswith(ImageSet.STORED_EXTENSION))
+        self.assertFalse(post.image.storage.exists(original))
+        self.assertTrue(post.thumbnail_url)
+        with post.image.open('rb') as stored, Image.open(stored) as result:
+            self.assertEqual(result.format, ImageSet.STORED_FORMAT)
+            self.assertEqual(
+                result.size,
+                (ImageSet.STORED_MAX_SIDE, ImageSet.STORED_MAX_SIDE // 2),
+            )
+            self.assertFalse(result.getexif())
+
+    def test_orm_image_change_scheduled(self):
+        '''Обработка картинки ставится при сохранении с новой картинкой,
+        в том числе вне форм'''
+        post = Post.objects.get(pk=PostCreateFormTest.post.pk)
+        with mock.patch('posts.signals.schedule_thumbnail') as schedule:
+            post.text = 'Правка без картинки'
+            post.save()
+            schedule.assert_not_called()
+            post.image.save(
+                'orm_image.gif',
+                ContentFile(PostCreateFormTest.byte_image),
+            )
+            schedule.assert_called_once_with(post)
+            post.text = 'Правка с той же картинкой'
+            post.save()
+            schedule.assert_called_once_with(post)
+            Post.objects.get(pk=post.pk).save()
+            schedule.assert_called_once_with(post)
+
+    def test_small_image_kept(self):
+        '''Картинка в пределах STORED_MAX_SIDE без EXIF не пережимается'''
+        post = Post.objects.create(
+            author=PostCreateFormTest.user,
+            text='Пост с маленькой картинкой',
+            image=SimpleUploadedFile(
+                name='small_image.gif',
+                content=PostCreateFormTest.byte_image,
+                content_type='image/gif'
+            ),
+        )
+        original = post.image.name
+        prepare_image(post.id)
+        post.refresh_from_db()
+        self.assertEqual(post.image.name, original)
+        self.assertTrue(post.image.storage.exists(original))
+        self.assertTrue(post.thumbnail_url)
+
     def test_post_edit_form(self):
         '''Проверка формы редактированиия поста'''
         posts_amount_before_editing = Post.objects.count()
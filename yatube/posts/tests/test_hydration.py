@@ -0,0 +1,207 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.testing import with_cache_backends
+from core.versioning import get_versions
+
+from ..constants import CacheSet, PageSet, TextSet
+from ..hydration import (
+    AuthorCard,
+    CommentCard,
+    GroupCard,
+    build_cards,
+    feed_cards,
+)
+from ..models import Comment, Group, Post, User
+
+
+class HydrationTest(TestCase):
+    '''Класс тестов карточек постов с авторами и группами из кэша'''
+    @classmethod
+    def setUpClass(cls):
+        '''Фикстуры класса'''
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username='author', first_name='Лев', last_name='Толстой'
+        )
+        cls.another_author = User.objects.create_user(username='another')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        Post.objects.bulk_create(
+            Post(
+                author=(cls.author, cls.another_author)[index % 2],
+                group=(cls.group, None)[index % 3 == 0],
+                text=f'Тестовый пост {index}',
+            ) for index in range(PageSet.POSTS_AMOUNT_AT_PADGE)
+        )
+        cls.commented_posts = list(Post.objects.all()[:2])
+        for post in cls.commented_posts:
+            Comment.objects.create(
+                post=post, author=cls.author, text='Первый коментарий'
+            )
+            Comment.objects.create(
+                post=post,
+                author=cls.another_author,
+                text='слово ' * TextSet.COMMENT_PREVIEW_CHARS,
+            )
+
+    def setUp(self):
+        '''Фикстуры'''
+        cache.clear()
+        self.guest_client = Client()
+
+    def page(self):
+        return list(build_cards(feed_cards(Post.objects.all())[
+            :PageSet.POSTS_AMOUNT_AT_PADGE
+        ]))
+
+    @with_cache_backends
+    def test_cached_page_takes_one_query(self):
+        '''Промахи - запрос на тип данных, из кэша - только запрос постов'''
+        with self.assertNumQueries(4):
+            cards = self.page()
+        with self.assertNumQueries(1):
+            self.assertEqual(self.page(), cards)
+
+    def test_cards_share_authors_and_groups(self):
+        '''Автор и группа собираются один раз на страницу'''
+        cards = self.page()
+        authors = {id(card.author) for card in cards}
+        groups = {id(card.group) for card in cards if card.group}
+        self.assertEqual(len(authors), 2)
+        self.assertEqual(len(groups), 1)
+        for card in cards:
+            with self.subTest(post=card.pk):
+                if card.group_id:
+                    self.assertIsInstance(card.group, GroupCard)
+                    self.assertEqual(card.group.pk, HydrationTest.group.pk)
+                else:
+                    self.assertIsNone(card.group)
+
+    @with_cache_backends
+    def test_renamed_author_reloaded(self):
+        '''Смена имени автора сбрасывает его запись в кэше'''
+        self.page()
+        author = User.objects.get(pk=HydrationTest.author.pk)
+        author.first_name = 'Алексей'
+        author.save()
+        card = next(
+            card for card in self.page()
+            if card.author_id == HydrationTest.author.pk
+        )
+        self.assertIsInstance(card.author, AuthorCard)
+        self.assertEqual(card.author.get_full_name(), 'Алексей Толстой')
+
+    def test_text_loaded_only_on_request(self):
+        '''Полный текст есть только у карточек из feed_cards с with_text,
+        без него обращение к text не идет в базу'''
+        texts = list(Post.objects.values_list('text', flat=True))
+        cards = list(build_cards(feed_cards(Post.objects.all(), True)))
+        with self.assertNumQueries(0):
+            self.assertEqual([card.text for card in cards], texts)
+        card = self.page()[0]
+        with self.assertNumQueries(0):
+            with self.assertRaises(AttributeError):
+                card.text
+
+    def test_card_is_not_model(self):
+        '''Карточка равна посту по pk, но не выдает себя за модель'''
+        card = self.page()[0]
+        post = Post.objects.get(pk=card.pk)
+        self.assertEqual(card, post)
+        self.assertNotIsInstance(card, Post)
+        self.assertNotEqual(post, card)
+        self.assertFalse(hasattr(card, '_meta'))
+
+    def test_raw_excerpt_cut_by_word(self):
+        '''Начало текста поста без готового HTML обрезается по границе
+        слова'''
+        Post.objects.bulk_create([Post(
+            author=HydrationTest.author,
+            text='слово ' * TextSet.EXCERPT_CHARS,
+        )])
+        card, short = self.page()[:2]
+        self.assertTrue(card.excerpt_truncated)
+        self.assertTrue(card.raw_excerpt.endswith('слово…'))
+        self.assertLessEqual(
+            len(card.raw_excerpt), TextSet.EXCERPT_CHARS + 1
+        )
+        self.assertFalse(short.excerpt_truncated)
+        self.assertFalse(short.raw_excerpt.endswith('…'))
+
+    def test_latest_comment_preview(self):
+        '''Карточка показывает число и начало последнего коментария'''
+        cards = {card.pk: card for card in self.page()}
+        for post in HydrationTest.commented_posts:
+            with self.subTest(post=post.pk):
+                card = cards[post.pk]
+                self.assertEqual(card.comments_count, 2)
+                self.assertIsInstance(card.latest_comment, CommentCard)
+                self.assertEqual(
+                    card.latest_comment.author.pk,
+                    HydrationTest.another_author.pk,
+                )
+                self.assertTrue(card.latest_comment.text.endswith('…'))
+                self.assertLessEqual(
+                    len(card.latest_comment.text),
+                    TextSet.COMMENT_PREVIEW_CHARS + 1,
+                )
+        self.assertTrue(all(
+            card.latest_comment is None
+            for card in cards.values() if not card.comments_count
+        ))
+
+    def test_feed_queries_do_not_grow_with_comments(self):
+        '''Число запросов ленты не зависит от числа постов с коментариями'''
+        def feed_queries():
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                response = self.guest_client.get(reverse('posts:index'))
+            self.assertContains(response, 'Коментариев: 2')
+
+            return len(queries.captured_queries)
+
+        queries = feed_queries()
+        for post in Post.objects.exclude(
+            pk__in=[post.pk for post in HydrationTest.commented_posts]
+        ):
+            Comment.objects.create(
+                post=post, author=HydrationTest.author, text='Коментарий'
+            )
+        self.assertEqual(feed_queries(), queries)
+
+    @with_cache_backends
+    def test_new_comment_updates_feed_card(self):
+        '''Новый коментарий меняет карточку поста в ленте'''
+        client = Client()
+        client.force_login(HydrationTest.author)
+        post = HydrationTest.commented_posts[0]
+        self.guest_client.get(reverse('posts:index'))
+        client.post(
+            reverse('posts:add_comment', kwargs={'post_id': post.pk}),
+            {'text': 'Свежий коментарий'},
+        )
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertContains(response, 'Коментариев: 3')
+        self.assertContains(response, 'Свежий коментарий')
+
+    @with_cache_backends
+    def test_deleted_comment_updates_feed_card(self):
+        '''Удаление коментария через ORM меняет карточку, но не версию
+        ленты'''
+        post = HydrationTest.commented_posts[1]
+        url = reverse('posts:index')
+        etag = self.guest_client.get(url)['ETag']
+        feed_version = get_versions((CacheSet.FEED, ''))
+        post.comments.order_by('-created', '-pk').first().delete()
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Коментариев: 1')
+        self.assertContains(response, 'Первый коментарий')
+        self.assertEqual(get_versions((CacheSet.FEED, '')), feed_version)
@@ -0,0 +1,47 @@
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import TestCase
+
+from ..models import Comment, Follow, Group, Post, User
+from ..query_plans import explain, feed_querysets, uses_sort
+
+
+@skipUnless(connection.vendor == 'sqlite', 'планы запросов SQLite')
+class FeedIndexesTest(TestCase):
+    '''Класс тестов индексов для запросов лент'''
+    @classmethod
+    def setUpClass(cls):
+        '''Фикстуры класса'''
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.author,
+            group=cls.group,
+            text='Тестовый пост',
+        )
+        Comment.objects.create(
+            post=cls.post,
+            author=cls.reader,
+            text='Тестовый коммент',
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def test_feeds_read_by_index_without_sorting(self):
+        '''Ленты читаются по индексу без сортировки строк'''
+        querysets = feed_querysets(
+            FeedIndexesTest.author.pk,
+            FeedIndexesTest.group.pk,
+            FeedIndexesTest.post.pk,
+            FeedIndexesTest.reader.pk,
+        )
+        for name in querysets:
+            with self.subTest(name=name):
+                plan = explain(querysets[name])
+                self.assertFalse(uses_sort(plan), plan)
@@ -1,7 +1,10 @@
+from io import StringIO
+
+from django.core.management import call_command
 from django.test import TestCase
 
 from ..models import Group, Post, User
-from ..constants import MetaSet
+from ..constants import MetaSet, TextSet
 
 
 class PostModelTest(TestCase):
@@ -73,3 +76,33 @@ class PostModelTest(TestCase):
                     PostModelTest.post._meta.get_field(field).help_text,
                     expected_value
                 )
+
+    def test_text_rendered_on_save(self):
+        """При сохранении поста готовятся HTML текста и его начало."""
+        post = Post.objects.create(
+            author=PostModelTest.user,
+            text='<b>Первый</b> абзац\n\n' + 'слово ' * TextSet.EXCERPT_CHARS,
+        )
+        self.assertTrue(post.text_html.startswith(
+            '<p>&lt;b&gt;Первый&lt;/b&gt; абзац</p>'
+        ))
+        self.assertTrue(post.excerpt_truncated)
+        self.assertLess(len(post.excerpt_html), len(post.text_html))
+        self.assertTrue(post.excerpt_html.endswith('слово…</p>'))
+        post.text = 'Короткий текст'
+        post.save(update_fields=['text'])
+        post.refresh_from_db()
+        self.assertEqual(post.text_html, '<p>Короткий текст</p>')
+        self.assertFalse(post.excerpt_truncated)
+
+    def test_render_post_texts_command(self):
+        """Команда заполняет HTML постов, созданных bulk_create."""
+        Post.objects.bulk_create(
+            Post(author=PostModelTest.user, text=f'Пост {index}')
+            for index in range(5)
+        )
+        call_command('render_post_texts', batch_size=2, stdout=StringIO())
+        self.assertFalse(Post.objects.filter(text_html='').exists())
+        self.assertTrue(
+            Post.objects.filter(text_html='<p>Пост 4</p>').exists()
+        )
@@ -0,0 +1,206 @@
+import json
+import os
+import random
+import time
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, tag
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..counters import recount_counters
+from ..models import Comment, Follow, Group, Post, TimelineEntry, User
+
+
+USERS_AMOUNT = 1000
+GROUPS_AMOUNT = 20
+POSTS_AMOUNT = 5000
+COMMENTS_AMOUNT = 5000
+FOLLOWS_PER_USER = 5
+REQUESTS_PER_VIEW = 20
+PERCENTILES = (50, 95)
+BATCH_SIZE = 500
+
+# Бюджет страницы: (максимум SQL-запросов, максимум p95 в миллисекундах).
+# Запросы считаются при пустом кэше на каждом запросе замера. В каждый
+# бюджет входят сессия и пользователь (2), у лент с условным GET -
+# выборка страницы для ETag (posts.conditional). Ленты дочитывают
+# авторов, группы и последние коментарии тремя запросами на страницу
+# (posts.hydration), с заполненным кэшем этих запросов нет.
+BUDGETS = {
+    # 2 + ETag, страница, 3 на авторов, группы и коментарии
+    'index': (7, 250),
+    # как index и группа по slug
+    'group_posts': (8, 250),
+    # как index, автор по username и проверка подписки
+    'profile': (9, 250),
+    # 2 + ETag, пост с автором и группой, страница коментариев
+    'post_detail': (5, 250),
+    # 2 + авторы, которых лента читает без рассылки (posts.timeline),
+    # страница, 3 на авторов, группы и коментарии
+    'follow_index': (7, 250),
+    # 2 + вставка поста, счетчик постов автора, проверка лимита рассылки,
+    # подписчики и вставка в их ленты, поисковый индекс, подписчики для
+    # сброса версий лент (posts.invalidation)
+    'post_create': (9, 250),
+}
+
+# Время ответа зависит от машины, поэтому p95 проверяется только с
+# YATUBE_PERF_TIMINGS=1, а число запросов - всегда
+CHECK_TIMINGS = os.environ.get('YATUBE_PERF_TIMINGS') == '1'
+
+# Путь к JSON-файлу, в который сохраняются замеры
+REPORT_PATH = os.environ.get('YATUBE_PERF_REPORT')
+
+
+def percentile(values, percent):
+    '''Перцентиль по ближайшему рангу'''
+    ordered = sorted(values)
+    rank = max(0, round(percent / 100 * len(ordered)) - 1)
+
+    return ordered[rank]
+
+
+@tag('performance')
+class ViewsBudgetTest(TestCase):
+    '''Класс тестов бюджета запросов и времени ответа страниц posts'''
+    @classmethod
+    def setUpClass(cls):
+        '''Фикстуры класса: база с тысячами пользователей и постов'''
+        super().setUpClass()
+        randomizer = random.Random(0)
+        User.objects.bulk_create(
+            (User(username=f'user{index}')
+             for index in range(USERS_AMOUNT)),
+            batch_size=BATCH_SIZE,
+        )
+        user_ids = list(User.objects.values_list('pk', flat=True))
+        Group.objects.bulk_create(
+            Group(
+                title=f'Группа {index}',
+                slug=f'group-{index}',
+                description='Описание',
+            ) for index in range(GROUPS_AMOUNT)
+        )
+        group_ids = list(Group.objects.values_list('pk', flat=True))
+        Post.objects.bulk_create(
+            (Post(
+                author_id=randomizer.choice(user_ids),
+                group_id=randomizer.choice(group_ids + [None]),
+                text=f'Пост {index}',
+            ) for index in range(POSTS_AMOUNT)),
+            batch_size=BATCH_SIZE,
+        )
+        post_ids = list(Post.objects.values_list('pk', flat=True))
+        Comment.objects.bulk_create(
+            (Comment(
+                post_id=randomizer.choice(post_ids),
+                author_id=randomizer.choice(user_ids),
+                text=f'Коммент {index}',
+            ) for index in range(COMMENTS_AMOUNT)),
+            batch_size=BATCH_SIZE,
+        )
+        Follow.objects.bulk_create(
+            (Follow(user_id=user_id, author_id=author_id)
+             for user_id in user_ids
+             for author_id in set(randomizer.sample(
+                 user_ids, FOLLOWS_PER_USER)) - {user_id}),
+            batch_size=BATCH_SIZE,
+        )
+        author_posts = {}
+        for post_id, author_id, created in Post.objects.values_list(
+                'pk', 'author', 'created'):
+            author_posts.setdefault(author_id, []).append((post_id, created))
+        TimelineEntry.objects.bulk_create(
+            (TimelineEntry(user_id=user_id, post_id=post_id, created=created)
+             for user_id, author_id in Follow.objects.values_list(
+                 'user', 'author')
+             for post_id, created in author_posts.get(author_id, ())),
+            batch_size=BATCH_SIZE,
+        )
+        recount_counters()
+        cls.reader = User.objects.get(pk=user_ids[0])
+        cls.author = User.objects.filter(
+            counters__posts_count__gt=0).first()
+        cls.group = Group.objects.first()
+        cls.post = Post.objects.order_by('-comments_count').first()
+        cls.report = {}
+
+    @classmethod
+    def tearDownClass(cls):
+        if REPORT_PATH:
+            with open(REPORT_PATH, 'w') as report:
+                json.dump(cls.report, report, ensure_ascii=False, indent=2)
+        super().tearDownClass()
+
+    def setUp(self):
+        '''Фикстуры'''
+        self.reader_client = Client()
+        self.reader_client.force_login(ViewsBudgetTest.reader)
+
+    def measure(self, name, request):
+        '''Замер запросов и перцентилей времени ответа страницы'''
+        max_queries, max_p95 = BUDGETS[name]
+        timings = []
+        queries_amounts = []
+        for _ in range(REQUESTS_PER_VIEW):
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                response = request()
+                timings.append((time.perf_counter() - started) * 1000)
+            self.assertLess(response.status_code, 400)
+            queries_amounts.append(len(queries.captured_queries))
+            self.assertLessEqual(
+                queries_amounts[-1], max_queries,
+                f'{name}, запрос {len(queries_amounts)}',
+            )
+        result = {'queries': max(queries_amounts)}
+        result.update({
+            f'p{percent}_ms': round(percentile(timings, percent), 2)
+            for percent in PERCENTILES
+        })
+        ViewsBudgetTest.report[name] = result
+        if CHECK_TIMINGS:
+            self.assertLessEqual(result['p95_ms'], max_p95, result)
+
+    def test_index_budget(self):
+        '''Бюджет главной страницы'''
+        self.measure('index', lambda: self.reader_client.get(
+            reverse('posts:index')
+        ))
+
+    def test_group_posts_budget(self):
+        '''Бюджет страницы группы'''
+        self.measure('group_posts', lambda: self.reader_client.get(
+            reverse('posts:group_list',
+                    kwargs={'slug': ViewsBudgetTest.group.slug})
+        ))
+
+    def test_profile_budget(self):
+        '''Бюджет страницы профиля'''
+        self.measure('profile', lambda: self.reader_client.get(
+            reverse('posts:profile',
+                    kwargs={'username': ViewsBudgetTest.author.username})
+        ))
+
+    def test_post_detail_budget(self):
+        '''Бюджет страницы поста'''
+        self.measure('post_detail', lambda: self.reader_client.get(
+            reverse('posts:post_detail',
+                    kwargs={'post_id': ViewsBudgetTest.post.id})
+        ))
+
+    def test_follow_index_budget(self):
+        '''Бюджет ленты подписок'''
+        self.measure('follow_index', lambda: self.reader_client.get(
+            reverse('posts:follow_index')
+        ))
+
+    def test_post_create_budget(self):
+        '''Бюджет создания поста'''
+        self.measure('post_create', lambda: self.reader_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Пост для замера'},
+        ))
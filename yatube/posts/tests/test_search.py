@@ -0,0 +1,138 @@
+from io import StringIO
+from unittest import skipUnless
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..constants import SearchSet
+from ..models import Comment, Post, User
+from ..search import search_posts
+from ..stemmer import stem
+
+
+class StemmerTest(TestCase):
+    '''Класс тестов русского стеммера'''
+    def test_word_forms_share_stem(self):
+        '''Формы одного слова дают одну основу'''
+        for words in (
+            ('прогулка', 'прогулки', 'прогулками', 'прогулкой'),
+            ('красивый', 'красивая', 'красивыми'),
+            ('читать', 'читает', 'читали'),
+            ('ёлка', 'елки'),
+        ):
+            with self.subTest(words=words):
+                self.assertEqual(len({stem(word) for word in words}), 1)
+
+
+@skipUnless(connection.vendor == 'sqlite', 'индекс FTS5 SQLite')
+class SearchTest(TestCase):
+    '''Класс тестов полнотекстового поиска'''
+    @classmethod
+    def setUpClass(cls):
+        '''Фикстуры класса'''
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(
+            author=cls.author,
+            text='Утренние прогулки по набережной',
+        )
+        cls.other_post = Post.objects.create(
+            author=cls.author,
+            text='Рецепт <b>кофе</b> с корицей',
+        )
+
+    def setUp(self):
+        '''Фикстуры'''
+        self.guest_client = Client()
+
+    def found(self, query, token=None):
+        return list(search_posts(query, token))
+
+    def test_search_finds_other_word_forms(self):
+        '''Поиск находит пост по другой форме слова'''
+        self.assertEqual(self.found('прогулка'), [SearchTest.post])
+        self.assertEqual(self.found('ПРОГУЛКАМИ набережная'),
+                         [SearchTest.post])
+        self.assertEqual(self.found('прогулка кофе'), [])
+        self.assertEqual(self.found('  ...  '), [])
+
+    def test_search_follows_post_writes(self):
+        '''Индекс обновляется при правке и удалении поста'''
+        post = Post.objects.create(
+            author=SearchTest.author, text='Поездка на море'
+        )
+        self.assertEqual(self.found('поездки'), [post])
+        post.text = 'Поездка в горы'
+        post.save()
+        self.assertEqual(self.found('море'), [])
+        self.assertEqual(self.found('горах'), [post])
+        post.delete()
+        self.assertEqual(self.found('горах'), [])
+
+    def test_search_finds_post_by_comment(self):
+        '''Пост находится по тексту коментария'''
+        comment = Comment.objects.create(
+            post=SearchTest.other_post,
+            author=SearchTest.author,
+            text='Лучше добавить кардамон',
+        )
+        found = self.found('кардамоном')
+        self.assertEqual(found, [SearchTest.other_post])
+        self.assertTrue(found[0].found_in_comment)
+        self.assertIn('<mark>кардамон</mark>', found[0].snippet)
+        comment.delete()
+        self.assertEqual(self.found('кардамоном'), [])
+
+    def test_snippet_highlights_and_escapes(self):
+        '''Совпадения выделяются, разметка текста экранируется'''
+        snippet = self.found('кофе')[0].snippet
+        self.assertEqual(
+            snippet,
+            'Рецепт &lt;b&gt;<mark>кофе</mark>&lt;/b&gt; с корицей',
+        )
+
+    def test_search_cursor_pages(self):
+        '''Курсор обходит все результаты без повторов'''
+        Post.objects.bulk_create(
+            Post(author=SearchTest.author, text=f'Снег {index}')
+            for index in range(SearchSet.RESULTS_AMOUNT_AT_PAGE + 3)
+        )
+        posts = Post.objects.filter(text__startswith='Снег')
+        call_command('rebuild_search_index', stdout=StringIO())
+        first_page = search_posts('снега')
+        self.assertTrue(first_page.has_next())
+        second_page = search_posts(
+            'снега', first_page.paginator.next_cursor
+        )
+        self.assertFalse(second_page.has_next())
+        self.assertTrue(second_page.has_previous())
+        found = list(first_page) + list(second_page)
+        self.assertEqual(len(found), len(posts))
+        self.assertEqual(
+            {post.pk for post in found}, {post.pk for post in posts}
+        )
+
+    def test_search_page(self):
+        '''Страница поиска показывает выделенные результаты'''
+        Comment.objects.create(
+            post=SearchTest.post,
+            author=SearchTest.author,
+            text='Прогулка удалась',
+        )
+        with self.assertNumQueries(3):
+            response = self.guest_client.get(
+                reverse('posts:search'), {'q': 'прогулки'}
+            )
+        self.assertEqual(list(response.context['page_obj']),
+                         [SearchTest.post])
+        self.assertContains(response, '<mark>')
+
+    def test_broken_cursor_shows_first_page(self):
+        '''Битый курсор показывает первую страницу'''
+        response = self.guest_client.get(
+            reverse('posts:search'), {'q': 'кофе', 'cursor': '%%%'}
+        )
+        self.assertEqual(list(response.context['page_obj']),
+                         [SearchTest.other_post])
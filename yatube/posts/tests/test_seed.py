@@ -0,0 +1,79 @@
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db.models import Count, Max, Min
+from django.test import TestCase, override_settings
+
+from ..counters import recount_counters
+from ..models import Comment, Follow, Group, Post, TimelineEntry, User
+
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(
+    MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAILS_IN_BACKGROUND=False
+)
+class SeedCommandTest(TestCase):
+    '''Класс тестов команды seed_yatube'''
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_seed_creates_consistent_data(self):
+        '''Команда создает данные с согласованными счетчиками и лентами'''
+        call_command(
+            'seed_yatube',
+            users=50, groups=3, posts=300, comments=200, follows=5,
+            images=0.5, batch_size=64, stdout=StringIO(),
+        )
+        self.assertEqual(User.objects.count(), 50)
+        self.assertEqual(Group.objects.count(), 3)
+        self.assertEqual(Post.objects.count(), 300)
+        self.assertEqual(Comment.objects.count(), 200)
+        self.assertTrue(Follow.objects.exists())
+        image_posts = Post.objects.exclude(image='')
+        self.assertTrue(image_posts.exists())
+        self.assertFalse(image_posts.filter(thumbnail_url='').exists())
+        self.assertEqual(recount_counters(), 0)
+        follow = Follow.objects.first()
+        self.assertEqual(
+            TimelineEntry.objects.filter(
+                user_id=follow.user_id,
+                post__author_id=follow.author_id,
+            ).count(),
+            Post.objects.filter(author_id=follow.author_id).count(),
+        )
+
+    def test_seed_activity_follows_power_law(self):
+        '''Самый активный автор пишет много больше среднего'''
+        call_command(
+            'seed_yatube',
+            users=100, posts=2000, comments=0, follows=0,
+            stdout=StringIO(),
+        )
+        posts_by_author = Post.objects.values('author').annotate(
+            total=Count('pk')).order_by('-total')
+        self.assertGreater(posts_by_author[0]['total'], 2000 / 100 * 5)
+
+    def test_seed_spreads_dates_and_keeps_auto_now_add(self):
+        '''Даты постов и коментариев разбросаны по --days, а auto_now_add
+        моделей после команды не меняется'''
+        call_command(
+            'seed_yatube',
+            users=20, posts=200, comments=200, follows=0, days=30,
+            batch_size=64, stdout=StringIO(),
+        )
+        for model in (Post, Comment):
+            with self.subTest(model=model.__name__):
+                dates = model.objects.aggregate(
+                    first=Min('created'), last=Max('created')
+                )
+                self.assertGreater((dates['last'] - dates['first']).days, 20)
+                self.assertTrue(
+                    model._meta.get_field('created').auto_now_add
+                )
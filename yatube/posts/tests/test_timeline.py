@@ -0,0 +1,166 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.db.models import F
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from core.testing import with_cache_backends
+from core.versioning import get_versions
+
+from ..constants import CacheSet, PageSet, TimelineSet
+from ..models import Post, Follow, TimelineEntry, User
+
+
+class TimelineTest(TestCase):
+    '''Класс тестов материализованной ленты подписок'''
+    @classmethod
+    def setUpClass(cls):
+        '''Фикстуры класса'''
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.old_post = Post.objects.create(
+            author=cls.author,
+            text='Пост до подписки',
+        )
+
+    def setUp(self):
+        '''Фикстуры'''
+        self.reader_client = Client()
+        self.reader_client.force_login(TimelineTest.reader)
+
+    def follow_page_posts(self):
+        response = self.reader_client.get(reverse('posts:follow_index'))
+
+        return [post.pk for post in response.context['page_obj']]
+
+    def test_follow_backfills_timeline(self):
+        '''Подписка добавляет в ленту прежние посты автора'''
+        Follow.objects.create(
+            user=TimelineTest.reader, author=TimelineTest.author
+        )
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=TimelineTest.reader, post=TimelineTest.old_post
+        ).exists())
+        self.assertEqual(self.follow_page_posts(), [TimelineTest.old_post.pk])
+
+    def test_follow_feed_cursor_walks_timeline(self):
+        '''Курсор ленты подписок идет по записям ленты в порядке постов'''
+        Post.objects.bulk_create(
+            Post(author=TimelineTest.author, text=f'Пост {index}')
+            for index in range(PageSet.POSTS_AMOUNT_AT_PADGE + 2)
+        )
+        Follow.objects.create(
+            user=TimelineTest.reader, author=TimelineTest.author
+        )
+        self.assertFalse(TimelineEntry.objects.exclude(
+            created=F('post__created')
+        ).exists())
+        walked = []
+        cursor = None
+        while True:
+            params = {PageSet.CURSOR_PARAM: cursor} if cursor else {}
+            page_obj = self.reader_client.get(
+                reverse('posts:follow_index'), params
+            ).context['page_obj']
+            walked += [post.pk for post in page_obj]
+            cursor = page_obj.paginator.next_cursor
+            if not page_obj.has_next():
+                break
+        self.assertEqual(walked, list(
+            Post.objects.order_by('-created', '-pk').values_list(
+                'pk', flat=True
+            )
+        ))
+
+    def test_new_post_fans_out_to_followers(self):
+        '''Новый пост раскладывается в ленты подписчиков'''
+        Follow.objects.create(
+            user=TimelineTest.reader, author=TimelineTest.author
+        )
+        new_post = Post.objects.create(
+            author=TimelineTest.author,
+            text='Пост после подписки',
+        )
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=TimelineTest.reader, post=new_post
+        ).exists())
+        self.assertEqual(self.follow_page_posts()[0], new_post.pk)
+
+    def test_unfollow_trims_timeline(self):
+        '''Отписка удаляет посты автора из ленты'''
+        Follow.objects.create(
+            user=TimelineTest.reader, author=TimelineTest.author
+        )
+        self.reader_client.get(reverse(
+            'posts:profile_unfollow',
+            kwargs={'username': TimelineTest.author.username}
+        ))
+        self.assertFalse(TimelineEntry.objects.filter(
+            user=TimelineTest.reader
+        ).exists())
+        self.assertEqual(self.follow_page_posts(), [])
+
+    @mock.patch.object(TimelineSet, 'FANOUT_FOLLOWERS_LIMIT', 0)
+    def test_popular_author_posts_pulled_on_read(self):
+        '''Посты популярных авторов подмешиваются при чтении ленты'''
+        Follow.objects.create(
+            user=TimelineTest.reader, author=TimelineTest.author
+        )
+        new_post = Post.objects.create(
+            author=TimelineTest.author,
+            text='Пост популярного автора',
+        )
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.assertEqual(
+            self.follow_page_posts(), [new_post.pk, TimelineTest.old_post.pk]
+        )
+
+    @with_cache_backends
+    @mock.patch.object(TimelineSet, 'FANOUT_FOLLOWERS_LIMIT', 0)
+    def test_popular_author_post_keeps_follower_versions(self):
+        '''Пост популярного автора не меняет версии лент подписчиков, но
+        виден в закэшированной ленте подписок'''
+        cache.clear()
+        Follow.objects.create(
+            user=TimelineTest.reader, author=TimelineTest.author
+        )
+        self.follow_page_posts()
+        version = get_versions((CacheSet.FOLLOW, TimelineTest.reader.pk))
+        Post.objects.create(
+            author=TimelineTest.author,
+            text='Пост популярного автора',
+        )
+        self.assertEqual(
+            get_versions((CacheSet.FOLLOW, TimelineTest.reader.pk)), version
+        )
+        self.assertContains(
+            self.reader_client.get(reverse('posts:follow_index')),
+            'Пост популярного автора',
+        )
+
+    @mock.patch.object(TimelineSet, 'FANOUT_FOLLOWERS_LIMIT', 1)
+    def test_fanout_restored_below_limit(self):
+        '''Посты, написанные в режиме чтения, попадают в ленты, когда
+        подписчиков становится не больше порога'''
+        another_reader = User.objects.create_user(username='another')
+        for user in (TimelineTest.reader, another_reader):
+            Follow.objects.create(user=user, author=TimelineTest.author)
+        pulled_post = Post.objects.create(
+            author=TimelineTest.author,
+            text='Пост популярного автора',
+        )
+        self.assertFalse(
+            TimelineEntry.objects.filter(post=pulled_post).exists()
+        )
+        Follow.objects.filter(
+            user=another_reader, author=TimelineTest.author
+        ).delete()
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=TimelineTest.reader, post=pulled_post
+        ).exists())
+        self.assertEqual(
+            self.follow_page_posts(),
+            [pulled_post.pk, TimelineTest.old_post.pk],
+        )
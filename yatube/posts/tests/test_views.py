@@ -1,3 +1,4 @@
+from http import HTTPStatus
 import shutil
 import tempfile
 
@@ -6,16 +7,28 @@ from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.template.loader import get_template
+
+from core.testing import with_cache_backends
 
 from ..models import Post, Group, Comment, Follow, User
 from ..forms import PostForm, CommentForm
-from ..constants import PageSet
+from ..constants import PageSet, TextSet
+from ..invalidation import invalidate_post
+from ..cards import CARD_TEMPLATE, render_cards
+from ..feed_cache import feed_cache_stats
+from ..hydration import PostCard, build_cards, feed_cards
+from ..rendering import with_excerpts
 
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
 
-@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+@override_settings(
+    MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAILS_IN_BACKGROUND=False
+)
 class PostViewsTest(TestCase):
     '''Класс тестов view функций и классов приложения post'''
     @classmethod
@@ -90,11 +103,15 @@ class PostViewsTest(TestCase):
         ]
 
     def check_post_context(self, post):
-        self.assertEqual(post.id, PostViewsTest.posts[0].id)
-        self.assertEqual(post.text, PostViewsTest.posts[0].text)
-        self.assertEqual(post.group, PostViewsTest.posts[0].group)
-        self.assertEqual(post.author, PostViewsTest.posts[0].author)
-        self.assertEqual(post.image, PostViewsTest.posts[0].image)
+        '''Ленты отдают карточки постов: сравниваются pk и поля'''
+        expected = PostViewsTest.posts[0]
+        self.assertEqual(post.pk, expected.pk)
+        self.assertEqual(post.excerpt_html, expected.excerpt_html)
+        self.assertEqual(post.group.pk, expected.group.pk)
+        self.assertEqual(post.group.title, expected.group.title)
+        self.assertEqual(post.author.pk, expected.author.pk)
+        self.assertEqual(post.author.username, expected.author.username)
+        self.assertEqual(post.image.name, expected.image.name)
 
     def test_pages_uses_correct_templates(self):
         '''Проверка namspace post на корректность шаблонов'''
@@ -151,12 +168,35 @@ class PostViewsTest(TestCase):
             reverse('posts:post_detail',
                     kwargs={'post_id': PostViewsTest.posts[0].id}))
         self.check_post_context(response.context['post'])
+        self.assertEqual(
+            response.context['post'].text, PostViewsTest.posts[0].text
+        )
         self.assertIsInstance(response.context['form'], CommentForm)
         self.assertEqual(
             response.context['comments'][0],
             PostViewsTest.comment
         )
 
+    @override_settings(PAGE_CACHE_ENABLED=False)
+    def test_post_detail_query_count(self):
+        '''Страница поста с коментариями строится двумя запросами после
+        запроса свежести'''
+        post = PostViewsTest.post_with_comment
+        Comment.objects.bulk_create([
+            Comment(
+                post=post,
+                author=User.objects.create_user(username=f'reader{index}'),
+                text='Коммент' + str(index),
+            ) for index in range(PageSet.COMMENTS_AMOUNT_AT_PAGE)
+        ])
+        with self.assertNumQueries(3):
+            response = self.client.get(
+                reverse('posts:post_detail', kwargs={'post_id': post.id})
+            )
+        comments = response.context['comments']
+        self.assertEqual(len(comments), PageSet.COMMENTS_AMOUNT_AT_PAGE)
+        self.assertTrue(comments.has_next())
+
     def test_first_page_contains_correct_amount_of_records(self):
         '''Проверка корректное количество постов на первой странице'''
         for page in self.pages_with_paginator:
@@ -176,6 +216,47 @@ class PostViewsTest(TestCase):
                     PageSet.ADITIONAL_POSTS_FOR_TEST
                 )
 
+    @override_settings(PAGE_CACHE_ENABLED=False)
+    def test_cursor_pages_walk_forward_and_back(self):
+        '''Проверка перехода по курсорам вперед и назад'''
+        for page in self.pages_with_paginator:
+            with self.subTest(page=page):
+                first_page = self.client.get(page).context['page_obj']
+                next_cursor = first_page.paginator.next_cursor
+                self.assertTrue(first_page.has_next())
+                self.assertFalse(first_page.has_previous())
+                second_page = self.client.get(
+                    page, {PageSet.CURSOR_PARAM: next_cursor}
+                ).context['page_obj']
+                self.assertEqual(
+                    len(second_page), PageSet.ADITIONAL_POSTS_FOR_TEST
+                )
+                self.assertFalse(second_page.has_next())
+                self.assertTrue(second_page.has_previous())
+                previous_cursor = second_page.paginator.previous_cursor
+                previous_page = self.client.get(
+                    page, {PageSet.CURSOR_PARAM: previous_cursor}
+                ).context['page_obj']
+                self.assertEqual(
+                    list(previous_page.object_list),
+                    list(first_page.object_list)
+                )
+
+    def test_cursor_page_skips_count_query(self):
+        '''Курсорная пагинация не выполняет COUNT(*)'''
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('posts:index'))
+        self.assertFalse(
+            any('COUNT(' in query['sql'] for query in queries.captured_queries)
+        )
+
+    def test_broken_cursor_shows_first_page(self):
+        '''Битый курсор открывает первую страницу'''
+        response = self.client.get(
+            reverse('posts:index'), {PageSet.CURSOR_PARAM: 'broken!'}
+        )
+        self.check_post_context(response.context['page_obj'][0])
+
     def test_edit_post_context(self):
         '''Проверка контекста формы редактирования поста'''
         response = self.authorized_author.get(
@@ -213,22 +294,282 @@ class PostViewsTest(TestCase):
                 first_post_at_page = self.authorized_author.get(
                     page
                 ).context['page_obj'][0]
-                self.assertEqual(new_post, first_post_at_page)
+                self.assertEqual(first_post_at_page.pk, new_post.pk)
 
+    @with_cache_backends
     def test_cache_index(self):
         """Проверка хранения и очищения кэша для index."""
         response = self.authorized_author.get(reverse('posts:index'))
-        Post.objects.create(
+        # bulk_create пишет мимо сигналов, версии лент не меняются
+        Post.objects.bulk_create([Post(
             text='Новый пост',
             group=PostViewsTest.group,
             author=PostViewsTest.user,
-        )
+        )])
         response_old = self.authorized_author.get(reverse('posts:index'))
         self.assertEqual(response.content, response_old.content)
         cache.clear()
         response_new = self.authorized_author.get(reverse('posts:index'))
         self.assertNotEqual(response_old.content, response_new.content)
 
+    @with_cache_backends
+    def test_follow_keeps_index_cache(self):
+        '''Подписка не сбрасывает кэш главной страницы'''
+        response = self.authorized_author.get(reverse('posts:index'))
+        Post.objects.bulk_create([Post(
+            text='Новый пост',
+            group=PostViewsTest.group,
+            author=PostViewsTest.user,
+        )])
+        self.follower.get(reverse(
+            'posts:profile_unfollow',
+            kwargs={'username': PostViewsTest.user.username}
+        ))
+        response_old = self.authorized_author.get(reverse('posts:index'))
+        self.assertEqual(response.content, response_old.content)
+
+    @with_cache_backends
+    def test_post_create_invalidates_index_cache(self):
+        '''Создание поста через форму сбрасывает кэш главной страницы'''
+        response = self.authorized_author.get(reverse('posts:index'))
+        self.authorized_author.post(
+            reverse('posts:post_create'),
+            data={'text': 'Пост через форму'},
+        )
+        response_new = self.authorized_author.get(reverse('posts:index'))
+        self.assertNotEqual(response.content, response_new.content)
+        self.assertContains(response_new, 'Пост через форму')
+
+    @with_cache_backends
+    def test_orm_writes_invalidate_feeds(self):
+        '''Правка и удаление поста мимо view сбрасывают его ленты'''
+        group_url = reverse(
+            'posts:group_list', kwargs={'slug': PostViewsTest.group.slug}
+        )
+        post = Post.objects.create(
+            text='Пост для переноса',
+            group=PostViewsTest.group,
+            author=PostViewsTest.user,
+        )
+        self.assertContains(self.client.get(group_url), 'Пост для переноса')
+        post = Post.objects.get(pk=post.pk)
+        post.group = PostViewsTest.another_group
+        post.save()
+        self.assertNotContains(self.client.get(group_url), 'Пост для переноса')
+        self.assertContains(
+            self.client.get(reverse('posts:index')), 'Пост для переноса'
+        )
+        post.delete()
+        self.assertNotContains(
+            self.client.get(reverse('posts:index')), 'Пост для переноса'
+        )
+
+    @with_cache_backends
+    def test_follow_page_cache_is_per_user(self):
+        '''Кэш ленты подписок не отдается другому пользователю'''
+        self.follower.get(reverse('posts:follow_index'))
+        response = self.authorized_author.get(reverse('posts:follow_index'))
+        self.assertNotContains(response, 'Тестовый пост0')
+
+    @with_cache_backends
+    def test_feed_cache_varies_on_page(self):
+        '''Кэш ленты не отдает первую страницу вместо второй'''
+        for page in self.pages_with_paginator:
+            with self.subTest(page=page):
+                first_page = self.client.get(page)
+                second_page = self.client.get(page + '?page=2')
+                self.assertNotEqual(first_page.content, second_page.content)
+                self.assertContains(second_page, 'Тестовый пост10')
+                self.assertNotContains(first_page, 'Тестовый пост10')
+
+    def test_feed_cache_key_uses_parsed_page(self):
+        '''Битый курсор и неверный номер дают фрагмент той же страницы'''
+        cache.clear()
+        page = reverse('posts:index')
+        for params in (
+            {}, {PageSet.CURSOR_PARAM: 'битый'}, {'page': 1}, {'page': 'abc'}
+        ):
+            self.client.get(page, params)
+        self.assertEqual(
+            feed_cache_stats()['feed'], {'hits': 2, 'misses': 2}
+        )
+
+    @override_settings(PAGE_CACHE_ENABLED=False)
+    @with_cache_backends
+    def test_feed_cache_stats(self):
+        '''Счетчики попаданий и промахов кэша лент'''
+        cache.clear()
+        self.client.get(reverse('posts:index'))
+        self.client.get(reverse('posts:index'))
+        staff = User.objects.create_user(username='staff', is_staff=True)
+        staff_client = Client()
+        staff_client.force_login(staff)
+        stats = staff_client.get(reverse('posts:feed_cache_stats')).json()
+        self.assertEqual(stats['feed'], {'hits': 1, 'misses': 1})
+        self.assertEqual(
+            self.authorized_author.get(
+                reverse('posts:feed_cache_stats')
+            ).status_code,
+            HTTPStatus.FOUND
+        )
+
+    @with_cache_backends
+    def test_post_cards_are_cached(self):
+        '''Карточки берутся из кэша, пока не сменится версия поста'''
+        page = reverse('posts:index')
+        cached_post = Post.objects.first()
+        self.client.get(page)
+        Post.objects.filter(pk=cached_post.pk).update(text='Правка без сброса')
+        new_post = Post.objects.create(
+            text='Новый пост', author=PostViewsTest.user
+        )
+        invalidate_post(new_post)
+        response = self.client.get(page)
+        self.assertContains(response, 'Новый пост')
+        self.assertNotContains(response, 'Правка без сброса')
+        invalidate_post(cached_post)
+        self.assertContains(self.client.get(page), 'Правка без сброса')
+
+    @with_cache_backends
+    def test_orm_edit_rerenders_card(self):
+        '''Правка поста через ORM, а не форму, рендерит карточку заново'''
+        post = Post.objects.first()
+        self.client.get(reverse('posts:index'))
+        post.text = 'Правка из консоли'
+        post.save()
+        [card] = render_cards(
+            build_cards(feed_cards(Post.objects.filter(pk=post.pk)))
+        )
+        self.assertIn('Правка из консоли', card)
+        self.assertContains(
+            self.client.get(reverse('posts:index')), 'Правка из консоли'
+        )
+
+    def test_feed_shows_excerpt_of_long_post(self):
+        '''Лента показывает начало длинного поста и ссылку на него'''
+        ending = 'Окончание длинного поста'
+        cache.clear()
+        Post.objects.create(
+            text='слово ' * TextSet.EXCERPT_CHARS + ending,
+            author=PostViewsTest.user,
+        )
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'читать дальше')
+        self.assertNotContains(response, ending)
+
+    def test_group_link_hidden_in_group_feed(self):
+        '''Ссылка на группу есть в карточке ленты, но не в ленте группы'''
+        group_url = reverse(
+            'posts:group_list', kwargs={'slug': PostViewsTest.group.slug}
+        )
+        self.assertNotContains(self.client.get(group_url), group_url)
+        self.assertContains(self.client.get(reverse('posts:index')), group_url)
+
+    def test_feed_cards_render_like_models(self):
+        '''Карточка из PostCard совпадает с карточкой из модели Post'''
+        template = get_template(CARD_TEMPLATE)
+        posts = with_excerpts(Post.objects.select_related('author', 'group'))
+        cards = list(build_cards(feed_cards(Post.objects.all())))
+        self.assertEqual(len(cards), len(posts))
+        self.assertIs(cards[0].author, cards[1].author)
+        for card, post in zip(cards, posts):
+            with self.subTest(post=post.pk):
+                post.latest_comment = post.comments.first()
+                self.assertIsInstance(card, PostCard)
+                self.assertEqual(card.pk, post.pk)
+                self.assertHTMLEqual(
+                    template.render({'post': card, 'show_group': True}),
+                    template.render({'post': post, 'show_group': True}),
+                )
+
+    @override_settings(PAGE_CACHE_ENABLED=False)
+    @with_cache_backends
+    def test_feeds_not_modified(self):
+        '''Совпавший ETag дает 304 без запроса ленты и рендера'''
+        for page in self.pages_with_paginator:
+            with self.subTest(page=page):
+                etag = self.client.get(page)['ETag']
+                with self.assertNumQueries(1):
+                    response = self.client.get(page, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(
+                    response.status_code, HTTPStatus.NOT_MODIFIED
+                )
+                self.assertIn('public', response['Cache-Control'])
+
+    def test_feed_etag_changes_with_post_and_user(self):
+        '''ETag ленты зависит от новых постов и пользователя'''
+        page = reverse('posts:index')
+        etag = self.client.get(page)['ETag']
+        self.assertNotEqual(etag, self.follower.get(page)['ETag'])
+        Post.objects.create(text='Новый пост', author=PostViewsTest.user)
+        response = self.client.get(page, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_feed_etag_changes_with_edit_and_delete(self):
+        '''ETag и Last-Modified ленты сдвигаются при правке и удалении
+        поста, в том числе мимо view'''
+        page = reverse('posts:profile', kwargs={
+            'username': PostViewsTest.user.username
+        })
+        post = Post.objects.filter(author=PostViewsTest.user).first()
+        for write in (post.save, post.delete):
+            with self.subTest(write=write.__name__):
+                response = self.client.get(page)
+                write()
+                changed = self.client.get(
+                    page,
+                    HTTP_IF_NONE_MATCH=response['ETag'],
+                    HTTP_IF_MODIFIED_SINCE=response['Last-Modified'],
+                )
+                self.assertEqual(changed.status_code, HTTPStatus.OK)
+                self.assertNotEqual(changed['ETag'], response['ETag'])
+
+    def test_feed_etag_changes_with_author_and_group(self):
+        '''ETag ленты сдвигается при смене имени автора и адреса группы
+        ее карточек'''
+        pages = {
+            reverse('posts:index'): self.client,
+            reverse('posts:group_list', kwargs={
+                'slug': PostViewsTest.group.slug
+            }): self.client,
+            reverse('posts:api_follow_index'): self.follower,
+        }
+        etags = {
+            page: client.get(page)['ETag'] for page, client in pages.items()
+        }
+        author = User.objects.get(pk=PostViewsTest.user.pk)
+        author.first_name = 'Переименованный'
+        author.save()
+        for page, client in pages.items():
+            with self.subTest(page=page):
+                response = client.get(page, HTTP_IF_NONE_MATCH=etags[page])
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                self.assertContains(response, 'Переименованный')
+        page = reverse('posts:index')
+        etag = self.client.get(page)['ETag']
+        group = Group.objects.get(pk=PostViewsTest.group.pk)
+        group.slug = 'renamed-slug'
+        group.save()
+        response = self.client.get(page, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertContains(response, reverse(
+            'posts:group_list', kwargs={'slug': 'renamed-slug'}
+        ))
+
+    def test_feed_cache_control_policy(self):
+        '''Анонимные ленты публичны, ленты пользователя приватны'''
+        page = reverse('posts:index')
+        anonymous = self.client.get(page)
+        self.assertIn('max-age', anonymous['Cache-Control'])
+        self.assertIn('Cookie', anonymous['Vary'])
+        authorized = self.follower.get(page)
+        self.assertIn('private', authorized['Cache-Control'])
+        self.assertIn('no-cache', authorized['Cache-Control'])
+        missing = self.client.get(reverse(
+            'posts:group_list', kwargs={'slug': 'missing'}
+        ))
+        self.assertFalse(missing.has_header('Cache-Control'))
+
     def test_new_post_at_follower_page(self):
         '''Проверка что новый пост появляется у подписчиков'''
         new_post = Post.objects.create(
@@ -239,7 +580,9 @@ class PostViewsTest(TestCase):
         favorite_page = self.follower.get(
             reverse('posts:follow_index')
         )
-        self.assertEqual(new_post, favorite_page.context['page_obj'][0])
+        self.assertEqual(
+            favorite_page.context['page_obj'][0].pk, new_post.pk
+        )
 
     def test_new_post_at_not_a_follower_page(self):
         '''Проверка что новый пост не появляется у тех кто не подписан'''
@@ -293,3 +636,66 @@ class PostViewsTest(TestCase):
             author=PostViewsTest.user,
             user=PostViewsTest.follower
         ).exists())
+
+
+class OffsetPaginationTest(TestCase):
+    '''Класс тестов пагинации ссылками ?page=N'''
+    PAGES_AMOUNT = 10
+
+    @classmethod
+    def setUpClass(cls):
+        '''Фикстуры класса'''
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='author')
+        Post.objects.bulk_create(
+            Post(text=f'Пост {index}', author=cls.user)
+            for index in range(
+                OffsetPaginationTest.PAGES_AMOUNT
+                * PageSet.POSTS_AMOUNT_AT_PADGE
+            )
+        )
+
+    def setUp(self):
+        '''Фикстуры'''
+        cache.clear()
+
+    def get_page(self, number):
+        return self.client.get(
+            reverse('posts:index') + f'?page={number}'
+        ).context['page_obj']
+
+    def test_count_is_cached(self):
+        '''COUNT(*) выполняется один раз, потом число берется из кэша'''
+        self.get_page(1)
+        with CaptureQueriesContext(connection) as queries:
+            page_obj = self.get_page(2)
+        self.assertFalse(any(
+            'COUNT(' in query['sql'] for query in queries.captured_queries
+        ))
+        self.assertEqual(
+            page_obj.paginator.num_pages, OffsetPaginationTest.PAGES_AMOUNT
+        )
+
+    def test_page_range_is_windowed(self):
+        '''Ссылки только на соседние страницы'''
+        page_obj = self.get_page(5)
+        window = PageSet.PAGE_RANGE_WINDOW
+        self.assertEqual(
+            list(page_obj.paginator.page_range),
+            list(range(5 - window, 5 + window + 1)),
+        )
+
+    def test_has_next_ignores_stale_count(self):
+        '''Наличие следующей страницы не зависит от числа в кэше'''
+        self.get_page(1)
+        Post.objects.filter(
+            pk__in=Post.objects.order_by('pk').values('pk')[
+                :PageSet.POSTS_AMOUNT_AT_PADGE
+            ]
+        ).delete()
+        last_page = self.get_page(OffsetPaginationTest.PAGES_AMOUNT - 1)
+        self.assertFalse(last_page.has_next())
+        self.assertEqual(
+            self.get_page(OffsetPaginationTest.PAGES_AMOUNT).number,
+            OffsetPaginationTest.PAGES_AMOUNT - 1,
+        )
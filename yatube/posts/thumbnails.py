@@ -0,0 +1,100 @@
+'''Фоновая подготовка картинок постов и их миниатюр.
+
+Загруженная картинка пережимается (posts.images), затем миниатюра
+строится sorl-thumbnail в пуле потоков после фиксации транзакции, ее
+адрес и размеры сохраняются в посте. Шаблоны лент берут готовый адрес и
+не обращаются ни к Pillow, ни к хранилищу sorl; пока миниатюры нет,
+показывается исходная картинка.
+'''
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection, transaction
+from sorl.thumbnail import get_thumbnail
+
+from core.profiling import timed
+
+from .constants import ImageSet
+from .images import reencode_image
+from .invalidation import invalidate_thumbnail
+from .models import Post
+
+logger = logging.getLogger(__name__)
+_executor = None
+
+
+def get_executor():
+    '''Пул потоков процесса, создается при первой задаче'''
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=ImageSet.THUMBNAIL_WORKERS,
+            thread_name_prefix='thumbnails',
+        )
+
+    return _executor
+
+
+def build_thumbnail(image):
+    '''Миниатюра картинки поста (файл или имя в хранилище)'''
+    with timed('thumbnail'):
+        return get_thumbnail(
+            image,
+            ImageSet.THUMBNAIL_GEOMETRY,
+            **ImageSet.THUMBNAIL_OPTIONS
+        )
+
+
+def generate_thumbnail(post_id):
+    '''Построение миниатюры поста и сохранение ее адреса и размеров'''
+    post = Post.objects.filter(pk=post_id).only('image').first()
+    if post is None or not post.image:
+        return
+    thumbnail = build_thumbnail(post.image)
+    # Если картинку успели заменить, миниатюру построит следующая задача
+    updated = Post.objects.filter(pk=post_id, image=post.image.name).update(
+        thumbnail_url=thumbnail.url,
+        thumbnail_width=thumbnail.width,
+        thumbnail_height=thumbnail.height,
+    )
+    if updated:
+        invalidate_thumbnail(post_id)
+
+
+def prepare_image(post_id):
+    '''Пережатие загруженной картинки и построение ее миниатюры'''
+    with timed('reencode'):
+        reencode_image(post_id)
+    generate_thumbnail(post_id)
+
+
+def _generate_logged(post_id):
+    try:
+        prepare_image(post_id)
+    except Exception:
+        logger.exception('Не удалось обработать картинку поста %s', post_id)
+
+
+def _run_in_worker(post_id):
+    try:
+        _generate_logged(post_id)
+    finally:
+        connection.close()
+
+
+def schedule_thumbnail(post):
+    '''Сброс старой миниатюры и постановка новой в очередь пула'''
+    Post.objects.filter(pk=post.pk).update(
+        thumbnail_url='',
+        thumbnail_width=None,
+        thumbnail_height=None,
+    )
+    if not post.image:
+        return
+    if settings.THUMBNAILS_IN_BACKGROUND:
+        transaction.on_commit(
+            lambda: get_executor().submit(_run_in_worker, post.pk)
+        )
+    else:
+        transaction.on_commit(lambda: _generate_logged(post.pk))
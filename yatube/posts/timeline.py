@@ -0,0 +1,159 @@
+'''Материализованная лента подписок (fan-out-on-write).
+
+Новый пост раскладывается в ленты подписчиков автора, поэтому страница
+подписок читается по индексу записей ленты пользователя. Посты авторов с
+огромным числом подписчиков не раскладываются, а подмешиваются при
+чтении (fan-out-on-read). Когда подписчиков у автора становится меньше
+порога, его последние посты дописываются в ленты подписчиков
+(restore_fanout): написанные в режиме чтения туда не попадали.
+
+Запись ленты хранит копию даты поста, поэтому лента без подмешанных
+авторов сортируется по индексу (user, -created, -post) записей и
+соединяется с постами только по первичному ключу. Ключ курсора такой
+ленты - поля записи entry_created и entry_post_id (posts.utils).
+'''
+from django.db import connection, transaction
+from django.db.models import F, Q
+
+from .constants import TimelineSet
+from .models import Follow, Post, TimelineEntry, UserCounters
+
+
+def is_fanout_author(author_id):
+    '''Раскладывать ли посты автора по лентам подписчиков'''
+    return not UserCounters.objects.filter(
+        user_id=author_id,
+        followers_count__gt=TimelineSet.FANOUT_FOLLOWERS_LIMIT,
+    ).exists()
+
+
+def fan_out_post(post):
+    '''Добавление нового поста в ленты подписчиков автора'''
+    if not is_fanout_author(post.author_id):
+        return
+    follower_ids = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    TimelineEntry.objects.bulk_create(
+        (TimelineEntry(user_id=user_id, post=post, created=post.created)
+         for user_id in follower_ids.iterator()),
+        batch_size=TimelineSet.FANOUT_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def backfill_timeline(follow):
+    '''Добавление последних постов автора в ленту нового подписчика'''
+    if not is_fanout_author(follow.author_id):
+        return
+    posts = Post.objects.filter(author_id=follow.author_id).values_list(
+        'id', 'created'
+    )[:TimelineSet.BACKFILL_POSTS_AMOUNT]
+    TimelineEntry.objects.bulk_create(
+        [TimelineEntry(user_id=follow.user_id, post_id=post_id,
+                       created=created)
+         for post_id, created in posts],
+        batch_size=TimelineSet.FANOUT_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def restore_fanout(author_id):
+    '''Заполнение лент подписчиков автора, число подписчиков которого
+    опустилось до порога раскладки'''
+    if not UserCounters.objects.filter(
+        user_id=author_id,
+        followers_count=TimelineSet.FANOUT_FOLLOWERS_LIMIT,
+    ).exists():
+        return 0
+    tables = {
+        'timeline': TimelineEntry._meta.db_table,
+        'follow': Follow._meta.db_table,
+        'post': Post._meta.db_table,
+    }
+    ops = connection.ops
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'{ops.insert_statement(ignore_conflicts=True)} '
+            f'{tables["timeline"]} (user_id, post_id, created) '
+            f'SELECT f.user_id, p.id, p.created FROM {tables["follow"]} f '
+            f'CROSS JOIN (SELECT id, created FROM {tables["post"]} '
+            'WHERE author_id = %s ORDER BY created DESC, id DESC LIMIT %s'
+            ') p WHERE f.author_id = %s '
+            f'{ops.ignore_conflicts_suffix_sql(ignore_conflicts=True)}',
+            [author_id, TimelineSet.BACKFILL_POSTS_AMOUNT, author_id],
+        )
+
+        return cursor.rowcount
+
+
+def trim_timeline(follow):
+    '''Удаление постов автора из ленты отписавшегося пользователя'''
+    TimelineEntry.objects.filter(
+        user_id=follow.user_id, post__author_id=follow.author_id
+    ).delete()
+
+
+def rebuild_timelines():
+    '''Полное перестроение лент одним запросом INSERT ... SELECT.
+
+    Нужно после массовой загрузки, которая не вызывает сигналов. Каждый
+    подписчик получает последние посты автора, как при подписке.
+    '''
+    tables = {
+        'timeline': TimelineEntry._meta.db_table,
+        'follow': Follow._meta.db_table,
+        'post': Post._meta.db_table,
+        'counters': UserCounters._meta.db_table,
+    }
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {tables["timeline"]}')
+        cursor.execute(
+            f'INSERT INTO {tables["timeline"]} (user_id, post_id, created) '
+            f'SELECT f.user_id, p.id, p.created FROM {tables["follow"]} f '
+            f'JOIN (SELECT id, author_id, created, ROW_NUMBER() OVER ('
+            f'PARTITION BY author_id ORDER BY created DESC, id DESC'
+            f') AS position FROM {tables["post"]}) p '
+            'ON p.author_id = f.author_id '
+            f'LEFT JOIN {tables["counters"]} c ON c.user_id = f.author_id '
+            'WHERE COALESCE(c.followers_count, 0) <= %s '
+            'AND p.position <= %s',
+            [
+                TimelineSet.FANOUT_FOLLOWERS_LIMIT,
+                TimelineSet.BACKFILL_POSTS_AMOUNT,
+            ],
+        )
+
+        return cursor.rowcount
+
+
+def pulled_author_ids(user):
+    '''Авторы из подписок пользователя, посты которых подмешиваются при
+    чтении'''
+    return list(Follow.objects.filter(
+        user=user,
+        author__counters__followers_count__gt=(
+            TimelineSet.FANOUT_FOLLOWERS_LIMIT
+        ),
+    ).values_list('author_id', flat=True))
+
+
+def follow_feed(user, pulled_ids=None):
+    '''Посты ленты подписок пользователя, pulled_ids - уже прочитанный
+    pulled_author_ids'''
+    if pulled_ids is None:
+        pulled_ids = pulled_author_ids(user)
+    posts = Post.objects.all()
+    if not pulled_ids:
+        # Аннотации используют соединение с записями ленты из filter,
+        # условия курсора по ним не добавляют второго соединения
+        return posts.filter(timeline__user=user).annotate(
+            entry_created=F('timeline__created'),
+            entry_post_id=F('timeline__post_id'),
+        ).order_by('-entry_created', '-entry_post_id')
+
+    return posts.filter(
+        Q(pk__in=TimelineEntry.objects.filter(
+            user=user).values('post_id'))
+        | Q(author_id__in=pulled_ids)
+    ).order_by('-created', '-pk')
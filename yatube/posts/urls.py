@@ -1,4 +1,4 @@
-from . import views
+from . import api, views
 
 from django.urls import path
 
@@ -9,6 +9,7 @@ urlpatterns = [
     path('group/<slug:slug>/', views.group_posts, name='group_list'),
     path('profile/<str:username>/', views.profile, name='profile'),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
+    path('search/', views.search, name='search'),
     path('create/', views.post_create, name='post_create'),
     path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit'),
     path(
@@ -25,4 +26,18 @@ urlpatterns = [
         views.profile_unfollow,
         name='profile_unfollow'
     ),
+    path('api/posts/', api.index, name='api_index'),
+    path('api/group/<slug:slug>/', api.group_posts, name='api_group_list'),
+    path('api/profile/<str:username>/', api.profile, name='api_profile'),
+    path(
+        'api/posts/<int:post_id>/',
+        api.post_detail,
+        name='api_post_detail'
+    ),
+    path('api/follow/', api.follow_index, name='api_follow_index'),
+    path(
+        'stats/feed-cache/',
+        views.feed_cache_stats_view,
+        name='feed_cache_stats'
+    ),
 ]
@@ -1,12 +1,242 @@
-from django.core.paginator import Paginator
+import base64
+import binascii
+import hashlib
+from math import ceil
+
+from django.core.cache import cache
+from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator, Page
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
 
 from .constants import PageSet
 
 
-def add_paginator(request, posts):
+def encode_cursor(direction, post):
+    '''Непрозрачный токен курсора по ключу (created, id) поста'''
+    raw = f'{direction}|{post.created.isoformat()}|{post.pk}'
+
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(token):
+    '''Разбор токена курсора, для битого токена возвращает None'''
+    try:
+        raw = base64.urlsafe_b64decode(token.encode()).decode()
+        direction, created, pk = raw.split('|')
+        created = parse_datetime(created)
+        pk = int(pk)
+    except (binascii.Error, UnicodeError, ValueError):
+        return None
+    if direction not in PageSet.CURSOR_DIRECTIONS or created is None:
+        return None
+
+    return direction, created, pk
+
+
+class CursorPaginator(Paginator):
+    '''Пагинатор по ключу (created, id).
+
+    Не выполняет COUNT(*) и OFFSET: страница выбирается условием по ключу
+    крайнего поста соседней страницы, поэтому глубокие страницы стоят
+    столько же, сколько первая. Номер страницы и число страниц условные:
+    они отражают только наличие соседних страниц.
+    '''
+    is_cursor = True
+
+    def __init__(self, object_list, per_page):
+        super().__init__(object_list, per_page)
+        self.cursor = None
+        self.next_cursor = None
+        self.previous_cursor = None
+        self._number = 1
+        self._has_next = False
+
+    @property
+    def num_pages(self):
+        return self._number + self._has_next
+
+    def get_cursor_page(self, token):
+        '''Страница, следующая за курсором (или первая страница).
+
+        Ключ - явная сортировка queryset по убыванию (дата, id поста), без
+        нее - поля created и pk поста.
+        '''
+        cursor = self.cursor = decode_cursor(token) if token else None
+        ordering = self.object_list.query.order_by or PageSet.FEED_ORDERING
+        created_field, pk_field = (field.lstrip('-') for field in ordering)
+        posts = self.object_list.order_by(*ordering)
+        if cursor is None:
+            direction = PageSet.CURSOR_NEXT
+        else:
+            direction, created, pk = cursor
+            lookup = 'lt' if direction == PageSet.CURSOR_NEXT else 'gt'
+            if direction == PageSet.CURSOR_PREVIOUS:
+                posts = posts.reverse()
+            posts = posts.filter(
+                Q(**{f'{created_field}__{lookup}': created})
+                | Q(**{created_field: created, f'{pk_field}__{lookup}': pk})
+            )
+        rows = list(posts[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if direction == PageSet.CURSOR_NEXT:
+            has_previous = cursor is not None
+            self._has_next = has_more
+        else:
+            rows.reverse()
+            has_previous = has_more
+            self._has_next = True
+        self._number = 1 + has_previous
+        if rows and has_previous:
+            self.previous_cursor = encode_cursor(
+                PageSet.CURSOR_PREVIOUS, rows[0]
+            )
+        if rows and self._has_next:
+            self.next_cursor = encode_cursor(PageSet.CURSOR_NEXT, rows[-1])
+
+        return Page(rows, self._number, self)
+
+
+def approx_count_key(queryset):
+    '''Ключ кэша числа записей ленты по SQL ее запроса'''
+    sql = hashlib.md5(str(queryset.query).encode()).hexdigest()
+
+    return f'{PageSet.APPROX_COUNT_KEY_PREFIX}:{sql}'
+
+
+class LookaheadPaginator(Paginator):
+    '''Пагинатор по номеру страницы без COUNT(*) на каждый запрос.
+
+    Страница читается с одной лишней строкой: по ней видно, есть ли
+    следующая страница. Число записей для ссылок на последнюю страницу
+    берется из кэша и пересчитывается раз в APPROX_COUNT_TIMEOUT секунд,
+    поэтому оно примерное; число страниц не меньше уже известных.
+    page_range - окно из PAGE_RANGE_WINDOW страниц вокруг текущей.
+    '''
+
+    def __init__(self, object_list, per_page):
+        super().__init__(object_list, per_page)
+        self._number = None
+        self._has_next = False
+
+    @cached_property
+    def count(self):
+        key = approx_count_key(self.object_list)
+        count = cache.get(key)
+        if count is None:
+            count = self.refresh_count()
+
+        return count
+
+    def refresh_count(self):
+        '''Точное число записей, сохраняемое в кэш'''
+        count = self.object_list.count()
+        cache.set(
+            approx_count_key(self.object_list), count,
+            PageSet.APPROX_COUNT_TIMEOUT,
+        )
+        self.__dict__['count'] = count
+
+        return count
+
+    @property
+    def num_pages(self):
+        pages = max(1, ceil(self.count / self.per_page))
+        if self._number is None:
+            return pages
+        if not self._has_next:
+            return self._number
+
+        return max(pages, self._number + 1)
+
+    @property
+    def page_range(self):
+        number = self._number or 1
+        window = PageSet.PAGE_RANGE_WINDOW
+
+        return range(
+            max(1, number - window), min(self.num_pages, number + window) + 1
+        )
+
+    def validate_number(self, number):
+        '''Номер страницы не сверяется с примерным числом страниц'''
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger('Номер страницы не число')
+        if number < 1:
+            raise EmptyPage('Номер страницы меньше 1')
+
+        return number
+
+    def page(self, number):
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        rows = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not rows and number > 1:
+            raise EmptyPage('На странице нет записей')
+        self._number = number
+        self._has_next = len(rows) > self.per_page
+
+        return self._get_page(rows[:self.per_page], number, self)
+
+    def get_page(self, number):
+        try:
+            return self.page(number)
+        except PageNotAnInteger:
+            return self.page(1)
+        except EmptyPage:
+            # Записей меньше, чем думал кэш: последняя страница по
+            # точному числу
+            pages = ceil(self.refresh_count() / self.per_page)
+
+            return self.page(max(1, pages))
+
+
+OFFSET_PAGINATORS = {
+    PageSet.OFFSET_LOOKAHEAD: LookaheadPaginator,
+    PageSet.OFFSET_COUNT: Paginator,
+}
+
+
+def add_paginator(request, posts, per_page=PageSet.POSTS_AMOUNT_AT_PADGE):
     '''Функция добавления пагинатора при отображении постов'''
-    paginator = Paginator(posts, PageSet.POSTS_AMOUNT_AT_PADGE)
     page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    if page_number is not None:
+        # Старые ссылки вида ?page=N продолжают работать через OFFSET
+        paginator = OFFSET_PAGINATORS[PageSet.OFFSET_MODE](posts, per_page)
+
+        return paginator.get_page(page_number)
+    paginator = CursorPaginator(posts, per_page)
+    page_obj = paginator.get_cursor_page(
+        request.GET.get(PageSet.CURSOR_PARAM)
+    )
 
     return page_obj
+
+
+def page_links(request, page_obj):
+    '''Адреса соседних страниц для ответов JSON API'''
+    paginator = page_obj.paginator
+    if getattr(paginator, 'is_cursor', False):
+        next_page = paginator.next_cursor
+        previous_page = paginator.previous_cursor
+        param = PageSet.CURSOR_PARAM
+    else:
+        next_page = page_obj.has_next() and page_obj.next_page_number()
+        previous_page = (
+            page_obj.has_previous() and page_obj.previous_page_number()
+        )
+        param = 'page'
+    links = {}
+    for name, value in (('next', next_page), ('previous', previous_page)):
+        links[name] = None
+        if value:
+            query = request.GET.copy()
+            query.pop('page', None)
+            query.pop(PageSet.CURSOR_PARAM, None)
+            query[param] = value
+            links[name] = f'{request.path}?{query.urlencode()}'
+
+    return links
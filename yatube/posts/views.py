@@ -1,72 +1,145 @@
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
 from django.shortcuts import render, get_object_or_404, redirect
-from django.core.cache import cache
+
+from core.middleware import mark_page_scopes
+from core.routers import replica_reads
 
 from .models import Post, Group, Follow, User
 from .forms import PostForm, CommentForm
 from .utils import add_paginator
-
-
+from .timeline import follow_feed, pulled_author_ids
+from .counters import counters_for
+from .constants import CacheSet, PageSet, SearchSet
+from .feed_cache import feed_cache_key, feed_cache_stats
+from .invalidation import follow_scopes
+from .search import search_posts
+from .hydration import card_page, feed_cards
+from .conditional import (
+    conditional_feed,
+    feed_cache_control,
+    group_freshness,
+    index_freshness,
+    page_scopes,
+    post_freshness,
+    profile_freshness,
+)
+
+HTML_VARIANT = 'html'
+
+
+@replica_reads
+@feed_cache_control
+@conditional_feed(index_freshness, HTML_VARIANT)
 def index(request):
     '''Функция рендера главной страницы проекта'''
     template = 'posts/index.html'
-    posts = Post.objects.select_related(
-        'author',
-        'group',
-    )
-    page_obj = add_paginator(request, posts)
+    posts = feed_cards(Post.objects.all())
+    page_obj = card_page(add_paginator(request, posts))
     context = {
         'page_obj': page_obj,
+        'feed_cache_key': feed_cache_key(page_obj, CacheSet.FEED),
     }
 
-    return render(request, template, context)
+    return mark_page_scopes(
+        render(request, template, context),
+        *page_scopes(page_obj, (CacheSet.FEED, '')),
+    )
 
 
+@replica_reads
+@feed_cache_control
+@conditional_feed(group_freshness, HTML_VARIANT)
 def group_posts(request, slug):
     '''Функция рендера страниц с поставми запрошенной группы'''
     group = get_object_or_404(Group, slug=slug)
     template = 'posts/group_list.html'
-    posts = group.posts.select_related('author',)
-    page_obj = add_paginator(request, posts)
+    posts = feed_cards(group.posts.all())
+    page_obj = card_page(add_paginator(request, posts))
     context = {
         'group': group,
         'page_obj': page_obj,
+        'feed_cache_key': feed_cache_key(page_obj, CacheSet.GROUP, group.pk),
     }
 
-    return render(request, template, context)
+    return mark_page_scopes(
+        render(request, template, context),
+        *page_scopes(page_obj, (CacheSet.GROUP, group.pk)),
+    )
 
 
+@replica_reads
+@feed_cache_control
+@conditional_feed(profile_freshness, HTML_VARIANT)
 def profile(request, username):
     '''Функция рендера страницы профиля пользователя'''
     template = 'posts/profile.html'
-    author = get_object_or_404(User, username=username)
-    posts = author.posts.select_related('group',)
+    author = get_object_or_404(
+        User.objects.select_related('counters'), username=username
+    )
+    posts = feed_cards(author.posts.all())
     following = (
         request.user.is_authenticated
         and author.following.filter(user=request.user).exists()
     )
-    page_obj = add_paginator(request, posts)
+    page_obj = card_page(add_paginator(request, posts))
     context = {
         'author': author,
+        'author_counters': counters_for(author),
         'page_obj': page_obj,
         'following': following,
+        'feed_cache_key': feed_cache_key(
+            page_obj, CacheSet.AUTHOR, author.pk
+        ),
     }
 
-    return render(request, template, context)
+    return mark_page_scopes(
+        render(request, template, context),
+        *page_scopes(page_obj, (CacheSet.AUTHOR, author.pk)),
+    )
 
 
+@replica_reads
+@conditional_feed(post_freshness, HTML_VARIANT)
 def post_detail(request, post_id):
     '''Функция рендера страницы выбранного поста'''
     template = 'posts/post_detail.html'
-    post = get_object_or_404(Post, id=post_id)
-    comments = post.comments.select_related('post__group',)
+    post = get_object_or_404(
+        Post.objects.select_related('author__counters', 'group'),
+        id=post_id
+    )
+    comments = add_paginator(
+        request,
+        post.comments.select_related('author',),
+        PageSet.COMMENTS_AMOUNT_AT_PAGE,
+    )
     form = CommentForm(None)
     context = {
         'post': post,
+        'author_counters': counters_for(post.author),
         'form': form,
         'comments': comments,
     }
 
+    return mark_page_scopes(
+        render(request, template, context),
+        (CacheSet.POST, post.pk),
+        (CacheSet.AUTHOR, post.author_id),
+    )
+
+
+@replica_reads
+def search(request):
+    '''Функция рендера страницы поиска по постам и коментариям'''
+    template = 'posts/search.html'
+    query = request.GET.get(SearchSet.QUERY_PARAM, '').strip()
+    page_obj = search_posts(query, request.GET.get(PageSet.CURSOR_PARAM))
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+    }
+
     return render(request, template, context)
 
 
@@ -124,14 +197,20 @@ def add_comment(request, post_id):
     return redirect('posts:post_detail', post_id=post_id)
 
 
+@replica_reads
 @login_required
 def follow_index(request):
     '''Страница избранных постов'''
     template = 'posts/follow.html'
-    posts = Post.objects.filter(author__following__user=request.user)
-    page_obj = add_paginator(request, posts)
+    pulled_ids = pulled_author_ids(request.user)
+    posts = feed_cards(follow_feed(request.user, pulled_ids))
+    page_obj = card_page(add_paginator(request, posts))
     context = {
         'page_obj': page_obj,
+        'feed_cache_key': feed_cache_key(
+            page_obj, CacheSet.FOLLOW, request.user.pk,
+            follow_scopes(request.user.pk, pulled_ids),
+        ),
     }
     return render(request, template, context)
 
@@ -142,7 +221,6 @@ def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
     if request.user != author:
         Follow.objects.update_or_create(user=request.user, author=author)
-    cache.clear()
 
     return redirect('posts:profile', username=username)
 
@@ -150,9 +228,14 @@ def profile_follow(request, username):
 @login_required
 def profile_unfollow(request, username):
     '''Отписка от автора'''
-    Follow.objects.filter(
-        user=request.user, author__username=username
-    ).delete()
-    cache.clear()
+    author = get_object_or_404(User, username=username)
+    Follow.objects.filter(user=request.user, author=author).delete()
 
     return redirect('posts:profile', username=username)
+
+
+@staff_member_required
+def feed_cache_stats_view(request):
+    '''Счетчики попаданий и промахов кэша лент для мониторинга'''
+
+    return JsonResponse(feed_cache_stats())
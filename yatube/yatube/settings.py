@@ -38,6 +38,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.profiling.ProfilingMiddleware',
+    'core.middleware.AnonymousPageCacheMiddleware',
+    'core.routers.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -67,11 +70,53 @@ TEMPLATES = [
     },
 ]
 
+# Кэш выбирается переменными окружения: locmem - свой у каждого
+# процесса (разработка), file - общий для воркеров одного сервера,
+# redis - общий для серверов, fakeredis - клиент django-redis с Redis в
+# памяти процесса вместо сервера (разработка и тесты, core.local_redis)
+CACHE_PRESETS = {
+    'locmem': {
+        'BACKEND': 'core.cache.CompressedLocMemCache',
+    },
+    'file': {
+        'BACKEND': 'core.cache.SharedFileCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache'),
+    },
+    'redis': {
+        'BACKEND': 'django_redis.cache.RedisCache',
+        'LOCATION': 'redis://127.0.0.1:6379/1',
+        'OPTIONS': {
+            'CONNECTION_POOL_KWARGS': {'max_connections': 50},
+            'COMPRESSOR': 'django_redis.compressors.zlib.ZlibCompressor',
+        },
+    },
+    'fakeredis': {
+        'BACKEND': 'django_redis.cache.RedisCache',
+        'LOCATION': 'redis://127.0.0.1:6379/1',
+        'OPTIONS': {
+            'CONNECTION_POOL_CLASS': 'core.local_redis.LocalRedisPool',
+            'COMPRESSOR': 'django_redis.compressors.zlib.ZlibCompressor',
+        },
+    },
+}
 CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+    'default': dict(
+        CACHE_PRESETS[os.environ.get('YATUBE_CACHE_BACKEND', 'locmem')],
+        KEY_PREFIX=os.environ.get('YATUBE_CACHE_KEY_PREFIX', 'yatube'),
+    )
 }
+if os.environ.get('YATUBE_CACHE_LOCATION'):
+    CACHES['default']['LOCATION'] = os.environ['YATUBE_CACHE_LOCATION']
+
+# Замеры SQL, шаблонов и кэша в заголовке Server-Timing и сводка
+# последних PROFILING_WINDOW запросов для администраторов
+# (core.profiling)
+PROFILING_ENABLED = os.environ.get('YATUBE_PROFILING') == '1'
+PROFILING_WINDOW = 1000
+
+# Кэш страниц анонимных читателей (core.middleware)
+PAGE_CACHE_ENABLED = True
+PAGE_CACHE_TIMEOUT = 60
 
 WSGI_APPLICATION = 'yatube.wsgi.application'
 
@@ -84,7 +129,44 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
-    }
+        # Соединение переиспользуется запросами потока до CONN_MAX_AGE секунд
+        'CONN_MAX_AGE': int(os.environ.get('YATUBE_CONN_MAX_AGE', 60)),
+        # Сколько секунд писатель ждет блокировку, прежде чем получить
+        # "database is locked"
+        'OPTIONS': {'timeout': 20},
+    },
+    # Локальная реплика: копия основной базы, которую обновляет команда
+    # replicate
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, 'db-replica.sqlite3'),
+        'CONN_MAX_AGE': int(os.environ.get('YATUBE_CONN_MAX_AGE', 60)),
+        'OPTIONS': {'timeout': 20},
+    },
+}
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+
+# Реплики для чтения лент через запятую (core.routers), без них все
+# запросы идут в основную базу
+DATABASE_REPLICAS = [
+    alias for alias in os.environ.get('YATUBE_DB_REPLICAS', '').split(',')
+    if alias
+]
+# Наибольшее отставание реплик в секундах: данные под версиями кэша
+# моложе него читаются из основной базы
+REPLICA_MAX_LAG_SECONDS = 10
+# Сколько секунд после записи клиент читает из основной базы. Должно
+# быть больше отставания реплик
+REPLICA_STICKY_SECONDS = REPLICA_MAX_LAG_SECONDS
+
+# PRAGMA для каждого нового соединения SQLite (core.database)
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    # Отрицательное значение - размер в килобайтах: 64 МБ на соединение
+    'cache_size': -64 * 1024,
+    'temp_store': 'MEMORY',
 }
 
 
@@ -120,6 +202,15 @@ USE_TZ = True
 # Static files (CSS, JavaScript, Images)
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Загрузки сразу пишутся во временный файл, а не в память (posts.images)
+FILE_UPLOAD_MAX_MEMORY_SIZE = 0
+FILE_UPLOAD_HANDLERS = [
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+# Миниатюры строятся в пуле потоков после фиксации транзакции. Тесты с
+# временным MEDIA_ROOT выключают пул: фоновая задача могла бы писать в
+# папку во время ее удаления
+THUMBNAILS_IN_BACKGROUND = True
 STATIC_URL = '/static/'
 LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'posts:index'
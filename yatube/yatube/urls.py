@@ -3,12 +3,17 @@ from django.conf import settings
 from django.conf.urls.static import static
 from django.urls import include, path
 
+from core.views import profiling_stats_view
+
 urlpatterns = [
     path('', include('posts.urls', namespace='posts')),
     path('admin/', admin.site.urls),
     path('auth/', include('users.urls')),
     path('auth/', include('django.contrib.auth.urls')),
     path('about/', include('about.urls', namespace='about')),
+    path(
+        'stats/requests/', profiling_stats_view, name='profiling_stats'
+    ),
 ]
 
 handler404 = 'core.views.page_not_found'